@@ -24,9 +24,17 @@ load_dotenv()
 # Add the aura-agent directory to Python path to enable imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aura-agent'))
 
-# Import the compiled LangGraph agent and memory manager
-from src.graph import aura_graph
+# Import the LangGraph agent factory (built on first use) and memory manager
+from src.graph import get_aura_graph, prepare_turn_input, resume_interrupted_turn, routing_stats, turn_config
 from src.memory_manager import ChatHistoryManager
+from src.retention import ArchiveMissingError
+from src.tracing import tracer
+from src.metrics import turn_metrics
+from src.llm_cache import llm_cache
+from src.resilience import resilience_stats
+from src.admission import AdmissionRejected, get_admission_controller
+from src.warmup import warm_up
+from src.image_search import get_image_search
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -68,6 +76,19 @@ def get_memory_manager():
 
 memory_manager = get_memory_manager()
 
+# Sessions per sidebar page (first page on every rerun, older ones on demand)
+SESSIONS_PAGE_SIZE = int(os.environ.get("AURA_SIDEBAR_PAGE_SIZE", "10"))
+
+# --- Warm-up (once per server process) ---
+@st.cache_resource(show_spinner="Warming up the agent...")
+def warm_up_agent():
+    """Initialize retriever, LLM client, graph and DB pool before the first question."""
+    if os.environ.get("AURA_WARMUP_ENABLED", "true").lower() != "true":
+        return {}
+    return warm_up(memory_manager)
+
+warmup_report = warm_up_agent()
+
 # --- Session State Initialization ---
 def initialize_session():
     """Initialize Streamlit session state variables."""
@@ -86,10 +107,14 @@ def initialize_session():
     
     # Load chat history from database
     if "messages" not in st.session_state:
-        loaded_history = memory_manager.load_history(
-            st.session_state.user_id,
-            st.session_state.session_id
-        )
+        try:
+            loaded_history = memory_manager.load_history(
+                st.session_state.user_id,
+                st.session_state.session_id
+            )
+        except ArchiveMissingError as e:
+            st.error(f"⚠️ This conversation is archived and could not be restored: {e}")
+            st.stop()
         
         if loaded_history:
             st.session_state.messages = loaded_history
@@ -128,9 +153,16 @@ with st.sidebar:
     
     st.divider()
     
-    # Display previous sessions
+    # Display previous sessions: one keyset page per query, each row carrying its
+    # precomputed summary, so no per-session lookups however many sessions exist
     st.markdown("### 📚 Recent Conversations")
-    sessions = memory_manager.get_user_sessions(st.session_state.user_id, limit=10)
+    sessions = memory_manager.get_user_sessions(st.session_state.user_id, limit=SESSIONS_PAGE_SIZE)
+    if len(sessions) < SESSIONS_PAGE_SIZE:
+        st.session_state.older_sessions, st.session_state.no_older_sessions = [], True
+    elif not st.session_state.get("older_sessions"):
+        st.session_state.no_older_sessions = False
+    shown = {session['session_id'] for session in sessions}
+    sessions += [s for s in st.session_state.get("older_sessions", []) if s['session_id'] not in shown]
     
     for session in sessions:
         # Format timestamp
@@ -139,16 +171,34 @@ with st.sidebar:
         
         # Show if this is the current session
         is_current = session['session_id'] == st.session_state.session_id
-        button_label = f"{'🟢 ' if is_current else ''}  {time_str}"
+        topic = session.get('first_question') or time_str
+        code = f"{session['last_error_code']} · " if session.get('last_error_code') else ""
+        button_label = f"{'🟢 ' if is_current else ''}{code}{topic}"
         
-        if st.button(button_label, key=session['session_id'], use_container_width=True, disabled=is_current):
-            # Load this session
-            st.session_state.session_id = session['session_id']
-            st.session_state.messages = memory_manager.load_history(
-                st.session_state.user_id,
-                session['session_id']
-            )
-            st.rerun()
+        if st.button(button_label, key=session['session_id'], use_container_width=True, disabled=is_current,
+                     help=session.get('first_question')):
+            # Load this session (archived sessions are restored first)
+            try:
+                messages = memory_manager.load_history(st.session_state.user_id, session['session_id'])
+            except ArchiveMissingError as e:
+                st.error(f"⚠️ This conversation is archived and could not be restored: {e}")
+            else:
+                st.session_state.session_id = session['session_id']
+                st.session_state.messages = messages
+                st.rerun()
+        if session.get('first_question'):
+            st.caption(f"{time_str} · {session.get('message_count', 0)} messages")
+    
+    if not st.session_state.get("no_older_sessions") and \
+            st.button("Load older conversations", use_container_width=True):
+        older = memory_manager.get_user_sessions(
+            st.session_state.user_id,
+            limit=SESSIONS_PAGE_SIZE,
+            before=memory_manager.session_cursor(sessions[-1])
+        )
+        st.session_state.older_sessions = st.session_state.get("older_sessions", []) + older
+        st.session_state.no_older_sessions = len(older) < SESSIONS_PAGE_SIZE
+        st.rerun()
     
     st.divider()
     
@@ -162,6 +212,7 @@ with st.sidebar:
     - 🔍 Knowledge base search
     - 🔄 Multi-step reasoning
     - 📊 Device diagnostics
+    - 📷 Photo triage
     """)
     
     # Debug info (expandable)
@@ -169,6 +220,66 @@ with st.sidebar:
         st.write(f"User ID: `{st.session_state.user_id}`")
         st.write(f"Session ID: `{st.session_state.session_id[:8]}...`")
         st.write(f"Messages in memory: {len(st.session_state.messages)}")
+    
+    # Performance panel (fed by the in-process tracing spans)
+    with st.expander("📈 Performance"):
+        perf = turn_metrics.snapshot()
+        st.caption(f"Last {int(perf['window_seconds'] // 60)} min · {perf['turns']} turns")
+        
+        if perf["turns"]:
+            latency = perf["turn_latency_ms"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("p50", f"{latency[50] / 1000:.1f}s")
+            col2.metric("p95", f"{latency[95] / 1000:.1f}s")
+            col3.metric("p99", f"{latency[99] / 1000:.1f}s")
+            
+            st.write(f"LLM calls / turn: {perf['llm_calls_per_turn']:.2f}")
+            st.write(f"Tokens / turn: {perf['prompt_tokens_per_turn']:.0f} prompt · "
+                     f"{perf['completion_tokens_per_turn']:.0f} completion")
+            st.write(f"DB time / turn: {perf['db_ms_per_turn']:.0f} ms (p95 {perf['db_ms_p95']:.0f} ms)")
+        
+        if perf["cache_lookups"]:
+            st.write(f"Prefetch cache hit rate: {perf['cache_hit_rate']:.0%} "
+                     f"({perf['cache_lookups']} lookups)")
+        
+        if llm_cache is not None:
+            cached = llm_cache.stats()
+            if cached["hits"] + cached["misses"]:
+                st.write(f"LLM cache hit rate: {cached['hit_rate']:.0%} · saved "
+                         f"{cached['saved_ms'] / 1000:.1f}s and ${cached['saved_usd']:.2f}")
+        
+        admission = get_admission_controller().stats()
+        st.write(f"Turns running: {admission['active']}/{admission['max_concurrent']} · "
+                 f"queued: {admission['queue_depth']} · wait p95: {admission['wait_p95_ms']:.0f} ms · "
+                 f"rejected: {admission['rate_limited'] + admission['queue_full'] + admission['queue_timeout']}")
+        
+        dependencies = resilience_stats()
+        if any(stats["calls"] for stats in dependencies.values()):
+            st.markdown("**Azure dependencies**")
+            st.dataframe(
+                [{"dependency": name, **{key: stats[key] for key in ("calls", "retries", "hedges", "failures",
+                                                                     "rejected", "circuit_state")}}
+                 for name, stats in dependencies.items()],
+                hide_index=True, use_container_width=True,
+            )
+        
+        deployments = routing_stats()
+        if deployments:
+            st.markdown("**LLM deployments (last minute)**")
+            st.dataframe(deployments, hide_index=True, use_container_width=True)
+        
+        if perf["tools"]:
+            st.markdown("**Tool latency**")
+            st.dataframe(perf["tools"], hide_index=True, use_container_width=True)
+        elif not perf["turns"]:
+            st.write("No turns recorded yet.")
+        
+        if warmup_report:
+            st.markdown("**Startup warm-up**")
+            st.dataframe(
+                [{"component": name, "status": r["status"], "ms": r["ms"]} for name, r in warmup_report.items()],
+                hide_index=True, use_container_width=True,
+            )
 
 # --- Main Chat Interface ---
 st.markdown('<p class="main-header">🤖 Aura IoT Troubleshooter</p>', unsafe_allow_html=True)
@@ -182,12 +293,29 @@ for message in st.session_state.messages:
     with st.chat_message(message.type):
         st.markdown(message.content)
 
+# --- Photo Triage ---
+# Similar knowledge-base images point to their guides; results are cached by image hash,
+# so Streamlit reruns don't repeat the search
+uploaded_photo = st.file_uploader("📷 Attach a photo of the device (optional)",
+                                  type=["png", "jpg", "jpeg"], key="device_photo")
+photo_guides = []
+if uploaded_photo is not None:
+    try:
+        photo_matches = get_image_search().search(uploaded_photo.getvalue())
+        photo_guides = list(dict.fromkeys(doc.metadata["source"] for doc in photo_matches))
+    except Exception as e:
+        st.warning(f"Photo search is unavailable: {e}")
+    if photo_guides:
+        st.caption(f"📷 Photo resembles: {', '.join(photo_guides)}")
+
 # --- Handle User Input ---
 if prompt := st.chat_input("Describe your issue or ask a question..."):
     # Display user message immediately
     st.chat_message("human").markdown(prompt)
     
-    # Add user message to session state
+    # Add user message to session state; the photo match is passed to the agent as text
+    if photo_guides:
+        prompt += f"\n\n[Attached photo resembles the guides: {', '.join(photo_guides)}]"
     user_message = HumanMessage(content=prompt)
     st.session_state.messages.append(user_message)
     
@@ -195,32 +323,58 @@ if prompt := st.chat_input("Describe your issue or ask a question..."):
     with st.chat_message("ai"):
         with st.spinner("🤔 Aura is analyzing..."):
             try:
-                # Prepare input for the LangGraph agent
-                inputs = {
-                    "chat_history": st.session_state.messages,
-                    "user_id": st.session_state.user_id,
-                    "session_id": st.session_state.session_id
-                }
-                
-                # Invoke the agent (this may loop through multiple tool calls)
-                response = aura_graph.invoke(inputs)
-                
-                # Extract the final AI response
-                final_answer = response["chat_history"][-1]
-                
-                # Display the response
-                st.markdown(final_answer.content)
-                
-                # Update session state with the AI response
-                st.session_state.messages.append(final_answer)
-                
-                # Save both user message and AI response to database
-                memory_manager.save_messages(
-                    st.session_state.user_id,
-                    st.session_state.session_id,
-                    [user_message, final_answer]
-                )
+                # Waits for a turn slot (or raises AdmissionRejected when overloaded);
+                # the turn span groups every node, tool and DB span of this request
+                with get_admission_controller().admit(st.session_state.user_id, st.session_state.session_id), \
+                        tracer.span("turn", kind="turn",
+                                    user_id=st.session_state.user_id,
+                                    session_id=st.session_state.session_id):
+                    # A previous turn interrupted mid tool-loop is finished first;
+                    # its exchange is saved and shown ahead of the new message
+                    resumed = resume_interrupted_turn(st.session_state.session_id)
+                    if resumed:
+                        memory_manager.save_messages(
+                            st.session_state.user_id,
+                            st.session_state.session_id,
+                            resumed
+                        )
+                        st.session_state.messages[-1:-1] = resumed
+                    
+                    # Prepare input for the LangGraph agent
+                    # With checkpointing only the new message is sent; the graph
+                    # resumes the session's saved state
+                    inputs = prepare_turn_input(
+                        st.session_state.user_id,
+                        st.session_state.session_id,
+                        user_message,
+                        load_history=lambda: st.session_state.messages[:-1]
+                    )
+                    
+                    # Invoke the agent (this may loop through multiple tool calls)
+                    response = get_aura_graph().invoke(inputs, turn_config(st.session_state.session_id))
+                    
+                    # Extract the final AI response
+                    final_answer = response["chat_history"][-1]
+                    
+                    # Display the response
+                    st.markdown(final_answer.content)
+                    
+                    # Update session state with the AI response
+                    st.session_state.messages.append(final_answer)
+                    
+                    # Save both user message and AI response to database
+                    memory_manager.save_messages(
+                        st.session_state.user_id,
+                        st.session_state.session_id,
+                        [user_message, final_answer]
+                    )
                 
+            except AdmissionRejected as e:
+                # Not an error in the conversation: drop the message so it can be resent
+                st.session_state.messages.pop()
+                st.warning(f"⏳ Aura is busy right now. Please try again in {e.retry_after:.0f} seconds.")
+                st.stop()
+            
             except Exception as e:
                 error_message = f"⚠️ An error occurred: {str(e)}"
                 st.error(error_message)
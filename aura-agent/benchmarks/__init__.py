@@ -0,0 +1,2 @@
+# Aura Agent Benchmarks
+# Offline benchmark suite: run from the aura-agent directory, e.g. `python -m benchmarks.load_test`
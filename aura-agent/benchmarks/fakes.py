@@ -0,0 +1,270 @@
+"""
+Deterministic Local Stand-ins for Benchmarks
+
+Replaces the external services the agent depends on so it can be benchmarked
+offline (laptops, CI runners) with repeatable results:
+
+- FakeChatModel: stands in for AzureChatOpenAI. Emits scripted tool calls
+  (search first, then answer) with configurable latency and token usage.
+- FakeEmbeddings: stands in for AzureOpenAIEmbeddings. Hash-based vectors, so
+  the same text always maps to the same vector.
+- SQLiteChatHistoryManager: the real ChatHistoryManager running on SQLite
+  instead of PostgreSQL, so its SQL and code paths are still exercised.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import tempfile
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from src.memory_manager import ChatHistoryManager
+
+_DEVICE_ID_PATTERN = re.compile(r"\bAURA-[A-Z0-9]+\b", re.IGNORECASE)
+
+
+def _stable_seed(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model with the same interface as the bound AzureChatOpenAI.
+
+    Script per turn (messages after the latest HumanMessage):
+    1. No tool results yet → call search_troubleshooting_guides with the user
+       message (plus check_device_connectivity if an AURA-* ID is present)
+    2. Tool results present → final answer quoting the first result
+
+    Latency is latency_ms ± jitter_ms, derived from the input so runs repeat.
+    """
+
+    latency_ms: float = 800.0
+    jitter_ms: float = 200.0
+    bound_tools: List[str] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-aura-chat"
+
+    def bind_tools(self, tools: List[Any], **kwargs) -> "FakeChatModel":
+        return self.model_copy(update={"bound_tools": [getattr(t, "name", str(t)) for t in tools]})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs) -> ChatResult:
+        prompt_text = "".join(str(m.content) for m in messages)
+        rng = random.Random(_stable_seed(prompt_text))
+        time.sleep(max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        turn = []
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                question = str(message.content)
+                break
+            turn.append(message)
+        else:
+            question = ""
+
+        tool_results = [m for m in turn if isinstance(m, ToolMessage)]
+        if not tool_results and self.bound_tools:
+            tool_calls = [self._tool_call("search_troubleshooting_guides", {"query": question}, rng)]
+            device = _DEVICE_ID_PATTERN.search(question)
+            if device:
+                tool_calls.append(self._tool_call("check_device_connectivity", {"device_id": device.group(0).upper()}, rng))
+            response = AIMessage(content="", tool_calls=tool_calls)
+        else:
+            evidence = str(tool_results[-1].content)[:400] if tool_results else "no tool output"
+            response = AIMessage(content=f"Here is how to resolve this issue:\n1. {evidence}")
+
+        response.usage_metadata = {
+            "input_tokens": len(prompt_text) // 4,
+            "output_tokens": max(1, len(str(response.content)) // 4) + 20 * len(response.tool_calls),
+            "total_tokens": len(prompt_text) // 4 + max(1, len(str(response.content)) // 4),
+        }
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+    @staticmethod
+    def _tool_call(name: str, args: dict, rng: random.Random) -> dict:
+        return {"name": name, "args": args, "id": f"call_{rng.getrandbits(48):012x}", "type": "tool_call"}
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hash-based embeddings: each token adds a pseudo-random unit vector.
+
+    Texts that share words land close together, which is enough for retrieval
+    to return sensible guides while staying fully deterministic.
+    """
+
+    def __init__(self, dimensions: int = 256, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in re.findall(r"[a-z0-9]+(?:-[a-z0-9]+)*", text.lower()):
+            rng = random.Random(_stable_seed(token))
+            for _ in range(4):
+                vector[rng.randrange(self.dimensions)] += rng.choice((-1.0, 1.0))
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def build_fake_retriever(knowledge_base_path: str, embeddings: Embeddings, k: int = 3,
+                         chunk_size: int = 1000, chunk_overlap: int = 100, chunker: Optional[str] = None):
+    """Index the markdown guides into an in-memory vector store and return a retriever."""
+    from src.retrievers import load_knowledge_base_chunks
+
+    documents = load_knowledge_base_chunks(knowledge_base_path, chunk_size, chunk_overlap, chunker=chunker)
+    store = InMemoryVectorStore(embedding=embeddings)
+    store.add_documents(documents)
+    return store.as_retriever(search_kwargs={"k": k})
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    message_type TEXT NOT NULL CHECK (message_type IN ('human', 'ai')),
+    content TEXT NOT NULL,
+    tool_calls TEXT,
+    metadata TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_user_session ON chat_history(user_id, session_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_session ON chat_history(session_id, timestamp);
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    last_message_at INTEGER NOT NULL,
+    title TEXT DEFAULT 'New Conversation',
+    metadata TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    first_question TEXT,
+    last_error_code TEXT,
+    archived_at INTEGER,
+    archive_path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_user_sessions_page ON chat_sessions(user_id, last_message_at DESC, session_id DESC);
+"""
+
+_JSON_COLUMNS = {"tool_calls", "metadata"}
+
+
+class _SQLiteCursor:
+    """psycopg2-style cursor over sqlite3: %s placeholders, Json params, dict rows."""
+
+    def __init__(self, cursor: sqlite3.Cursor, as_dict: bool):
+        self._cursor = cursor
+        self._as_dict = as_dict
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, sql: str, params: tuple = ()):
+        # psycopg2 sends lists as arrays: "= ANY(%s)" becomes "IN (?, ?, ...)" here
+        parts = sql.split("%s")
+        query, flat = parts[0], []
+        for part, param in zip(parts[1:], params):
+            if isinstance(param, list):
+                query = query[:query.rindex("= ANY(")] + "IN (" + (", ".join(["?"] * len(param)) or "NULL")
+                flat.extend(param)
+            else:
+                query += "?"
+                flat.append(json.dumps(param.adapted) if hasattr(param, "adapted") else param)
+            query += part
+        # SQLite serializes writers anyway; row locks have no equivalent
+        query = re.sub(r"\bFOR UPDATE( SKIP LOCKED)?", "", query)
+        self._cursor.execute(query, tuple(flat))
+
+    def _convert(self, row):
+        if row is None or not self._as_dict:
+            return row
+        names = [d[0] for d in self._cursor.description]
+        result = {}
+        for name, value in zip(names, row):
+            if name in _JSON_COLUMNS and isinstance(value, str):
+                value = json.loads(value)
+            result[name] = value
+        return result
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._convert(r) for r in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class _SQLiteConnection:
+    """Minimal psycopg2 connection facade used by ChatHistoryManager."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.create_function("to_regclass", 1, self._to_regclass)
+
+    def _to_regclass(self, name: str):
+        row = self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def cursor(self, cursor_factory=None):
+        return _SQLiteCursor(self._conn.cursor(), as_dict=cursor_factory is not None)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteChatHistoryManager(ChatHistoryManager):
+    """
+    ChatHistoryManager backed by a local SQLite file.
+
+    Only the connection is swapped; every query still goes through the
+    manager's own methods, so DB-stage timings reflect the real code paths.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_history_messages: int = 20):
+        super().__init__(max_history_messages=max_history_messages)
+        self.db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="aura-bench-"), "chat.db")
+        setup = sqlite3.connect(self.db_path)
+        setup.execute("PRAGMA journal_mode=WAL")
+        setup.executescript(SQLITE_SCHEMA)
+        setup.close()
+
+    def _get_connection(self):
+        return _SQLiteConnection(self.db_path)
+
+    def _release_connection(self, conn):
+        conn.close()
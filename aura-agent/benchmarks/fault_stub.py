@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Fault-Injecting Azure OpenAI Stub
+
+A local HTTP server that speaks the Azure OpenAI chat-completions and
+embeddings routes and injects throttling (429 + Retry-After), server errors
+and slow responses at configurable rates. Point the real clients at it to see
+how the resilience layer (src/resilience.py) behaves without touching Azure.
+
+Serve only (then set AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089):
+    python -m benchmarks.fault_stub --port 8089 --throttle-rate 0.2 --slow-rate 0.05
+
+Drive it with the agent's clients, with and without the resilience layer:
+    python -m benchmarks.fault_stub --drive 200 --concurrency 8 --throttle-rate 0.1 --error-rate 0.05 --slow-rate 0.05
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.reporting import print_table, summarize
+
+
+class FaultConfig:
+    def __init__(self, latency_ms: float = 20.0, throttle_rate: float = 0.0, retry_after: float = 0.2,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_ms: float = 3000.0, seed: int = 7):
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "throttled": 0, "errors": 0, "slow": 0}
+
+    def draw(self) -> str:
+        """Fault for the next request: throttle, error, slow or ok."""
+        with self.lock:
+            self.counts["requests"] += 1
+            roll = self.rng.random()
+            for fault, rate, counter in (("throttle", self.throttle_rate, "throttled"),
+                                         ("error", self.error_rate, "errors"),
+                                         ("slow", self.slow_rate, "slow")):
+                if roll < rate:
+                    self.counts[counter] += 1
+                    return fault
+                roll -= rate
+            return "ok"
+
+
+def make_handler(config: FaultConfig):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            fault = config.draw()
+            if fault == "throttle":
+                return self._reply(429, {"error": {"code": "429", "message": "Rate limit exceeded"}},
+                                   {"Retry-After": f"{config.retry_after:g}",
+                                    "retry-after-ms": f"{config.retry_after * 1000:.0f}"})
+            if fault == "error":
+                return self._reply(500, {"error": {"code": "500", "message": "Injected server error"}})
+            time.sleep((config.slow_ms if fault == "slow" else config.latency_ms) / 1000)
+
+            if self.path.split("?")[0].endswith("/embeddings"):
+                inputs = body.get("input", [])
+                inputs = inputs if isinstance(inputs, list) else [inputs]
+                return self._reply(200, {
+                    "object": "list",
+                    "data": [{"object": "embedding", "index": i, "embedding": [0.1] * 8} for i in range(len(inputs))],
+                    "model": "stub-embedding",
+                    "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+                })
+            return self._reply(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": "stub-chat",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Stub answer."}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+            })
+
+        def _reply(self, status: int, payload: dict, headers: dict = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return StubHandler
+
+
+def start_stub(config: FaultConfig, port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub on a daemon thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def drive(endpoint: str, calls: int, concurrency: int, resilient: bool) -> dict:
+    """Send `calls` chat and embedding requests through the agent's clients and time them."""
+    from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+    from src.resilience import ResiliencePolicy, ResilientEmbeddings, RetryPolicy, CircuitBreaker
+
+    common = {"azure_endpoint": endpoint, "api_key": "stub", "api_version": "2024-02-01",
+              "max_retries": 0, "timeout": 2.0}
+    chat = AzureChatOpenAI(azure_deployment="stub-chat", temperature=0, **common)
+    # No tiktoken download: the stub accepts raw strings
+    embeddings = AzureOpenAIEmbeddings(azure_deployment="stub-embedding", check_embedding_ctx_length=False, **common)
+    policies = {}
+    if resilient:
+        # Fresh policies per run so the baseline and resilient runs don't share history
+        policies = {name: ResiliencePolicy(name, retry=RetryPolicy(base_delay=0.05, max_delay=1.0),
+                                           breaker=CircuitBreaker(name, failure_threshold=20, reset_timeout=1.0),
+                                           hedge=hedge, hedge_min_ms=50)
+                    for name, hedge in (("llm", False), ("embeddings", True))}
+        embeddings = ResilientEmbeddings(embeddings, policies["embeddings"])
+
+    def one(i: int) -> tuple:
+        started = time.perf_counter()
+        try:
+            if i % 2:
+                embeddings.embed_query(f"query {i}")
+            elif resilient:
+                policies["llm"].call(chat.invoke, f"question {i}")
+            else:
+                chat.invoke(f"question {i}")
+            ok = True
+        except Exception:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    latencies = [ms for _, ms in results]
+    return {
+        "success_rate": sum(ok for ok, _ in results) / len(results) if results else 0.0,
+        "latency_ms": summarize(latencies),
+        "policies": {name: policy.stats() for name, policy in policies.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault-injecting Azure OpenAI stub")
+    parser.add_argument("--port", type=int, default=8089, help="Port to serve on (serve mode)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Normal response latency")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=3000.0, help="Latency of slow responses")
+    parser.add_argument("--drive", type=int, default=0, help="Run this many client calls against an in-process stub")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client calls in drive mode")
+    parser.add_argument("--json", type=str, help="Write the drive report to this JSON file")
+    args = parser.parse_args()
+
+    def new_config():
+        return FaultConfig(args.latency_ms, args.throttle_rate, args.retry_after,
+                           args.error_rate, args.slow_rate, args.slow_ms)
+
+    if not args.drive:
+        config = new_config()
+        server = start_stub(config, args.port)
+        print(f"Fault stub listening on http://127.0.0.1:{server.server_port} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"\n{config.counts}")
+        return
+
+    report = {}
+    for mode, resilient in (("baseline", False), ("resilient", True)):
+        config = new_config()  # Same seed: both runs see the same fault sequence
+        server = start_stub(config)
+        report[mode] = drive(f"http://127.0.0.1:{server.server_port}", args.drive, args.concurrency, resilient)
+        report[mode]["faults"] = config.counts
+        server.shutdown()
+
+    print_table(
+        ["Mode", "Success", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Stub requests"],
+        [(mode, f"{r['success_rate']:.1%}", f"{r['latency_ms']['p50']:.0f}", f"{r['latency_ms']['p95']:.0f}",
+          f"{r['latency_ms']['p99']:.0f}", f"{r['latency_ms']['max']:.0f}", r["faults"]["requests"])
+         for mode, r in report.items()],
+    )
+    for name, stats in report["resilient"]["policies"].items():
+        print(f"  {name}: {stats}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), **report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
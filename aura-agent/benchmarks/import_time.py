@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Import-Time Benchmark for the Aura Agent
+
+Imports each module in a fresh interpreter with `python -X importtime` and
+reports its cumulative import cost, plus the heaviest packages it pulls in.
+Cold start of the Streamlit worker, the CLI and the API server is dominated
+by these imports, so this catches heavy dependencies creeping back to module
+level.
+
+Usage (from the aura-agent directory):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --modules src.graph src.tools --repeat 5 --max-ms 1500
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.reporting import print_table
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "src.tracing",
+    "src.metrics",
+    "src.retrievers",
+    "src.memory_manager",
+    "src.tools",
+    "src.graph",
+    "src.main_cli",
+    "src.server",
+    "ingest",
+]
+
+# Modules must import without credentials or a database
+BENCHMARK_ENV = {
+    "AZURE_OPENAI_API_KEY": "import-benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://import-benchmark.invalid",
+    "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME": "import-benchmark",
+    "AURA_CHECKPOINTER": "memory",
+}
+
+
+def measure_import(module: str) -> tuple:
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns (total_ms, {top-level package: self ms}) parsed from -X importtime.
+    """
+    env = {**BENCHMARK_ENV, **os.environ}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=AGENT_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    total_us = 0
+    packages = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return total_us / 1000, {name: us / 1000 for name, us in packages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for the Aura agent modules")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest packages to list per module")
+    parser.add_argument("--json", type=str, help="Write the full report to this JSON file")
+    parser.add_argument("--max-ms", type=float, help="Exit non-zero if any module import exceeds this")
+    args = parser.parse_args()
+
+    print(f"Importing {len(args.modules)} modules × {args.repeat} fresh interpreters...\n")
+    results = {}
+    for module in args.modules:
+        try:
+            runs = [measure_import(module) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            print(f"  ✗ {module}: {e}")
+            results[module] = {"error": str(e)}
+            continue
+        totals = [total for total, _ in runs]
+        packages = runs[totals.index(sorted(totals)[len(totals) // 2])][1]
+        heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        results[module] = {
+            "median_ms": statistics.median(totals),
+            "min_ms": min(totals),
+            "max_ms": max(totals),
+            "heaviest_packages_ms": dict(heaviest),
+        }
+
+    print_table(
+        ["Module", "Median ms", "Min ms", "Max ms", "Heaviest packages (self ms)"],
+        [(module, f"{r['median_ms']:.0f}", f"{r['min_ms']:.0f}", f"{r['max_ms']:.0f}",
+          ", ".join(f"{name} {ms:.0f}" for name, ms in r["heaviest_packages_ms"].items()))
+         for module, r in results.items() if "error" not in r],
+    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+    failed = [m for m, r in results.items() if "error" in r]
+    over_budget = [m for m, r in results.items()
+                   if args.max_ms is not None and r.get("median_ms", 0) > args.max_ms]
+    for module in over_budget:
+        print(f"\n❌ {module} import {results[module]['median_ms']:.0f}ms exceeds budget {args.max_ms:.0f}ms")
+    if failed or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
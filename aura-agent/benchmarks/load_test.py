@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Offline Load Test for the Aura Agent
+
+Drives aura_graph and ChatHistoryManager with N concurrent synthetic users,
+using deterministic local stand-ins for Azure OpenAI (chat + embeddings) and
+SQLite instead of PostgreSQL. No network access or credentials are needed,
+so it can run in CI to catch latency regressions.
+
+Usage (from the aura-agent directory):
+    python -m benchmarks.load_test --users 20 --turns 3
+    python -m benchmarks.load_test --users 50 --llm-latency-ms 50 --max-p95-ms 2000 --json report.json
+    python -m benchmarks.load_test --users 50 --embedding-batch-wait-ms 5
+    python -m benchmarks.load_test --users 50 --llm-cache
+    python -m benchmarks.load_test --users 20 --small-llm-latency-ms 250   # tiered small/large routing
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# The real clients are replaced below; placeholders keep module-level setup from failing
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://offline-benchmark.invalid")
+os.environ.setdefault("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "offline-benchmark")
+os.environ.setdefault("AURA_CHECKPOINTER", "memory")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage
+
+from src import graph
+from src.embeddings import MicroBatchingEmbeddings
+from src.graph import prepare_turn_input, turn_config
+from src.llm_cache import LLMResponseCache
+from src.tools import RAGTool
+from src.tracing import tracer
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, SQLiteChatHistoryManager, build_fake_retriever
+from benchmarks.reporting import StageRecorder, print_table, summarize
+
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base")
+
+SYNTHETIC_QUERIES = [
+    "My robot vacuum AURA-1042 keeps losing WiFi and shows E-101",
+    "The vacuum stopped mid-cycle and made an uh-oh sound, error E-205",
+    "Battery drains really fast and the device shows E-300",
+    "Suction is weak on my vacuum cleaner, what should I check?",
+    "Washing machine shows E-501 and won't fill with water",
+    "My laptop won't boot after a spill, error E-601",
+    "The oven is not heating up to the set temperature",
+    "Device shows no lights at all, completely dead even on the dock",
+    "AURA-2231 is offline, can you check it?",
+    "How do I clean the main brush? It seems tangled with hair",
+]
+
+
+def install_fakes(llm_latency_ms: float, llm_jitter_ms: float, embedding_latency_ms: float,
+                  embedding_batch_wait_ms: float = 0.0, small_llm_latency_ms: float = 0.0):
+    """
+    Swap the Azure-backed LLM and retriever for the local stand-ins.
+
+    Returns:
+        The MicroBatchingEmbeddings in front of the fake embeddings, or None if batching is off
+    """
+    graph.llm = FakeChatModel(latency_ms=llm_latency_ms, jitter_ms=llm_jitter_ms).bind_tools(graph.tools)
+    if small_llm_latency_ms > 0:
+        # Same jitter share as the large model
+        graph.small_llm = FakeChatModel(
+            latency_ms=small_llm_latency_ms,
+            jitter_ms=llm_jitter_ms * small_llm_latency_ms / max(llm_latency_ms, 1.0),
+        ).bind_tools(graph.tools)
+    embeddings = FakeEmbeddings(latency_ms=embedding_latency_ms)
+    batcher = None
+    if embedding_batch_wait_ms > 0:
+        embeddings = batcher = MicroBatchingEmbeddings(embeddings, max_wait_ms=embedding_batch_wait_ms)
+    RAGTool._retriever = build_fake_retriever(KNOWLEDGE_BASE_PATH, embeddings)
+    return batcher
+
+
+def run_user(user_index: int, turns: int, memory_manager, seed: int) -> list:
+    """One synthetic user: open a session and run `turns` turns sequentially."""
+    rng = random.Random(seed + user_index)
+    user_id = f"bench_user_{user_index}"
+    session_id = memory_manager.start_new_session(user_id, title="Load test")
+    errors = []
+
+    for _ in range(turns):
+        question = HumanMessage(content=rng.choice(SYNTHETIC_QUERIES))
+        try:
+            with tracer.span("turn", kind="turn", user_id=user_id, session_id=session_id):
+                inputs = prepare_turn_input(
+                    user_id, session_id, question,
+                    load_history=lambda: memory_manager.prepare_agent_context(user_id, session_id),
+                )
+                result = graph.get_aura_graph().invoke(inputs, turn_config(session_id))
+                memory_manager.save_messages(user_id, session_id, [question, result["chat_history"][-1]])
+        except Exception as e:
+            errors.append(f"{user_id}: {e}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Aura agent")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent synthetic users")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per user")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Fake LLM latency per call")
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0, help="Fake LLM latency jitter")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0, help="Fake embedding latency per call")
+    parser.add_argument("--embedding-batch-wait-ms", type=float, default=0.0,
+                        help="Coalesce concurrent query embeddings within this window (0: off)")
+    parser.add_argument("--small-llm-latency-ms", type=float, default=0.0,
+                        help="Route tool-selection steps to a fake small model this fast (0: single model)")
+    parser.add_argument("--llm-cost-per-1k", type=float, default=0.005, help="Large model USD per 1k tokens")
+    parser.add_argument("--small-llm-cost-per-1k", type=float, default=0.0003, help="Small model USD per 1k tokens")
+    parser.add_argument("--llm-cache", action="store_true", help="Serve repeated LLM calls from an in-memory cache")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for query selection")
+    parser.add_argument("--json", type=str, help="Write the full report to this JSON file")
+    parser.add_argument("--max-p95-ms", type=float, help="Exit non-zero if turn p95 exceeds this")
+    args = parser.parse_args()
+
+    batcher = install_fakes(args.llm_latency_ms, args.llm_jitter_ms, args.embedding_latency_ms,
+                            args.embedding_batch_wait_ms, args.small_llm_latency_ms)
+    if args.llm_cache:
+        graph.llm_cache = LLMResponseCache()
+    recorder = StageRecorder()
+    tracer.add_exporter(recorder)
+    memory_manager = SQLiteChatHistoryManager()
+
+    print(f"Running {args.users} users × {args.turns} turns (LLM {args.llm_latency_ms:.0f}ms, "
+          f"embeddings {args.embedding_latency_ms:.0f}ms)...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [pool.submit(run_user, i, args.turns, memory_manager, args.seed) for i in range(args.users)]
+        errors = [e for f in futures for e in f.result()]
+    elapsed = time.perf_counter() - started
+
+    stages = recorder.report()
+    turns = stages.get("turn:turn", summarize([]))
+    print()
+    print(f"Completed {turns['count']} turns in {elapsed:.2f}s "
+          f"→ {turns['count'] / elapsed:.2f} turns/s, {len(errors)} errors")
+    print()
+    print_table(
+        ["Stage", "Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms"],
+        [(stage, s["count"], f"{s['mean']:.1f}", f"{s['p50']:.1f}", f"{s['p95']:.1f}", f"{s['p99']:.1f}")
+         for stage, s in stages.items()],
+    )
+    if batcher is not None:
+        batching = batcher.stats()
+        print(f"\nEmbedding batching: {batching['queries']} queries in {batching['batches']} requests "
+              f"(mean batch {batching['mean_batch_size']:.1f})")
+    llm_cost = 0.0
+    for stage, tokens in recorder.token_usage().items():
+        price = args.small_llm_cost_per_1k if stage.endswith("_small") else args.llm_cost_per_1k
+        llm_cost += (tokens["prompt"] + tokens["completion"]) / 1000 * price
+    print(f"\nEstimated LLM cost: ${llm_cost:.4f} (${llm_cost / max(turns['count'], 1):.5f} per turn)")
+    if graph.llm_cache is not None:
+        cached = graph.llm_cache.stats()
+        print(f"\nLLM cache: {cached['hits']}/{cached['hits'] + cached['misses']} calls served from cache, "
+              f"saved {cached['saved_ms'] / 1000:.1f}s of LLM time and ${cached['saved_usd']:.4f}")
+    for error in errors[:10]:
+        print(f"  ✗ {error}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": vars(args),
+                "elapsed_seconds": elapsed,
+                "throughput_turns_per_second": turns["count"] / elapsed if elapsed else 0.0,
+                "errors": errors,
+                "stages": stages,
+                "llm_tokens": recorder.token_usage(),
+                "llm_cost_usd": llm_cost,
+                "embedding_batching": batcher.stats() if batcher is not None else None,
+                "llm_cache": graph.llm_cache.stats() if graph.llm_cache is not None else None,
+            }, f, indent=2)
+
+    if errors:
+        sys.exit(1)
+    if args.max_p95_ms is not None and turns["p95"] > args.max_p95_ms:
+        print(f"\n❌ Turn p95 {turns['p95']:.1f}ms exceeds budget {args.max_p95_ms:.1f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
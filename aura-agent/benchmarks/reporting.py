@@ -0,0 +1,75 @@
+"""
+Shared helpers for benchmark reports: exact percentiles and table printing.
+"""
+
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of `values` (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """count / mean / p50 / p95 / p99 / max for a list of measurements."""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def print_table(headers, rows):
+    """Simple table printer."""
+    col_widths = [len(str(h)) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row):
+            col_widths[i] = max(col_widths[i], len(str(cell)))
+
+    header_line = " | ".join(str(h).ljust(w) for h, w in zip(headers, col_widths))
+    print(header_line)
+    print("-" * len(header_line))
+    for row in rows:
+        print(" | ".join(str(cell).ljust(w) for cell, w in zip(row, col_widths)))
+
+
+class StageRecorder:
+    """
+    Tracer exporter that keeps every span duration, grouped by stage.
+
+    A stage is "<kind>:<name>" (e.g. "llm:chat_completion", "db:db.save_messages").
+    Benchmarks need exact percentiles over the whole run, so unlike the sliding
+    window histograms used by the app, all values are kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.tokens: Dict[str, Dict[str, int]] = defaultdict(lambda: {"prompt": 0, "completion": 0})
+
+    def export(self, span) -> None:
+        stage = f"{span.kind}:{span.name}"
+        with self._lock:
+            self.durations[stage].append(span.duration_ms)
+            if span.kind == "llm":
+                self.tokens[stage]["prompt"] += span.attributes.get("prompt_tokens", 0)
+                self.tokens[stage]["completion"] += span.attributes.get("completion_tokens", 0)
+
+    def token_usage(self) -> Dict[str, Dict[str, int]]:
+        """Prompt and completion tokens per LLM stage."""
+        with self._lock:
+            return {stage: dict(tokens) for stage, tokens in sorted(self.tokens.items())}
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {stage: summarize(values) for stage, values in sorted(self.durations.items())}
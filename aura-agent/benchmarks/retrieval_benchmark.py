@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Retrieval Quality and Latency Benchmark
+
+Runs a labeled query set (symptom phrasing → expected guide) through each
+retrieval backend and reports recall@k, MRR and latency percentiles, so `k`,
+chunk size and indexes can be tuned with numbers instead of guesses.
+
+Backends:
+- pgvector: the LangChain PGVector collection used by the agent (needs DB + Azure)
+- sql:      one prepared similarity query on knowledge_chunks (AURA_SQL_* settings)
+- lexical:  in-process BM25 over the knowledge base files
+- hybrid:   reciprocal rank fusion of pgvector and lexical
+With --offline, pgvector and sql are replaced by an in-memory store with fake embeddings.
+With --rerank, every backend is also run as "<backend>+rerank": it over-fetches
+--rerank-fetch-k candidates and reranks them (uncached, to measure the cost).
+
+A wrong guide at rank 1 usually costs the agent another search loop, i.e. one
+more LLM round trip, so reranked backends are also reported as rank-1 fixes
+versus added latency.
+
+Usage (from the aura-agent directory):
+    python -m benchmarks.retrieval_benchmark
+    python -m benchmarks.retrieval_benchmark --offline --k 1 3 5 --chunk-size 800
+    python -m benchmarks.retrieval_benchmark --offline --rerank lexical --rerank-fetch-k 12
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.retrievers import KNOWLEDGE_BASE_PATH, HybridRetriever, LexicalRetriever
+from src.reranker import RerankingRetriever, create_scorer
+from benchmarks.reporting import print_table, summarize
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_queries.jsonl")
+
+
+def load_queries(path: str = QUERIES_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def first_relevant_rank(docs: list, expected: str) -> int:
+    """1-based rank of the first chunk from the expected guide, 0 if absent."""
+    for rank, doc in enumerate(docs, start=1):
+        if expected in str(doc.metadata.get("source", "")):
+            return rank
+    return 0
+
+
+def build_base_backends(args, k: int) -> dict:
+    """Create the first-stage retrievers, each returning the top `k` chunks."""
+    chunk_kwargs = {"chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap, "chunker": args.chunker}
+    backends = {"lexical": LexicalRetriever.from_knowledge_base(k=k, **chunk_kwargs)}
+
+    vector = None
+    if args.offline:
+        from benchmarks.fakes import FakeEmbeddings, build_fake_retriever
+        vector = build_fake_retriever(KNOWLEDGE_BASE_PATH, FakeEmbeddings(), k=k, **chunk_kwargs)
+        backends["offline-vector"] = vector
+    else:
+        try:
+            from src.tools import RAGTool
+            vector = RAGTool.get_vector_retriever(k)
+            backends["pgvector"] = vector
+        except Exception as e:
+            print(f"⚠️  Skipping pgvector backend: {e}")
+        try:
+            # Same table ingest.py writes, one prepared query instead of the PGVector ORM path
+            backends["sql"] = RAGTool.get_sql_retriever(k)
+            backends["sql"].invoke("connectivity check")
+        except Exception as e:
+            backends.pop("sql", None)
+            print(f"⚠️  Skipping sql backend: {e}")
+
+    if vector is not None:
+        backends["hybrid"] = HybridRetriever(retrievers=[vector, backends["lexical"]], k=k)
+    return backends
+
+
+def build_backends(args) -> dict:
+    """Create the retrievers to compare, each returning the top max(k) chunks."""
+    max_k = max(args.k)
+    backends = build_base_backends(args, max_k)
+    if args.rerank:
+        fetch_k = max(max_k, args.rerank_fetch_k)
+        scorer = create_scorer(args.rerank)
+        for name, retriever in build_base_backends(args, fetch_k).items():
+            backends[f"{name}+rerank"] = RerankingRetriever(retriever=retriever, scorer=scorer, k=max_k, cache_size=0)
+    return backends
+
+
+def evaluate(retriever, queries: list, ks: list, repeat: int) -> dict:
+    """Recall@k, MRR and latency for one backend."""
+    ranks = []
+    latencies = []
+    for item in queries:
+        retriever.invoke(item["query"])  # warm-up, excluded from timing
+        for _ in range(repeat):
+            start = time.perf_counter()
+            docs = retriever.invoke(item["query"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        ranks.append(first_relevant_rank(docs, item["expected"]))
+
+    return {
+        "recall": {k: sum(1 for r in ranks if 0 < r <= k) / len(ranks) for k in ks},
+        "mrr": sum(1.0 / r for r in ranks if r) / len(ranks),
+        "latency_ms": summarize(latencies),
+        "misses": [q["query"] for q, r in zip(queries, ranks) if r == 0],
+        "ranks": ranks,
+    }
+
+
+def rerank_tradeoff(base: dict, reranked: dict, llm_round_trip_ms: float) -> dict:
+    """
+    Rank-1 fixes and regressions of a reranked backend versus its base, and the
+    estimated net time per query: saved search loops × LLM round trip − added latency.
+    """
+    fixed = sum(1 for b, r in zip(base["ranks"], reranked["ranks"]) if b != 1 and r == 1)
+    broken = sum(1 for b, r in zip(base["ranks"], reranked["ranks"]) if b == 1 and r != 1)
+    added_ms = reranked["latency_ms"]["p50"] - base["latency_ms"]["p50"]
+    saved_loops = (fixed - broken) / len(base["ranks"])
+    return {
+        "rank1_fixed": fixed,
+        "rank1_broken": broken,
+        "added_p50_ms": added_ms,
+        "saved_loops_per_query": saved_loops,
+        "net_ms_per_query": saved_loops * llm_round_trip_ms - added_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="Cutoffs for recall@k")
+    parser.add_argument("--chunker", choices=["markdown", "recursive"], help="Chunking for in-process backends "
+                        "(default: AURA_CHUNKER or markdown)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Chunk size for in-process backends")
+    parser.add_argument("--chunk-overlap", type=int, default=100, help="Chunk overlap for in-process backends")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query")
+    parser.add_argument("--backends", nargs="+", help="Only run these backends")
+    parser.add_argument("--offline", action="store_true", help="Use fake embeddings instead of pgvector/Azure")
+    parser.add_argument("--queries", default=QUERIES_PATH, help="Labeled queries (JSONL with query, expected)")
+    parser.add_argument("--rerank", choices=["lexical", "cross-encoder"], help="Also run reranked backends")
+    parser.add_argument("--rerank-fetch-k", type=int, default=12, help="Candidates fetched before reranking")
+    parser.add_argument("--llm-round-trip-ms", type=float, default=1500.0,
+                        help="Cost of one extra agent search loop, for the rerank trade-off")
+    parser.add_argument("--json", type=str, help="Write the full report to this JSON file")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    backends = build_backends(args)
+    if args.backends:
+        backends = {name: r for name, r in backends.items() if name in args.backends}
+
+    print(f"Evaluating {len(backends)} backends on {len(queries)} labeled queries...\n")
+    results = {name: evaluate(retriever, queries, args.k, args.repeat) for name, retriever in backends.items()}
+
+    headers = ["Backend"] + [f"R@{k}" for k in args.k] + ["MRR", "p50 ms", "p95 ms", "p99 ms"]
+    rows = []
+    for name, r in results.items():
+        rows.append(
+            [name]
+            + [f"{r['recall'][k]:.2f}" for k in args.k]
+            + [f"{r['mrr']:.3f}", f"{r['latency_ms']['p50']:.2f}",
+               f"{r['latency_ms']['p95']:.2f}", f"{r['latency_ms']['p99']:.2f}"]
+        )
+    print_table(headers, rows)
+
+    tradeoffs = {
+        name: rerank_tradeoff(results[name[:-len("+rerank")]], r, args.llm_round_trip_ms)
+        for name, r in results.items() if name.endswith("+rerank") and name[:-len("+rerank")] in results
+    }
+    if tradeoffs:
+        print()
+        print_table(
+            ["Reranked", "Rank-1 fixed", "Rank-1 broken", "Added p50 ms", "Saved loops/query", "Net ms/query"],
+            [(name, t["rank1_fixed"], t["rank1_broken"], f"{t['added_p50_ms']:.2f}",
+              f"{t['saved_loops_per_query']:.3f}", f"{t['net_ms_per_query']:.1f}") for name, t in tradeoffs.items()],
+        )
+
+    for name, r in results.items():
+        for query in r["misses"]:
+            print(f"  ✗ [{name}] no relevant guide in top {max(args.k)}: {query}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results, "rerank_tradeoffs": tradeoffs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,6 @@ import os
 import re
 import psycopg2
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import AzureOpenAIEmbeddings
-import requests
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -28,57 +25,52 @@ load_dotenv()
 DB_CONNECTION_STRING = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 KNOWLEDGE_BASE_PATH = "knowledge_base/"
 
+# --- CHUNKING CONFIG ---
+# markdown: split on ##/### headings (src/chunking.py); recursive: fixed-size 1000/100 splitter
+CHUNKER = os.environ.get("AURA_CHUNKER", "markdown").lower()
+CHUNK_SIZE = int(os.environ.get("AURA_CHUNK_SIZE", "1000"))
+
 
 # --- AZURE CLIENT INITIALIZATION ---
-# Initialize the client for Text Embeddings (from Azure OpenAI)
-text_embeddings_client = AzureOpenAIEmbeddings(
-    azure_deployment=os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
-    api_version=os.environ.get("AZURE_OPENAI_API_VERSION"),
-)
+# The client for Text Embeddings (from Azure OpenAI) is created on first use,
+# so importing this module (e.g. for parse_markdown_and_extract_images) is cheap
+_text_embeddings_client = None
+_image_embedder = None
+
+
+def get_text_embeddings_client():
+    """Return the Azure OpenAI text embeddings client, creating it on first call."""
+    global _text_embeddings_client
+    if _text_embeddings_client is None:
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        _text_embeddings_client = AzureOpenAIEmbeddings(
+            azure_deployment=os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+            api_version=os.environ.get("AZURE_OPENAI_API_VERSION"),
+        )
+        print("Azure clients initialized.")
+    return _text_embeddings_client
 
 
 def get_image_embedding_from_azure_vision(image_data: bytes) -> list[float]:
 
     """
     Generates an embedding for an image using the Azure AI Vision REST API.
-    """
-    vision_endpoint = os.environ.get("AZURE_COMPUTER_VISION_ENDPOINT")
-    vision_key = os.environ.get("AZURE_COMPUTER_VISION_KEY")
-    
-    if not vision_endpoint or not vision_key:
-        print("ERROR: Azure Computer Vision environment variables not set.")
-        return None
-
-    # Ensure the endpoint URL doesn't have a trailing slash before appending the path
-    base_url = vision_endpoint.rstrip('/')
-    
-    # --- Updated API Call Based on Documentation ---
-    # The specific API endpoint for image vectorization
-    api_url = f"{base_url}/computervision/retrieval:vectorizeImage"
-    
-    # Parameters: Updated API version and specific model version
-    params = {
-        "api-version": "2024-02-01", # Updated API version from docs
-        "model-version": "2023-04-15" # Specific model version (multi-lingual)
-    }
-
-    headers = {
-        "Content-Type": "application/octet-stream",
-        "Ocp-Apim-Subscription-Key": vision_key
-    }
-    
 
+    AURA_IMAGE_EMBEDDER=local uses the offline stand-in instead; queries in
+    src/image_search.py must use the same embedder as ingestion.
+    """
+    global _image_embedder
     try:
-        response = requests.post(api_url, params=params, headers=headers, data=image_data, timeout=15)
-        response.raise_for_status() 
-        return response.json()["vector"]
+        if _image_embedder is None:
+            from src.image_search import get_image_embedder
+            _image_embedder = get_image_embedder()
+        return _image_embedder.embed_image(image_data)
     except Exception as e:
         print(f"ERROR: Failed to generate image embedding: {e}")
         return None
 
 
-print("Azure clients initialized.")
-
 def parse_markdown_and_extract_images(file_path):
     """Parses markdown file, extracts image references and cleans the text"""
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -94,10 +86,17 @@ def parse_markdown_and_extract_images(file_path):
 
 def ingest_data():
     """Main function to orchestrate the ingestion of both text and images"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from src.chunking import chunk_markdown, ensure_chunk_metadata_columns
+
+    text_embeddings_client = get_text_embeddings_client()
 
     conn = psycopg2.connect(DB_CONNECTION_STRING)
     cursor = conn.cursor()
 
+    # error_code / section / step_number columns and indexes for prefiltered search
+    ensure_chunk_metadata_columns(cursor)
+
     # Cache to avoid re-embedd the same image if it is referenced multiple times
     processed_images = {}
 
@@ -114,29 +113,50 @@ def ingest_data():
         print(f"\n Found {len(image_refs)} image references")
 
         #2. CHUNK and Embed
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        text_chunks = text_splitter.split_text(clean_text)
-
+        # Heading-aware chunks keep each "Step N" whole and carry section metadata
+        if CHUNKER == "markdown":
+            chunks = [(doc.page_content, doc.metadata) for doc in chunk_markdown(clean_text, document_id, max_chars=CHUNK_SIZE)]
+        else:
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=100)
+            chunks = [(chunk, {}) for chunk in text_splitter.split_text(clean_text)]
+        text_chunks = [text for text, _ in chunks]
+
+        chunk_ids = []
         if text_chunks:
             print(f"Generating text embeddings for {len(text_chunks)} chunks...")
             text_embeddings = text_embeddings_client.embed_documents(text_chunks)
 
-            chunk_ids = []
-            for i, chunk in enumerate(text_chunks):
+            for i, (chunk, metadata) in enumerate(chunks):
                 cursor.execute(
                     """
-                    INSERT INTO knowledge_chunks (document_id, chunk_index, text_content, text_embedding)
-                    VALUES (%s, %s, %s, %s) ON CONFLICT (document_id, chunk_index) DO UPDATE SET
-                    text_content = EXCLUDED.text_content, text_embedding = EXCLUDED.text_embedding
+                    INSERT INTO knowledge_chunks (document_id, chunk_index, text_content, text_embedding,
+                                                  error_code, section, subsection, step_number, heading_path)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (document_id, chunk_index) DO UPDATE SET
+                    text_content = EXCLUDED.text_content, text_embedding = EXCLUDED.text_embedding,
+                    error_code = EXCLUDED.error_code, section = EXCLUDED.section, subsection = EXCLUDED.subsection,
+                    step_number = EXCLUDED.step_number, heading_path = EXCLUDED.heading_path
                     RETURNING id;
                     """,
-                    (document_id, i, chunk, text_embeddings[i])
+                    (document_id, i, chunk, text_embeddings[i],
+                     metadata.get("error_code"), metadata.get("section"), metadata.get("subsection"),
+                     metadata.get("step_number"), metadata.get("heading_path"))
 
                 )
                 chunk_id = cursor.fetchone()[0]
                 chunk_ids.append(chunk_id)
             print(f"Stored {len(chunk_ids)} text chunks in DB")
 
+        # Re-chunking can produce fewer chunks than the previous run; drop the leftovers
+        cursor.execute(
+            "DELETE FROM chunk_image_links WHERE chunk_id IN "
+            "(SELECT id FROM knowledge_chunks WHERE document_id = %s AND chunk_index >= %s)",
+            (document_id, len(chunks)),
+        )
+        cursor.execute(
+            "DELETE FROM knowledge_chunks WHERE document_id = %s AND chunk_index >= %s",
+            (document_id, len(chunks)),
+        )
+
         for image_path in image_refs:
             if image_path in processed_images:
                 image_id = processed_images[image_path]
@@ -177,6 +197,15 @@ def ingest_data():
                 )
             print(f"  Linked image {image_path} to text chunks.")
 
+    # ANN indexes so text and photo search stay fast as the tables grow
+    from src.retrievers import ensure_chunk_index
+    if ensure_chunk_index(cursor):
+        print("Text similarity index ready.")
+
+    from src.image_search import ensure_image_index
+    if ensure_image_index(cursor):
+        print("Image similarity index ready.")
+
             # Commit all changes and close the connection
     conn.commit()
     cursor.close()
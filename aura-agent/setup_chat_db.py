@@ -20,9 +20,11 @@ from dotenv import load_dotenv
 load_dotenv()
 
 CREATE_TABLES_SQL = """
--- Table for storing individual chat messages
+-- Table for storing individual chat messages, partitioned by month of the
+-- message timestamp (epoch ms) so each index stays the size of one month and
+-- expired months are dropped instead of deleted (see src/retention.py)
 CREATE TABLE IF NOT EXISTS chat_history (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     user_id VARCHAR(255) NOT NULL,
     session_id VARCHAR(255) NOT NULL,
     timestamp BIGINT NOT NULL,
@@ -30,10 +32,11 @@ CREATE TABLE IF NOT EXISTS chat_history (
     content TEXT NOT NULL,
     tool_calls JSONB,
     metadata JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
 
--- Indexes for fast retrieval
+-- Indexes for fast retrieval (created on every partition)
 CREATE INDEX IF NOT EXISTS idx_user_session ON chat_history(user_id, session_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_session ON chat_history(session_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_user_timestamp ON chat_history(user_id, timestamp DESC);
@@ -45,17 +48,71 @@ CREATE TABLE IF NOT EXISTS chat_sessions (
     created_at BIGINT NOT NULL,
     last_message_at BIGINT NOT NULL,
     title TEXT DEFAULT 'New Conversation',
-    metadata JSONB
+    metadata JSONB,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    first_question TEXT,
+    last_error_code VARCHAR(16),
+    archived_at BIGINT,
+    archive_path TEXT
 );
 
--- Index for listing user sessions
-CREATE INDEX IF NOT EXISTS idx_user_sessions ON chat_sessions(user_id, last_message_at DESC);
+-- Sidebar summary columns, maintained by ChatHistoryManager.save_messages
+-- (added here for databases created before they existed)
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS first_question TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS last_error_code VARCHAR(16);
+
+-- Archive marker set by the retention job; load_history restores archived sessions
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS archived_at BIGINT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS archive_path TEXT;
+CREATE INDEX IF NOT EXISTS idx_sessions_to_archive ON chat_sessions(last_message_at) WHERE archived_at IS NULL;
+
+-- Index for keyset-paginated session listing (user_id, last_message_at, session_id)
+CREATE INDEX IF NOT EXISTS idx_user_sessions_page ON chat_sessions(user_id, last_message_at DESC, session_id DESC);
+DROP INDEX IF EXISTS idx_user_sessions;
 
 -- Add a comment to describe the schema
 COMMENT ON TABLE chat_history IS 'Stores all chat messages for long-term memory';
 COMMENT ON TABLE chat_sessions IS 'Stores session metadata for conversation management';
 """
 
+# Databases created before partitioning: the old table is renamed (with its
+# index and constraint names) and copied into the partitioned one, then kept
+# as chat_history_unpartitioned for the operator to drop after checking
+RENAME_UNPARTITIONED_SQL = """
+ALTER TABLE chat_history RENAME TO chat_history_unpartitioned;
+ALTER TABLE chat_history_unpartitioned RENAME CONSTRAINT chat_history_pkey TO chat_history_unpartitioned_pkey;
+ALTER INDEX IF EXISTS idx_user_session RENAME TO idx_user_session_unpartitioned;
+ALTER INDEX IF EXISTS idx_session RENAME TO idx_session_unpartitioned;
+ALTER INDEX IF EXISTS idx_user_timestamp RENAME TO idx_user_timestamp_unpartitioned;
+"""
+
+COPY_UNPARTITIONED_SQL = """
+INSERT INTO chat_history (id, user_id, session_id, timestamp, message_type, content, tool_calls, metadata, created_at)
+SELECT id, user_id, session_id, timestamp, message_type, content, tool_calls, metadata, created_at
+FROM chat_history_unpartitioned;
+SELECT setval(pg_get_serial_sequence('chat_history', 'id'),
+              (SELECT COALESCE(MAX(id), 0) + 1 FROM chat_history_unpartitioned), false);
+"""
+
+# One-time fill of the summary columns for sessions saved before they existed
+BACKFILL_SUMMARIES_SQL = """
+UPDATE chat_sessions s
+SET message_count = h.message_count,
+    first_question = LEFT(regexp_replace(h.first_question, '\\s+', ' ', 'g'), 120),
+    last_error_code = h.last_error_code
+FROM (
+    SELECT session_id,
+           COUNT(*) AS message_count,
+           (ARRAY_AGG(content ORDER BY timestamp) FILTER (WHERE message_type = 'human'))[1] AS first_question,
+           UPPER((ARRAY_AGG(substring(content from '(?i)\\m(E-\\d{3})\\M') ORDER BY timestamp DESC)
+                  FILTER (WHERE content ~* '\\mE-\\d{3}\\M'))[1]) AS last_error_code
+    FROM chat_history
+    GROUP BY session_id
+) h
+WHERE s.session_id = h.session_id AND s.message_count = 0;
+"""
+
 def main():
     """Create the chat history tables in the existing PostgreSQL database."""
     
@@ -86,13 +143,48 @@ def main():
         
         print("✅ Connected successfully!\n")
         
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from src.retention import ensure_partitions, is_partitioned
+        
         # Create tables
         print("Creating chat history tables...")
         with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('chat_history') IS NOT NULL")
+            migrate = cur.fetchone()[0] and not is_partitioned(cur)
+            if migrate:
+                print("Converting chat_history to monthly partitions...")
+                cur.execute(RENAME_UNPARTITIONED_SQL)
             cur.execute(CREATE_TABLES_SQL)
+            oldest = None
+            if migrate:
+                cur.execute("SELECT MIN(timestamp) FROM chat_history_unpartitioned")
+                oldest = cur.fetchone()[0]
+            partitions = ensure_partitions(cur, from_ms=oldest,
+                                           months_ahead=int(os.environ.get("AURA_PARTITION_MONTHS_AHEAD", "2")))
+            if migrate:
+                cur.execute(COPY_UNPARTITIONED_SQL)
+            cur.execute(BACKFILL_SUMMARIES_SQL)
+            backfilled = cur.rowcount
             conn.commit()
         
         print("✅ Tables created successfully!\n")
+        if partitions:
+            print(f"✅ Created {len(partitions)} chat_history partitions\n")
+        if migrate:
+            print("✅ Copied existing messages into the partitioned table; drop chat_history_unpartitioned once verified\n")
+        if backfilled:
+            print(f"✅ Backfilled sidebar summaries for {backfilled} existing sessions\n")
+        
+        # LangGraph checkpoint tables (durable agent state keyed by session_id)
+        print("Creating LangGraph checkpoint tables...")
+        try:
+            from src.checkpointing import create_postgres_checkpointer
+            checkpointer = create_postgres_checkpointer(max_connections=1)
+            checkpointer.setup()
+            checkpointer.conn.close()
+            print("✅ Checkpoint tables ready!\n")
+        except ImportError as e:
+            print(f"⚠️  Skipped checkpoint tables ({e}). Install langgraph-checkpoint-postgres to enable them.\n")
         
         # Verify tables were created
         with conn.cursor() as cur:
@@ -115,9 +207,11 @@ def main():
         print("🎉 Setup Complete!")
         print("="*60)
         print("\nYour PostgreSQL database now has:")
-        print("  • chat_history table - stores all messages")
+        print("  • chat_history table - stores all messages, partitioned by month")
         print("  • chat_sessions table - tracks conversation sessions")
+        print("  • checkpoint tables - durable LangGraph state per session")
         print("\nYou can now run your Streamlit app with persistent memory!")
+        print("Schedule `python -m src.retention` (e.g. daily) to create partitions ahead and archive idle sessions.")
         
     except psycopg2.OperationalError as e:
         print(f"❌ Database connection failed: {e}")
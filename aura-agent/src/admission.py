@@ -0,0 +1,250 @@
+# Admission Control for Agent Turns
+# This file caps concurrent agent turns, rate-limits each user with a token
+# bucket, and queues the overflow by priority with fast rejection when full
+
+import os
+import time
+import heapq
+import logging
+import threading
+import itertools
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """A turn was not admitted; `retry_after` is a hint in seconds for the client."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Turn not admitted ({reason}), retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> bool:
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+
+class Ticket:
+    """An admitted turn; release() (or leaving the with-block) frees its slot."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of the agent graph.
+
+    - At most `max_concurrent` turns run at once (Azure quota, DB pool).
+    - Each user_id gets a token bucket of `user_burst` turns refilled at
+      `user_rate_per_minute`, so one client cannot starve the others.
+    - Turns beyond the limit wait in a queue of at most `max_queue`, highest
+      priority first: sessions with a turn in the last `returning_window`
+      seconds go ahead of new sessions, FIFO within a priority.
+    - A full queue, an empty bucket or a wait longer than `queue_timeout`
+      raises AdmissionRejected immediately with a retry hint.
+    """
+
+    MAX_TRACKED = 10000
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 32, queue_timeout: float = 30.0,
+                 user_rate_per_minute: float = 20.0, user_burst: int = 5, returning_window: float = 1800.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate_per_minute / 60
+        self.user_burst = user_burst
+        self.returning_window = returning_window
+        self._condition = threading.Condition()
+        self._active = 0
+        self._queue = []  # heap of (-priority, sequence)
+        self._sequence = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._recent_sessions: "OrderedDict[str, float]" = OrderedDict()
+        self._turn_seconds = deque(maxlen=100)
+        self._wait_ms = deque(maxlen=1000)
+        self.counters = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def priority(self, session_id: Optional[str]) -> int:
+        """1 for a session with a recent turn (a returning user mid-conversation), else 0."""
+        with self._condition:
+            last_turn = self._recent_sessions.get(session_id) if session_id else None
+        return 1 if last_turn is not None and time.monotonic() - last_turn < self.returning_window else 0
+
+    def _retry_hint(self) -> float:
+        """Seconds until a slot is likely free: queue length × mean turn time / concurrency."""
+        mean_turn = sum(self._turn_seconds) / len(self._turn_seconds) if self._turn_seconds else 5.0
+        return max(1.0, round(mean_turn * (len(self._queue) + 1) / self.max_concurrent, 1))
+
+    def _take_user_token(self, user_id: str) -> Optional[float]:
+        """Spend one of the user's tokens; returns the wait in seconds if none is left."""
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            while len(self._buckets) > self.MAX_TRACKED:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user_id)
+        return None if bucket.take() else bucket.seconds_until_token()
+
+    def admit(self, user_id: str, session_id: Optional[str] = None, priority: Optional[int] = None) -> Ticket:
+        """
+        Wait for a turn slot.
+
+        Args:
+            user_id: Rate-limit key
+            session_id: Used for the returning-session priority and remembered once admitted
+            priority: Overrides the session-based priority (higher goes first)
+
+        Returns:
+            A Ticket to release when the turn ends (usable as a context manager)
+
+        Raises:
+            AdmissionRejected: rate_limited, queue_full or queue_timeout
+        """
+        if priority is None:
+            priority = self.priority(session_id)
+        with tracer.span("admission", kind="admission", priority=priority) as span:
+            with self._condition:
+                wait = self._take_user_token(user_id)
+                if wait is not None:
+                    self.counters["rate_limited"] += 1
+                    span.set(rejected=1, queue_depth=len(self._queue))
+                    raise AdmissionRejected("rate_limited", max(1.0, round(wait, 1)))
+
+                if self._active < self.max_concurrent and not self._queue:
+                    return self._admitted(session_id, span, 0.0)
+                if len(self._queue) >= self.max_queue:
+                    self.counters["queue_full"] += 1
+                    span.set(rejected=1, queue_depth=len(self._queue))
+                    raise AdmissionRejected("queue_full", self._retry_hint())
+
+                entry = (-priority, next(self._sequence))
+                heapq.heappush(self._queue, entry)
+                self.counters["queued"] += 1
+                span.set(queued=1, queue_depth=len(self._queue))
+                started = time.monotonic()
+                deadline = started + self.queue_timeout
+                while not (self._queue[0] == entry and self._active < self.max_concurrent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._queue.remove(entry)
+                        heapq.heapify(self._queue)
+                        self._condition.notify_all()
+                        self.counters["queue_timeout"] += 1
+                        span.set(rejected=1)
+                        raise AdmissionRejected("queue_timeout", self._retry_hint())
+                    self._condition.wait(remaining)
+                heapq.heappop(self._queue)
+                # The next waiter may also fit if several slots freed at once
+                self._condition.notify_all()
+                return self._admitted(session_id, span, time.monotonic() - started)
+
+    def _admitted(self, session_id: Optional[str], span, waited: float) -> Ticket:
+        """Called with the condition held."""
+        self._active += 1
+        self.counters["admitted"] += 1
+        self._wait_ms.append(waited * 1000)
+        if session_id:
+            self._recent_sessions[session_id] = time.monotonic()
+            self._recent_sessions.move_to_end(session_id)
+            while len(self._recent_sessions) > self.MAX_TRACKED:
+                self._recent_sessions.popitem(last=False)
+        span.set(wait_ms=round(waited * 1000, 1))
+        return Ticket(self)
+
+    def _release(self, turn_seconds: float) -> None:
+        with self._condition:
+            self._active -= 1
+            self._turn_seconds.append(turn_seconds)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        """Current load and counters; wait percentiles over the last 1000 admissions."""
+        with self._condition:
+            waits = sorted(self._wait_ms)
+            return {
+                "active": self._active,
+                "queue_depth": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "wait_p50_ms": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                **self.counters,
+            }
+
+
+def create_admission_controller(max_concurrent: Optional[int] = None) -> AdmissionController:
+    """
+    Controller configured from the environment: AURA_ADMISSION_MAX_CONCURRENT (8),
+    AURA_ADMISSION_MAX_QUEUE (32), AURA_ADMISSION_QUEUE_TIMEOUT (30 s),
+    AURA_USER_TURNS_PER_MINUTE (20) and AURA_USER_BURST (5).
+    """
+    controller = AdmissionController(
+        max_concurrent=max_concurrent or int(os.environ.get("AURA_ADMISSION_MAX_CONCURRENT", "8")),
+        max_queue=int(os.environ.get("AURA_ADMISSION_MAX_QUEUE", "32")),
+        queue_timeout=float(os.environ.get("AURA_ADMISSION_QUEUE_TIMEOUT", "30")),
+        user_rate_per_minute=float(os.environ.get("AURA_USER_TURNS_PER_MINUTE", "20")),
+        user_burst=int(os.environ.get("AURA_USER_BURST", "5")),
+    )
+    from .tracing import PrometheusExporter
+
+    prometheus = tracer.get_exporter(PrometheusExporter)
+    if prometheus is not None:
+        prometheus.add_gauge("aura_admission_active_turns", "Agent turns running",
+                             lambda: controller.stats()["active"])
+        prometheus.add_gauge("aura_admission_queue_depth", "Agent turns waiting for a slot",
+                             lambda: controller.stats()["queue_depth"])
+    return controller
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Shared controller for this process (the Streamlit app), created on first use."""
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                _admission = create_admission_controller()
+    return _admission
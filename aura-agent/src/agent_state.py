@@ -1,9 +1,42 @@
 # Agent State Management
 # This file contains the state management logic for the Aura agent
 
-from typing import TypedDict, Annotated
-from operator import add
-from langchain_core.messages import BaseMessage
+import os
+from typing import TypedDict, Annotated, List
+from langchain_core.messages import BaseMessage, HumanMessage
+
+# Messages sent to the LLM per call, and kept in the checkpointed chat_history
+CONTEXT_WINDOW_MESSAGES = int(os.environ.get("AURA_CONTEXT_WINDOW", "40"))
+
+def window_messages(messages: List[BaseMessage], max_messages: int) -> List[BaseMessage]:
+    """
+    Keep roughly the last `max_messages` messages, starting at a user message.
+    
+    Cutting at a HumanMessage boundary guarantees no ToolMessage is sent
+    without the AIMessage that requested it. The current turn is always kept.
+    """
+    if len(messages) <= max_messages:
+        return messages
+    start = len(messages) - max_messages
+    for i in range(start, len(messages)):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i:]
+    # A single turn longer than the window: keep it whole from its user message
+    for i in range(start - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i:]
+    return messages
+
+def add_windowed(existing: List[BaseMessage], new: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    chat_history reducer: append, then drop whole turns beyond CONTEXT_WINDOW_MESSAGES.
+    
+    The checkpointer stores the full channel on every node step, so an
+    unbounded list would make each session's checkpoints grow with the whole
+    conversation. The model never sees more than the window anyway; the
+    complete conversation lives in the chat_history table.
+    """
+    return window_messages(existing + new, CONTEXT_WINDOW_MESSAGES)
 
 class AgentState(TypedDict):
     """
@@ -11,7 +44,8 @@ class AgentState(TypedDict):
     
     The state tracks:
     - chat_history: Conversation including user messages, AI responses, and tool results
-      The 'add' reducer ensures messages are appended, not replaced
+      The 'add_windowed' reducer ensures messages are appended, not replaced,
+      and keeps only the last CONTEXT_WINDOW_MESSAGES (whole turns)
     - user_id: Identifies which user this conversation belongs to
     - session_id: Identifies which session within a user's history
     
@@ -20,10 +54,10 @@ class AgentState(TypedDict):
     2. Persistent memory (load/save from database)
     3. User-specific context tracking
     """
-    # The 'add' reducer tells LangGraph to append new messages to the list
+    # The 'add_windowed' reducer tells LangGraph to append new messages to the list
     # Without this, returning {"chat_history": [new_msg]} would REPLACE the entire list
-    # With this, it APPENDS to the existing list
-    chat_history: Annotated[list[BaseMessage], add]
+    # With this, it APPENDS to the existing list (trimmed to the context window)
+    chat_history: Annotated[list[BaseMessage], add_windowed]
     
     # User identification for memory persistence
     user_id: str
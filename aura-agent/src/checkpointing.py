@@ -0,0 +1,63 @@
+# Durable Graph Checkpointing for the Aura Agent
+# This file provides the LangGraph checkpointer that persists agent state per session
+
+import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _postgres_conninfo() -> str:
+    return (
+        f"host={os.environ.get('DB_HOST')} port={os.environ.get('DB_PORT', '5432')} "
+        f"dbname={os.environ.get('DB_NAME')} user={os.environ.get('DB_USER')} "
+        f"password={os.environ.get('DB_PASSWORD')}"
+    )
+
+
+def create_postgres_checkpointer(max_connections: int = 10):
+    """
+    Build a PostgresSaver on a connection pool.
+
+    The pool opens its connections in the background, so this never blocks
+    or fails at import time; checkpoint tables are created by setup_chat_db.py
+    (or by calling .setup() on the returned saver).
+    """
+    from langgraph.checkpoint.postgres import PostgresSaver
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+
+    pool = ConnectionPool(
+        conninfo=_postgres_conninfo(),
+        min_size=1,
+        max_size=max_connections,
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        open=True,
+    )
+    return PostgresSaver(pool)
+
+
+def get_checkpointer():
+    """
+    Return the checkpointer selected by AURA_CHECKPOINTER.
+
+    - postgres (default): durable state in the checkpoint tables of the app database
+    - memory: in-process state, lost on restart (tests, benchmarks)
+    - none: no checkpointing; callers must send the full history every turn
+
+    Falls back to in-memory checkpointing if the Postgres checkpointer
+    packages (langgraph-checkpoint-postgres, psycopg) are not installed.
+    """
+    backend = os.environ.get("AURA_CHECKPOINTER", "postgres").lower()
+    if backend == "none":
+        return None
+
+    if backend == "postgres":
+        try:
+            return create_postgres_checkpointer(int(os.environ.get("AURA_CHECKPOINTER_POOL_SIZE", "10")))
+        except ImportError as e:
+            logger.warning(f"Postgres checkpointer unavailable ({e}); falling back to in-memory checkpoints")
+
+    from langgraph.checkpoint.memory import MemorySaver
+    return MemorySaver()
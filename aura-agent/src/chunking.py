@@ -0,0 +1,155 @@
+# Markdown Structure Chunking for the Aura Knowledge Base
+# This file splits the troubleshooting guides on their ##/### headings and attaches
+# section metadata (error code, section, step number) to every chunk
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_HEADING_PATTERN = re.compile(r"^(#{1,3})\s+(.*?)\s*$")
+_ERROR_CODE_PATTERN = re.compile(r"\bE-\d{3}\b")
+_STEP_PATTERN = re.compile(r"^Step\s+(\d+)\b", re.IGNORECASE)
+_IMAGE_PATTERN = re.compile(r'!\[.*?\]\((.*?)\)')
+
+# The guides use different headings for the same kind of section
+SECTION_ALIASES = {
+    "error code": "error_code",
+    "issue type": "error_code",
+    "symptom": "symptoms",
+    "symptoms": "symptoms",
+    "common error messages": "symptoms",
+    "root cause": "root_cause",
+    "root causes": "root_cause",
+    "resolution steps": "resolution",
+    "troubleshooting steps": "resolution",
+    "advanced troubleshooting": "advanced",
+    "escalation criteria": "escalation",
+    "when to escalate": "escalation",
+    "prevention tips": "prevention",
+    "safety information": "safety",
+    "safety warnings": "safety",
+    "related error codes": "related",
+}
+
+# Metadata columns on knowledge_chunks written by ingest.py (name, SQL type)
+CHUNK_METADATA_COLUMNS = [
+    ("error_code", "TEXT"),
+    ("section", "TEXT"),
+    ("subsection", "TEXT"),
+    ("step_number", "INTEGER"),
+    ("heading_path", "TEXT"),
+]
+
+
+def canonical_section(heading: str) -> str:
+    """Map a ## heading to a stable key: 'Troubleshooting Steps' → 'resolution', 'Error Code: E-401' → 'error_code'."""
+    name = heading.split(":")[0].strip().lower()
+    return SECTION_ALIASES.get(name) or re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """Split a long section at blank lines, then at line breaks, keeping list items whole."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces, current = [], ""
+    for block in re.split(r"\n\s*\n", text):
+        for part in ([block] if len(block) <= max_chars else block.split("\n")):
+            if current and len(current) + len(part) + 2 > max_chars:
+                pieces.append(current.strip())
+                current = ""
+            current += ("\n\n" if current and part is block else "\n" if current else "") + part
+    if current.strip():
+        pieces.append(current.strip())
+    return pieces
+
+
+def chunk_markdown(text: str, document_id: str, max_chars: int = 1500, min_chars: int = 80) -> List[Document]:
+    """
+    Split one guide into chunks along its ## and ### headings.
+
+    Every chunk starts with its heading path (e.g. 'Troubleshooting Guide: Error
+    E-205 > Resolution Steps > Step 2: Access the Main Brush'), so the heading
+    context is embedded with the text. A section longer than `max_chars` is split
+    at paragraph boundaries; a section shorter than `min_chars` (e.g. a bare
+    '## Resolution Steps' intro) is merged into the next chunk of the same ## section.
+
+    Returns:
+        Documents with metadata source, chunk_index, error_code, section,
+        subsection, step_number and heading_path
+    """
+    text = _IMAGE_PATTERN.sub("", text)
+    codes = _ERROR_CODE_PATTERN.findall(document_id) or _ERROR_CODE_PATTERN.findall(text[:500])
+    error_code = codes[0] if codes else None
+
+    # (title, h2, h3, body lines) per heading-delimited block
+    title, h2, h3 = document_id, None, None
+    blocks: List[Tuple[Optional[str], Optional[str], List[str]]] = []
+    for line in text.split("\n"):
+        match = _HEADING_PATTERN.match(line)
+        if match:
+            level, heading = len(match.group(1)), match.group(2)
+            if level == 1:
+                title = heading
+                continue
+            if level == 2:
+                h2, h3 = heading, None
+            else:
+                h3 = heading
+            blocks.append((h2, h3, []))
+        elif blocks:
+            blocks[-1][2].append(line)
+        elif line.strip():
+            blocks.append((None, None, [line]))  # Intro text before the first ## heading
+
+    documents: List[Document] = []
+    carry = ""
+    for i, (section_heading, subsection, lines) in enumerate(blocks):
+        body = "\n".join(lines).strip()
+        next_same_section = i + 1 < len(blocks) and blocks[i + 1][0] == section_heading
+        if len(body) < min_chars and next_same_section:
+            # Short intro such as '## Resolution Steps' followed by '### Step 1'
+            carry += body + "\n\n" if body else ""
+            continue
+        body = (carry + body).strip()
+        carry = ""
+        if not body:
+            continue
+
+        heading_path = " > ".join(h for h in (title, section_heading, subsection) if h)
+        step_match = _STEP_PATTERN.match(subsection or "")
+        metadata = {
+            "source": document_id,
+            "error_code": error_code,
+            "section": canonical_section(section_heading) if section_heading else "overview",
+            "subsection": subsection,
+            "step_number": int(step_match.group(1)) if step_match else None,
+            "heading_path": heading_path,
+        }
+        for piece in _split_oversized(body, max(200, max_chars - len(heading_path) - 2)):
+            documents.append(Document(
+                page_content=f"{heading_path}\n\n{piece}",
+                metadata={**metadata, "chunk_index": len(documents)},
+            ))
+    return documents
+
+
+def infer_chunk_filters(query: str) -> Dict[str, object]:
+    """
+    Metadata filters implied by a query: an exact error code narrows the search
+    to that guide. Queries without a code are not filtered.
+    """
+    codes = _ERROR_CODE_PATTERN.findall(query.upper())
+    return {"error_code": codes[0]} if len(set(codes)) == 1 else {}
+
+
+def ensure_chunk_metadata_columns(cursor) -> None:
+    """Add the section metadata columns and their indexes to knowledge_chunks (idempotent)."""
+    for name, sql_type in CHUNK_METADATA_COLUMNS:
+        cursor.execute(f"ALTER TABLE knowledge_chunks ADD COLUMN IF NOT EXISTS {name} {sql_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS knowledge_chunks_error_code_idx ON knowledge_chunks (error_code)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS knowledge_chunks_section_idx ON knowledge_chunks (section, error_code)")
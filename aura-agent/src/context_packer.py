@@ -0,0 +1,157 @@
+# RAG Context Packer for the Aura Agent
+# This file turns retrieved chunks into compact tool output: adjacent chunks are
+# merged without their overlap, text already sent this turn is skipped, and a
+# per-call character budget is enforced
+
+import os
+import re
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from langchain_core.documents import Document
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+NO_RESULTS_MESSAGE = "No relevant troubleshooting guides found for this query."
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(line: str) -> str:
+    return _WHITESPACE.sub(" ", line).strip().lower()
+
+
+class ContextPacker:
+    """
+    Packs search results for the LLM.
+
+    - Chunks from the same guide are grouped (in order of their best rank) and
+      sorted by chunk_index; consecutive chunks are joined with the splitter
+      overlap removed, gaps are marked with '...'.
+    - Lines already present in earlier tool results of the same turn (or
+      earlier in this result) are dropped; a guide with nothing new left is
+      only mentioned by name.
+    - The output is cut at a line boundary once `max_chars` is reached (the
+      first guide is cut mid-line if no line boundary fits).
+    """
+
+    def __init__(self, max_chars: int = 6000, min_overlap: int = 20, max_overlap: int = 400,
+                 min_dedup_line_chars: int = 30):
+        """
+        Args:
+            max_chars: Character budget for one tool result (0 disables the budget)
+            min_overlap: Shortest suffix/prefix match treated as splitter overlap
+            max_overlap: Longest overlap searched for (above the splitter's chunk_overlap)
+            min_dedup_line_chars: Shorter lines (headings, bullets like '- Reboot') are
+                                  never dropped as duplicates, they carry structure
+        """
+        self.max_chars = max_chars
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.min_dedup_line_chars = min_dedup_line_chars
+
+    def _overlap(self, left: str, right: str) -> int:
+        """Length of the longest suffix of `left` that is a prefix of `right`."""
+        for length in range(min(len(left), len(right), self.max_overlap), self.min_overlap - 1, -1):
+            if left.endswith(right[:length]):
+                return length
+        return 0
+
+    def merge(self, docs: List[Document]) -> "OrderedDict[str, str]":
+        """Group chunks by guide and join them into one text per guide, without overlap."""
+        groups: "OrderedDict[str, List[Document]]" = OrderedDict()
+        for doc in docs:
+            groups.setdefault(str(doc.metadata.get("source", "N/A")), []).append(doc)
+
+        merged = OrderedDict()
+        for source, group in groups.items():
+            if all("chunk_index" in doc.metadata for doc in group):
+                group = sorted(group, key=lambda doc: doc.metadata["chunk_index"])
+            text, previous_index = "", None
+            for doc in group:
+                content = doc.page_content.strip()
+                index = doc.metadata.get("chunk_index")
+                if not text:
+                    text = content
+                elif content in text:
+                    pass  # Same chunk retrieved twice (e.g. by both hybrid retrievers)
+                else:
+                    overlap = self._overlap(text, content)
+                    adjacent = index is not None and previous_index is not None and index == previous_index + 1
+                    if overlap:
+                        text += content[overlap:]
+                    else:
+                        text += ("\n" if adjacent else "\n...\n") + content
+                previous_index = index
+            merged[source] = text
+        return merged
+
+    def _drop_seen_lines(self, text: str, seen_lines: set) -> str:
+        kept, new_lines = [], 0
+        for line in text.split("\n"):
+            key = _normalize(line)
+            if len(key) >= self.min_dedup_line_chars:
+                if key in seen_lines:
+                    continue
+                seen_lines.add(key)
+                new_lines += 1
+            kept.append(line)
+        return "\n".join(kept).strip() if new_lines else ""
+
+    def pack(self, docs: List[Document], seen_texts: Iterable[str] = ()) -> Tuple[str, Dict[str, int]]:
+        """
+        Build the tool result for `docs`.
+
+        Args:
+            docs: Retrieved chunks, best first
+            seen_texts: Tool results already sent to the LLM in this turn
+
+        Returns:
+            (text for the LLM, stats with raw_chars, packed_chars, guides, skipped_guides, truncated)
+        """
+        raw_chars = sum(len(f"Source: {doc.metadata.get('source', 'N/A')}\nContent: {doc.page_content}")
+                        for doc in docs) + 2 * max(0, len(docs) - 1)
+        if not docs:
+            return NO_RESULTS_MESSAGE, {"raw_chars": 0, "packed_chars": len(NO_RESULTS_MESSAGE),
+                                        "guides": 0, "skipped_guides": 0, "truncated": 0}
+
+        # Earlier results are in this same format; the first line of a guide follows "Content: "
+        seen_lines = {_normalize(line[len("Content: "):] if line.startswith("Content: ") else line)
+                      for text in seen_texts for line in text.split("\n")}
+        sections, skipped, truncated, used = [], [], 0, 0
+        for source, text in self.merge(docs).items():
+            text = self._drop_seen_lines(text, seen_lines)
+            if not text:
+                skipped.append(source)
+                continue
+            section = f"Source: {source}\nContent: {text}"
+            remaining = self.max_chars - used - (2 if sections else 0)
+            if self.max_chars and len(section) > remaining:
+                cut = section.rfind("\n", 0, max(0, remaining - 6))
+                if cut > len(f"Source: {source}\nContent: "):
+                    sections.append(section[:cut] + "\n[...]")
+                elif not sections:
+                    # No line boundary fits: hard-cut the best guide rather than return nothing
+                    sections.append(section[:max(0, remaining - 6)] + "\n[...]")
+                truncated = 1
+                break
+            sections.append(section)
+            used += len(section) + (2 if len(sections) > 1 else 0)
+
+        if skipped:
+            note = f"(Already provided earlier in this conversation turn: {', '.join(skipped)})"
+            sections.append(note if sections else f"No new information. {note}")
+        packed = "\n\n".join(sections)
+        return packed, {
+            "raw_chars": raw_chars,
+            "packed_chars": len(packed),
+            "guides": len(sections) - (1 if skipped else 0),
+            "skipped_guides": len(skipped),
+            "truncated": truncated,
+        }
+
+
+# Shared instance, configured from the environment
+context_packer = ContextPacker(max_chars=int(os.environ.get("AURA_CONTEXT_MAX_CHARS", "6000")))
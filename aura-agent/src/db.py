@@ -0,0 +1,67 @@
+# Shared PostgreSQL Access for Knowledge-Base Queries
+# This file contains the connection pool used by the SQL retriever and image search
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def connection_params() -> dict:
+    """psycopg2 connection parameters from the DB_* environment variables."""
+    return {
+        "host": os.environ.get("DB_HOST"),
+        "port": int(os.environ.get("DB_PORT", "5432")),
+        "database": os.environ.get("DB_NAME"),
+        "user": os.environ.get("DB_USER"),
+        "password": os.environ.get("DB_PASSWORD"),
+    }
+
+
+def get_knowledge_pool():
+    """
+    Connection pool for read-only knowledge-base queries, opened on first use.
+
+    AURA_KB_POOL_SIZE sets the maximum number of connections (default 8).
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+
+                max_size = int(os.environ.get("AURA_KB_POOL_SIZE", "8"))
+                _pool = ThreadedConnectionPool(1, max_size, **connection_params())
+                logger.info(f"Opened knowledge-base connection pool (max {max_size})")
+    return _pool
+
+
+@contextmanager
+def knowledge_connection():
+    """
+    Borrow a pooled connection; it is rolled back and returned afterwards.
+
+    If every pooled connection is busy, a one-off connection is used instead
+    of failing the request.
+    """
+    import psycopg2
+    from psycopg2.pool import PoolError
+
+    pool = get_knowledge_pool()
+    try:
+        conn, pooled = pool.getconn(), True
+    except PoolError:
+        conn, pooled = psycopg2.connect(**connection_params()), False
+    try:
+        yield conn
+    finally:
+        if pooled:
+            pool.putconn(conn, close=bool(conn.closed))
+        else:
+            conn.close()
@@ -0,0 +1,180 @@
+# Embedding Cache for the Aura Agent
+# This file contains an in-process LRU cache and a request-coalescing batcher
+# in front of the embeddings client
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LRU cache keyed by the exact text, wrapping any LangChain Embeddings.
+
+    Repeated searches (error codes, the prefetch and the model's own search for
+    the same message) skip the embeddings round trip. Queries and documents
+    share one cache because Azure OpenAI embeds both with the same model.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 2048):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, text: str):
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return vector
+
+    def _store(self, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._lookup(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store(text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed only the uncached texts, in a single batch request."""
+        vectors = [self._lookup(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for text, vector in computed.items():
+                self._store(text, vector)
+            vectors = [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def prime(self, texts: List[str]) -> int:
+        """
+        Embed `texts` ahead of time (e.g. known error codes at startup).
+
+        Returns:
+            Number of texts that were not cached yet
+        """
+        with self._lock:
+            missing = [text for text in dict.fromkeys(texts) if text not in self._cache]
+        if missing:
+            self.embed_documents(missing)
+        return len(missing)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class _PendingQuery:
+    __slots__ = ("text", "done", "vector", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.done = threading.Event()
+        self.vector: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Coalesces concurrent embed_query calls into batched embed_documents requests.
+
+    The first query to arrive opens a window of `max_wait_ms`; queries from other
+    threads arriving in that window join it, and the window closes early once
+    `max_batch_size` are waiting. The opening thread then sends one request for
+    the distinct texts and hands every waiter its vector. With N sessions
+    searching at once this is one Azure round trip (and one rate-limit request)
+    instead of N, at the cost of up to `max_wait_ms` extra latency per query.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[_PendingQuery] = []
+        self._condition = threading.Condition()
+        self.queries = 0
+        self.batches = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        request = _PendingQuery(text)
+        with self._condition:
+            self._pending.append(request)
+            self.queries += 1
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch_size:
+                self._condition.notify_all()
+
+        if not leader:
+            request.done.wait()
+        else:
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            with self._condition:
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending = self._pending, []
+            # Queries that raced past the size check are sent in further batches
+            for start in range(0, len(batch), self.max_batch_size):
+                self._flush(batch[start:start + self.max_batch_size])
+
+        if request.error is not None:
+            raise request.error
+        return request.vector
+
+    def _flush(self, batch: List[_PendingQuery]) -> None:
+        texts = list(dict.fromkeys(request.text for request in batch))
+        with self._condition:
+            self.batches += 1
+        try:
+            with tracer.span("embedding_batch", kind="embedding", queries=len(batch), texts=len(texts)):
+                vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+            for request in batch:
+                request.vector = vectors[request.text]
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Document batches are already batched; they go straight to the client."""
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "queries": self.queries,
+                "batches": self.batches,
+                "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            }
@@ -1,20 +1,35 @@
 # LangGraph State Graph for Aura Agent
 # This file contains the main graph logic for the agent workflow
 
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langchain_openai import AzureChatOpenAI
-from langchain_core.messages import BaseMessage, SystemMessage
-from typing import Dict, Any, Literal
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, HumanMessage, ToolMessage
+from typing import Dict, Any, Literal, Callable, List, Optional
 import os
+import time
+import logging
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables (critical for Azure OpenAI credentials)
 load_dotenv()
 
-from .agent_state import AgentState
+from .agent_state import AgentState, CONTEXT_WINDOW_MESSAGES, window_messages
 # Import all your tools
-from .tools import check_device_connectivity, get_device_error_logs, search_troubleshooting_guides
+from .tools import check_device_connectivity, get_device_error_logs, search_troubleshooting_guides, format_search_results, run_search
+from .prefetch import prefetcher
+from .pre_router import pre_router
+from .tracing import tracer
+from .checkpointing import get_checkpointer
+from .llm_cache import LLMResponseCache, llm_cache, tool_schemas
+from .resilience import get_policy
+
+# Speculative retrieval can be switched off per environment (e.g. to compare latency)
+PREFETCH_ENABLED = os.environ.get("AURA_PREFETCH_ENABLED", "true").lower() == "true"
+
+# Retries, circuit breaking and the degraded answer for LLM calls (see resilience.py)
+RESILIENCE_ENABLED = os.environ.get("AURA_RESILIENCE_ENABLED", "true").lower() == "true"
+
+# Configure logging
+logger = logging.getLogger(__name__)
 
 # System prompt that guides the LLM's decision-making
 SYSTEM_PROMPT = """You are Aura, an expert IoT troubleshooting assistant. Your goal is to help users diagnose and resolve issues with their IoT devices.
@@ -29,13 +44,123 @@ Be concise, helpful, and prioritize the most likely solutions first. Always expl
 
 # Initialize tools and the main LLM
 tools = [check_device_connectivity, get_device_error_logs, search_troubleshooting_guides]
-tool_node = ToolNode(tools)
+tools_by_name = {t.name: t for t in tools}
 
-llm = AzureChatOpenAI(
-    azure_deployment=os.environ.get("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
-    api_version=os.environ.get("OPENAI_API_VERSION", "2024-02-15-preview"),
-    temperature=0).bind_tools(tools)
+# The LLM client and the compiled graph are built on first use (see get_llm /
+# get_aura_graph), so importing this module stays cheap for the CLI, the
+# Streamlit worker and the benchmarks
+_init_lock = threading.RLock()
+
+def get_llm():
+    """
+    Return the tool-bound chat model, creating the Azure client on first call.
+    
+    Assigning `graph.llm` (e.g. a fake model in the benchmarks) replaces it.
+    With two or more deployments in AURA_LLM_DEPLOYMENTS, this is a
+    DeploymentRouter that balances calls across them (see llm_router.py).
+    """
+    llm = globals().get("llm")
+    if llm is None:
+        with _init_lock:
+            llm = globals().get("llm")
+            if llm is None:
+                from langchain_openai import AzureChatOpenAI
+                from .llm_router import create_router
+                
+                timeout = float(os.environ.get("AURA_LLM_TIMEOUT_SECONDS", "30"))
+                # A throttled deployment should spill over at once, not be retried in place
+                llm = create_router(tools, max_retries=0, timeout=timeout)
+                if llm is None:
+                    # With the resilience layer on, it does the retrying (honoring Retry-After)
+                    retry_kwargs = {"max_retries": 0, "timeout": timeout} if RESILIENCE_ENABLED else {}
+                    llm = AzureChatOpenAI(
+                        azure_deployment=os.environ.get("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"),
+                        api_version=os.environ.get("OPENAI_API_VERSION", "2024-02-15-preview"),
+                        temperature=0, **retry_kwargs).bind_tools(tools)
+                globals()["llm"] = llm
+    return llm
 
+def get_small_llm():
+    """
+    Return the tool-bound small model for tool-selection steps, or None if
+    AURA_SMALL_CHAT_DEPLOYMENT_NAME is not set (every step uses get_llm()).
+    
+    Assigning `graph.small_llm` replaces it, like `graph.llm`.
+    """
+    small_llm = globals().get("small_llm")
+    deployment = os.environ.get("AURA_SMALL_CHAT_DEPLOYMENT_NAME")
+    if small_llm is None and deployment:
+        with _init_lock:
+            small_llm = globals().get("small_llm")
+            if small_llm is None:
+                from langchain_openai import AzureChatOpenAI
+                
+                retry_kwargs = {"max_retries": 0, "timeout": float(os.environ.get("AURA_LLM_TIMEOUT_SECONDS", "30"))} \
+                    if RESILIENCE_ENABLED else {}
+                small_llm = AzureChatOpenAI(
+                    azure_deployment=deployment,
+                    api_version=os.environ.get("OPENAI_API_VERSION", "2024-02-15-preview"),
+                    temperature=0, **retry_kwargs).bind_tools(tools)
+                globals()["small_llm"] = small_llm
+    return small_llm
+
+def routing_stats() -> Optional[List[dict]]:
+    """Per-deployment load and routing counters when the LLM router is in use, else None."""
+    from .llm_router import DeploymentRouter
+    
+    llm = globals().get("llm")
+    return llm.stats() if isinstance(llm, DeploymentRouter) else None
+
+def _latest_user_message(state: AgentState):
+    """Return the most recent HumanMessage in the chat history, if any."""
+    for message in reversed(state["chat_history"]):
+        if isinstance(message, HumanMessage):
+            return message
+    return None
+
+@tracer.traced("prefetch", kind="node")
+def start_prefetch(state: AgentState) -> dict:
+    """
+    Entry node: kick off retrieval for the raw user message in the background.
+    
+    The retrieval runs concurrently with the first call_model. When the model's
+    search_troubleshooting_guides call arrives, execute_tools serves it from this
+    prefetch if the queries match closely enough. This node never blocks and
+    never changes the state.
+    """
+    user_message = _latest_user_message(state)
+    if PREFETCH_ENABLED and user_message is not None and user_message.content:
+        prefetcher.start(state.get("session_id", "default"), user_message.content)
+    return {}
+
+@tracer.traced("pre_router", kind="node")
+def pre_route(state: AgentState) -> dict:
+    """
+    Issue the obvious tool calls for the new user message without the LLM.
+    
+    If the message contains an error code or AURA-* device ID, the pre-router
+    returns the AIMessage the model would have produced (e.g. a search for
+    'E-205'), and the graph goes straight to the tools. Otherwise nothing is
+    added and the agent decides as usual.
+    """
+    last_message = state["chat_history"][-1] if state["chat_history"] else None
+    if not isinstance(last_message, HumanMessage):
+        return {}
+    routed = pre_router.route(last_message.content)
+    tracer.current_span().set(routed=routed is not None)
+    if routed is None:
+        return {}
+    print(f"---PRE-ROUTER: {len(routed.tool_calls)} tool calls issued without the LLM---")
+    return {"chat_history": [routed]}
+
+def after_pre_route(state: AgentState) -> Literal["tools", "agent"]:
+    """Go straight to the tools if the pre-router issued calls, otherwise ask the LLM."""
+    last_message = state["chat_history"][-1]
+    if getattr(last_message, "tool_calls", None):
+        return "tools"
+    return "agent"
+
+@tracer.traced("agent", kind="node")
 def call_model(state: AgentState) -> dict:
     """
     The primary node for the agent's reasoning loop.
@@ -46,19 +171,132 @@ def call_model(state: AgentState) -> dict:
     - It sees it has tools like search_troubleshooting_guides
     - It autonomously decides: "I should call search_troubleshooting_guides with query='E-401'"
     - Returns an AIMessage with tool_calls=[{name: 'search_troubleshooting_guides', args: {...}}]
+    
+    With a small deployment configured, steps before any tool result in the
+    turn go to the small model; the large model writes the answer and takes
+    over whenever the small model's response is unusable (_escalation_reason).
     """
     print(f"---CALLING LLM for user: {state.get('user_id', 'unknown')}---")
-    messages = state["chat_history"]
+    messages = window_messages(state["chat_history"], CONTEXT_WINDOW_MESSAGES)
     
     # Ensure system prompt is always at the start of the conversation
     if not messages or not isinstance(messages[0], SystemMessage):
         messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
     
-    response = llm.invoke(messages)
+    small_llm = get_small_llm()
+    cache_key = None
+    if llm_cache is not None:
+        # Exact replay of an earlier call (temperature 0): no LLM span, no tokens
+        with tracer.span("llm_cache", kind="cache") as span:
+            cache_key = _llm_cache_key(messages, tiered=small_llm is not None)
+            response = llm_cache.get(cache_key)
+            span.set(llm_cache_hit=response is not None)
+        if response is not None:
+            print("---LLM CACHE HIT---")
+            return {"chat_history": [response]}
+    
+    try:
+        try:
+            response = None
+            if small_llm is not None and not _turn_tool_outputs(messages):
+                # Nothing retrieved yet this turn: this step picks tools, the small model's job
+                started = time.perf_counter()
+                try:
+                    response = _complete(small_llm, messages, "small")
+                    reason = _escalation_reason(response)
+                except Exception as e:
+                    logger.warning(f"Small model failed ({e}), escalating")
+                    reason = "error"
+                if reason:
+                    print(f"---ESCALATING TO LARGE MODEL ({reason})---")
+                    tracer.current_span().set(escalated=reason)
+                    response = None
+            if response is None:
+                started = time.perf_counter()
+                response = _complete(get_llm(), messages, "large")
+        except Exception as e:
+            if not RESILIENCE_ENABLED:
+                raise
+            logger.error(f"LLM call failed after retries: {e}")
+            return {"chat_history": [degraded_response(state["chat_history"])]}
+        if cache_key is not None:
+            llm_cache.put(cache_key, response, (time.perf_counter() - started) * 1000)
+    finally:
+        if cache_key is not None:
+            llm_cache.release(cache_key)
     # The response is an AIMessage that can contain tool_calls
-    # Thanks to the 'add' reducer in AgentState, this will APPEND to chat_history
+    # Thanks to the 'add_windowed' reducer in AgentState, this will APPEND to chat_history
     return {"chat_history": [response]}
 
+def degraded_response(chat_history: List[BaseMessage]) -> AIMessage:
+    """
+    Final answer used when the LLM is unavailable (retries exhausted or circuit open).
+    
+    If this turn already retrieved a guide, its text is returned as-is so the
+    user still gets the troubleshooting steps; otherwise the user is asked to retry.
+    """
+    for message in reversed(chat_history):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and str(message.content).startswith("Source:"):
+            return AIMessage(content=(
+                "I can't reach the assistant service right now, so here is the most relevant "
+                f"troubleshooting guide I found:\n\n{message.content}"
+            ))
+    return AIMessage(content="I'm having trouble reaching the assistant service right now. "
+                             "Please try again in a minute.")
+
+def _complete(model, messages: List[BaseMessage], tier: str) -> AIMessage:
+    """One chat completion on `model` through the resilience layer, traced per tier."""
+    span_name = "chat_completion" if tier == "large" else f"chat_completion_{tier}"
+    with tracer.span(span_name, kind="llm", messages=len(messages), tier=tier) as span:
+        if RESILIENCE_ENABLED:
+            response = get_policy("llm" if tier == "large" else f"llm_{tier}").call(model.invoke, messages)
+        else:
+            response = model.invoke(messages)
+        usage = getattr(response, "usage_metadata", None) or {}
+        span.set(
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+            tool_calls=len(response.tool_calls),
+        )
+    return response
+
+def _escalation_reason(response: AIMessage) -> Optional[str]:
+    """
+    Why a small-model response must be redone by the large model, or None to keep it.
+    
+    Malformed calls, unknown tools and missing required arguments are
+    escalated, and so is a direct answer: user-facing text comes from the
+    large model unless AURA_SMALL_MODEL_FINAL_ANSWERS is true.
+    """
+    if getattr(response, "invalid_tool_calls", None):
+        return "invalid_tool_call"
+    if not response.tool_calls:
+        if os.environ.get("AURA_SMALL_MODEL_FINAL_ANSWERS", "false").lower() == "true":
+            return None
+        return "final_answer"
+    for tool_call in response.tool_calls:
+        selected = tools_by_name.get(tool_call["name"])
+        if selected is None:
+            return "unknown_tool"
+        required = selected.tool_call_schema.model_json_schema().get("required", [])
+        if any(tool_call["args"].get(arg) in (None, "") for arg in required):
+            return "missing_arguments"
+    return None
+
+_tool_schemas = None
+
+def _llm_cache_key(messages: List[BaseMessage], tiered: bool = False) -> str:
+    """Cache key for an LLM call: deployment(s), bound tool schemas and the messages."""
+    global _tool_schemas
+    if _tool_schemas is None:
+        _tool_schemas = tool_schemas(tools)
+    model = os.environ.get("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "")
+    if tiered:
+        model += "|" + os.environ.get("AURA_SMALL_CHAT_DEPLOYMENT_NAME", "small")
+    return LLMResponseCache.key(model, _tool_schemas, messages)
+
 # Define the conditional edge
 def should_continue(state: AgentState) -> Literal["tools", "end"]:
     """The router that decides what to do next."""
@@ -66,39 +304,137 @@ def should_continue(state: AgentState) -> Literal["tools", "end"]:
     if last_message.tool_calls:
         # If the LLM requested to call a tool, we route to the tool node
         return "tools"
-    # Otherwise, we are done
+    # Otherwise, we are done - any unused prefetch is discarded
+    prefetcher.discard(state.get("session_id", "default"))
     return "end"
 
-def create_aura_graph() -> StateGraph:
+@tracer.traced("tools", kind="node")
+def execute_tools(state: AgentState) -> dict:
+    """
+    Run the tool calls requested by the last AIMessage.
+    
+    search_troubleshooting_guides calls are served from the speculative prefetch
+    when it matches; every other call is executed normally. Search results skip
+    guide text already returned by earlier tool calls in this turn. Tool errors
+    are returned to the LLM as ToolMessages so it can recover instead of crashing the turn.
+    """
+    session_key = state.get("session_id", "default")
+    seen_texts = _turn_tool_outputs(state["chat_history"])
+    results = []
+    for tool_call in state["chat_history"][-1].tool_calls:
+        with tracer.span(tool_call["name"], kind="tool") as span:
+            result = _run_tool_call(tool_call, session_key, span, seen_texts)
+        seen_texts.append(str(result.content))
+        results.append(result)
+    return {"chat_history": results}
+
+def _turn_tool_outputs(messages: List[BaseMessage]) -> List[str]:
+    """Contents of the ToolMessages since the latest user message."""
+    outputs = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage):
+            outputs.append(str(message.content))
+    return outputs
+
+def _run_tool_call(tool_call: dict, session_key: str, span, seen_texts: List[str]) -> ToolMessage:
+    """Execute one tool call, recording whether it was served from the prefetch."""
+    if tool_call["name"] == search_troubleshooting_guides.name:
+        query = tool_call["args"].get("query", "")
+        docs = prefetcher.claim(session_key, query)
+        span.set(cache_hit=docs is not None)
+        if docs is not None:
+            print(f"--- RAG TOOL: Served '{query}' from prefetch ---")
+            span.set(retrieved_chunks=len(docs))
+            content = format_search_results(docs, seen_texts)
+        else:
+            content = run_search(query, seen_texts)
+        return ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"])
+    
+    selected_tool = tools_by_name.get(tool_call["name"])
+    if selected_tool is None:
+        span.status = "error"
+        return ToolMessage(
+            content=f"Error: {tool_call['name']} is not a valid tool, try one of {list(tools_by_name)}.",
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            status="error",
+        )
+    
+    try:
+        # Invoking a tool with the full ToolCall returns a ToolMessage
+        return selected_tool.invoke(tool_call)
+    except Exception as e:
+        logger.error(f"Tool {tool_call['name']} failed: {e}")
+        span.status = "error"
+        span.error = str(e)
+        return ToolMessage(
+            content=f"Error: {e}. Please fix your mistakes.",
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            status="error",
+        )
+
+def create_aura_graph(checkpointer=None):
     """
     Create and return the main Aura agent graph.
     
     Graph Flow:
     1. User query enters the graph
+       prefetch node: starts retrieval for the user message in the background
+       pre_router node: rule-based tool calls for error codes / device IDs,
+       skipping straight to the tools node when a rule fires
     2. call_model node: LLM reasons about the query and decides next action
     3. should_continue router: Checks if LLM wants to use tools
        - If tool_calls exist → route to "tools" node
        - If no tool_calls → route to "end" (done)
-    4. tools node: Executes requested tools and adds results to chat history
+    4. tools node: Executes requested tools (serving searches from the prefetch
+       when it matches) and adds results to chat history
     5. Loop back to call_model to process tool results
     6. Continue until LLM is satisfied and provides final answer
     
+    Args:
+        checkpointer: Optional LangGraph checkpointer. With one, state is saved
+                      after every node under thread_id = session_id, so callers
+                      only send the new user message (see prepare_turn_input)
+                      and an interrupted tool loop can be resumed.
+    
     Returns:
         Compiled StateGraph ready to invoke
     """
     
+    from langgraph.graph import StateGraph, END
+    
     # Initialize the state graph with our AgentState schema
     graph = StateGraph(AgentState)
     
     # Add nodes to the graph
+    # Node 0: Speculative retrieval, runs alongside the first LLM call
+    graph.add_node("prefetch", start_prefetch)
+    
     # Node 1: The agent's reasoning loop (calls the LLM)
     graph.add_node("agent", call_model)
     
     # Node 2: Tool execution node (runs the tools requested by LLM)
-    graph.add_node("tools", tool_node)
+    graph.add_node("tools", execute_tools)
+    
+    # Node 0b: Deterministic tool selection for messages with error codes / device IDs
+    graph.add_node("pre_router", pre_route)
     
     # Set the entry point - where the graph starts
-    graph.set_entry_point("agent")
+    graph.set_entry_point("prefetch")
+    graph.add_edge("prefetch", "pre_router")
+    
+    # If the pre-router already issued tool calls, the first LLM call is skipped
+    graph.add_conditional_edges(
+        "pre_router",
+        after_pre_route,
+        {
+            "tools": "tools",
+            "agent": "agent"
+        }
+    )
     
     # Add conditional edge from agent node
     # After the agent reasons, we check if it wants to use tools
@@ -116,8 +452,99 @@ def create_aura_graph() -> StateGraph:
     graph.add_edge("tools", "agent")
     
     # Compile the graph into a runnable
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+def turn_config(session_id: str) -> dict:
+    """Graph config for a session: the checkpoint thread is the session."""
+    return {"configurable": {"thread_id": session_id}}
+
+
+def resume_interrupted_turn(session_id: str) -> List[BaseMessage]:
+    """
+    Finish the session's previous turn if it was interrupted mid tool-loop (e.g. a crash).
+    
+    Call it inside the admitted turn span, before prepare_turn_input(). The resume
+    is attempted once: if it fails, its unanswered tool calls are closed and a
+    note is recorded in the checkpoint, so the session is not blocked by a turn
+    that fails every time.
+    
+    Args:
+        session_id: Session (checkpoint thread) to check
+        
+    Returns:
+        [question, answer] of the interrupted turn for the caller to show and
+        persist, or [] when there was nothing to resume
+    """
+    aura_graph = get_aura_graph()
+    if aura_graph.checkpointer is None:
+        return []
+    config = turn_config(session_id)
+    snapshot = aura_graph.get_state(config)
+    history = snapshot.values.get("chat_history") or []
+    if not snapshot.next or not history:
+        return []
+    
+    question = next((m for m in reversed(history) if isinstance(m, HumanMessage)), None)
+    logger.info(f"Resuming interrupted turn for session {session_id} at {snapshot.next}")
+    try:
+        answer = aura_graph.invoke(None, config)["chat_history"][-1]
+    except Exception as e:
+        logger.error(f"Resuming the interrupted turn for session {session_id} failed, dropping it: {e}")
+        # Answer the pending tool calls so the history stays valid for the LLM,
+        # then end the turn as the agent node: nothing is left to resume.
+        # Re-read the state, the failed run may have checkpointed some steps
+        history = aura_graph.get_state(config).values.get("chat_history") or history
+        answered = {m.tool_call_id for m in history if isinstance(m, ToolMessage)}
+        closing = [
+            ToolMessage(content="Error: the request was interrupted before this tool finished.",
+                        name=call["name"], tool_call_id=call["id"])
+            for m in history if isinstance(m, AIMessage)
+            for call in (m.tool_calls or []) if call["id"] not in answered
+        ]
+        answer = AIMessage(content="⚠️ Your previous request was interrupted and could not be completed. Please ask again.")
+        aura_graph.update_state(config, {"chat_history": closing + [answer]}, as_node="agent")
+    return [question, answer] if question is not None else [answer]
+
+
+def prepare_turn_input(user_id: str, session_id: str, new_message: BaseMessage,
+                       load_history: Callable[[], List[BaseMessage]]) -> dict:
+    """
+    Build the graph input for one turn.
+    
+    With a checkpointer and saved state for the session, only the new message
+    is sent; the 'add_windowed' reducer appends it to the checkpointed chat_history.
+    Otherwise (no checkpointer, or a session that predates checkpointing) the
+    history from load_history() is sent once to seed the thread.
+    
+    An interrupted previous turn must be handled with resume_interrupted_turn()
+    first.
+    """
+    aura_graph = get_aura_graph()
+    if aura_graph.checkpointer is not None:
+        snapshot = aura_graph.get_state(turn_config(session_id))
+        if snapshot.values.get("chat_history"):
+            return {"chat_history": [new_message], "user_id": user_id, "session_id": session_id}
+    
+    return {"chat_history": list(load_history()) + [new_message], "user_id": user_id, "session_id": session_id}
+
+
+def get_aura_graph():
+    """Return the shared compiled graph, building it (and its checkpointer) on first call."""
+    aura_graph = globals().get("aura_graph")
+    if aura_graph is None:
+        with _init_lock:
+            aura_graph = globals().get("aura_graph")
+            if aura_graph is None:
+                aura_graph = create_aura_graph(checkpointer=get_checkpointer())
+                globals()["aura_graph"] = aura_graph
+    return aura_graph
 
 
-# For easy import
-aura_graph = create_aura_graph()
\ No newline at end of file
+# For easy import: `from src.graph import aura_graph` still works and builds on first access
+def __getattr__(name: str):
+    if name == "aura_graph":
+        return get_aura_graph()
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,228 @@
+# Image Similarity Search for the Aura Agent
+# This file finds the troubleshooting guide chunks linked to the knowledge-base
+# images most similar to a user's photo (knowledge_images → chunk_image_links → knowledge_chunks)
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from .db import knowledge_connection
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Name of the ANN index on knowledge_images.image_embedding
+IMAGE_INDEX_NAME = "knowledge_images_embedding_hnsw"
+
+# Nearest images first, then every chunk linked to them, in one round trip
+IMAGE_SEARCH_SQL = """
+    WITH nearest AS (
+        SELECT id, image_path, image_embedding <=> %(vector)s::vector AS distance
+        FROM knowledge_images
+        ORDER BY image_embedding <=> %(vector)s::vector
+        LIMIT %(images)s
+    )
+    SELECT n.image_path, n.distance, kc.document_id, kc.chunk_index, kc.text_content
+    FROM nearest n
+    JOIN chunk_image_links cil ON cil.image_id = n.id
+    JOIN knowledge_chunks kc ON kc.id = cil.chunk_id
+    ORDER BY n.distance, kc.document_id, kc.chunk_index
+"""
+
+
+class AzureVisionImageEmbedder:
+    """Image embeddings from the Azure AI Vision vectorizeImage REST API (1024 dimensions)."""
+
+    API_VERSION = "2024-02-01"
+    MODEL_VERSION = "2023-04-15"
+
+    def __init__(self, endpoint: Optional[str] = None, key: Optional[str] = None, timeout: float = 15.0):
+        import requests
+
+        self.endpoint = (endpoint or os.environ.get("AZURE_COMPUTER_VISION_ENDPOINT") or "").rstrip("/")
+        self.key = key or os.environ.get("AZURE_COMPUTER_VISION_KEY")
+        if not self.endpoint or not self.key:
+            raise ValueError("AZURE_COMPUTER_VISION_ENDPOINT and AZURE_COMPUTER_VISION_KEY must be set")
+        self.timeout = timeout
+        # One session keeps the HTTPS connection open between photos
+        self._session = requests.Session()
+
+    def embed_image(self, image_data: bytes) -> List[float]:
+        """Vectorize one image; throttling and transient errors are retried (see resilience.py)."""
+        from .resilience import get_policy
+
+        return get_policy("image_embedding").call(self._vectorize, image_data)
+
+    def _vectorize(self, image_data: bytes) -> List[float]:
+        response = self._session.post(
+            f"{self.endpoint}/computervision/retrieval:vectorizeImage",
+            params={"api-version": self.API_VERSION, "model-version": self.MODEL_VERSION},
+            headers={"Content-Type": "application/octet-stream", "Ocp-Apim-Subscription-Key": self.key},
+            data=image_data,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["vector"]
+
+
+class LocalImageEmbedder:
+    """
+    Deterministic offline stand-in for the Azure embedder (tests, local development).
+
+    Hashes byte bigrams of the file into a normalized histogram: identical
+    images get identical vectors and no network or credentials are needed.
+    It does not capture visual similarity, so ingest and query must both use it.
+    """
+
+    def __init__(self, dimensions: int = 1024, max_samples: int = 65536):
+        self.dimensions = dimensions
+        self.max_samples = max_samples
+
+    def embed_image(self, image_data: bytes) -> List[float]:
+        vector = [0.0] * self.dimensions
+        step = max(1, len(image_data) // self.max_samples)
+        for i in range(0, len(image_data) - 1, step):
+            vector[(image_data[i] * 256 + image_data[i + 1]) % self.dimensions] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+
+def get_image_embedder():
+    """Return the image embedder selected by AURA_IMAGE_EMBEDDER: azure (default) or local."""
+    if os.environ.get("AURA_IMAGE_EMBEDDER", "azure").lower() == "local":
+        return LocalImageEmbedder()
+    return AzureVisionImageEmbedder()
+
+
+def ensure_image_index(cursor) -> bool:
+    """
+    Create the HNSW cosine index on knowledge_images.image_embedding if missing.
+
+    Needs pgvector >= 0.5 and a column with fixed dimensions (vector(1024));
+    returns False (exact scan is used instead) if it cannot be created.
+    """
+    try:
+        cursor.execute("SAVEPOINT image_index")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {IMAGE_INDEX_NAME} "
+            "ON knowledge_images USING hnsw (image_embedding vector_cosine_ops)"
+        )
+        cursor.execute("RELEASE SAVEPOINT image_index")
+        return True
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT image_index")
+        logger.warning(f"Could not create {IMAGE_INDEX_NAME}, image search will scan: {e}")
+        return False
+
+
+class ImageSearch:
+    """
+    Photo → similar knowledge-base images → linked guide chunks.
+
+    Results are cached by the SHA-256 of the image bytes, so re-uploads and
+    reruns of the same photo skip both the embedding call and the database.
+    """
+
+    def __init__(self, embedder=None, max_images: int = 3, max_chunks: int = 5,
+                 ef_search: Optional[int] = None, cache_size: int = 256):
+        """
+        Args:
+            embedder: Object with embed_image(bytes) -> List[float] (default: get_image_embedder())
+            max_images: Nearest knowledge-base images to consider
+            max_chunks: Maximum chunks returned (best image distance first)
+            ef_search: hnsw.ef_search for the query; higher is more accurate and slower
+            cache_size: Photos whose results are kept in memory
+        """
+        self.embedder = embedder or get_image_embedder()
+        self.max_images = max_images
+        self.max_chunks = max_chunks
+        self.ef_search = ef_search
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_hash(image_data: bytes) -> str:
+        return hashlib.sha256(image_data).hexdigest()
+
+    def search(self, image_data: bytes) -> List[Document]:
+        """
+        Find the guide chunks linked to the images most similar to `image_data`.
+
+        Returns:
+            Documents with metadata source (document_id), chunk_index,
+            image_path and distance (cosine, lower is closer)
+        """
+        key = self.image_hash(image_data)
+        with tracer.span("image_search", kind="retrieval") as span:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            span.set(image_cache_hit=cached is not None)
+            if cached is not None:
+                return list(cached)
+
+            with tracer.span("image_embedding", kind="embedding"):
+                vector = self.embedder.embed_image(image_data)
+            docs = self._query(vector)
+            span.set(retrieved_chunks=len(docs))
+
+        with self._lock:
+            self._cache[key] = docs
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return list(docs)
+
+    @tracer.traced("db.image_search", kind="db")
+    def _query(self, vector: List[float]) -> List[Document]:
+        params = {"vector": "[" + ",".join(str(v) for v in vector) + "]", "images": self.max_images}
+        with knowledge_connection() as conn:
+            with conn.cursor() as cur:
+                if self.ef_search:
+                    cur.execute("SET LOCAL hnsw.ef_search = %s", (int(self.ef_search),))
+                cur.execute(IMAGE_SEARCH_SQL, params)
+                rows = cur.fetchall()
+            conn.rollback()  # Read-only; ends the transaction that scoped SET LOCAL
+
+        # A chunk linked to several of the nearest images keeps its best distance
+        docs, seen = [], set()
+        for image_path, distance, document_id, chunk_index, text_content in rows:
+            if (document_id, chunk_index) in seen:
+                continue
+            seen.add((document_id, chunk_index))
+            docs.append(Document(
+                page_content=text_content,
+                metadata={"source": document_id, "chunk_index": chunk_index,
+                          "image_path": image_path, "distance": float(distance)},
+            ))
+            if len(docs) >= self.max_chunks:
+                break
+        return docs
+
+
+_image_search = None
+
+
+def get_image_search() -> ImageSearch:
+    """
+    Shared ImageSearch, created on first use.
+
+    AURA_IMAGE_SEARCH_IMAGES, AURA_IMAGE_SEARCH_CHUNKS and AURA_IMAGE_EF_SEARCH
+    tune the search; AURA_IMAGE_EMBEDDER selects the embedder.
+    """
+    global _image_search
+    if _image_search is None:
+        ef_search = os.environ.get("AURA_IMAGE_EF_SEARCH")
+        _image_search = ImageSearch(
+            max_images=int(os.environ.get("AURA_IMAGE_SEARCH_IMAGES", "3")),
+            max_chunks=int(os.environ.get("AURA_IMAGE_SEARCH_CHUNKS", "5")),
+            ef_search=int(ef_search) if ef_search else None,
+        )
+    return _image_search
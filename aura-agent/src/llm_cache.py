@@ -0,0 +1,262 @@
+# LLM Response Cache for the Aura Agent
+# This file contains an exact-match cache for chat completions: an in-memory LRU
+# with an optional SQLite tier shared across processes and restarts
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_text(content) -> str:
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True)
+    return _WHITESPACE.sub(" ", content).strip()
+
+
+def normalize_messages(messages: List[BaseMessage]) -> list:
+    """
+    The parts of a message list that determine the model's answer.
+
+    Whitespace is collapsed and tool call IDs are dropped: they are random per
+    call, but the model's output does not depend on them.
+    """
+    normalized = []
+    for message in messages:
+        entry = {"type": message.type, "content": _normalize_text(message.content)}
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            entry["tool_calls"] = [{"name": c["name"], "args": c["args"]} for c in tool_calls]
+        if getattr(message, "name", None) and message.type == "tool":
+            entry["name"] = message.name
+        normalized.append(entry)
+    return normalized
+
+
+def tool_schemas(tools) -> list:
+    """OpenAI function schemas for the bound tools (part of the cache key)."""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    return [convert_to_openai_tool(t) for t in tools]
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache for tool-calling chat completions.
+
+    The key is a SHA-256 of the model name, the tool schemas and the normalized
+    message list, so any change in the prompt, the tool results or the tools
+    themselves is a miss. Only sound because the agent runs at temperature 0.
+    Cached AIMessages keep their tool_calls; the call IDs are regenerated on
+    every hit so a conversation never contains the same ID twice.
+
+    Concurrent misses on the same key (e.g. a burst of identical first messages)
+    wait for the first caller instead of all calling the model; that caller
+    must call release() once it has stored its response or failed.
+
+    Every hit records the latency and token cost of the original call as saved.
+    """
+
+    def __init__(self, max_entries: int = 1024, sqlite_path: Optional[str] = None,
+                 input_cost_per_1k: float = 0.0025, output_cost_per_1k: float = 0.01):
+        """
+        Args:
+            max_entries: Responses kept in the in-memory LRU
+            sqlite_path: File for the persistent tier (None: memory only)
+            input_cost_per_1k: Price of 1,000 prompt tokens in USD, for the savings report
+            output_cost_per_1k: Price of 1,000 completion tokens
+        """
+        self.max_entries = max_entries
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        # key -> (event its waiters block on, thread ident of the owner calling the model)
+        self._in_flight: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    entry TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self.saved_prompt_tokens = 0
+        self.saved_completion_tokens = 0
+
+    @staticmethod
+    def key(model: str, tools: list, messages: List[BaseMessage]) -> str:
+        payload = json.dumps({"model": model, "tools": tools, "messages": normalize_messages(messages)},
+                             sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _read(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT entry FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = json.loads(row[0])
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: dict) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str, wait_seconds: float = 120.0) -> Optional[AIMessage]:
+        """
+        Cached response for `key` with fresh tool call IDs, or None.
+
+        None means the caller should call the model, put() the response and
+        release() the key. Concurrent callers for the same key wait for the
+        owner; if the owner fails, the first waiter to wake takes the key over
+        and the others keep waiting on it. A caller that waited `wait_seconds`
+        in total calls the model without owning the key.
+        """
+        entry = self._read(key)
+        deadline = time.monotonic() + wait_seconds
+        while entry is None:
+            with self._lock:
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    self._in_flight[key] = (threading.Event(), threading.get_ident())
+                    break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not pending[0].wait(remaining):
+                break
+            entry = self._read(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_ms += entry["latency_ms"]
+            self.saved_prompt_tokens += entry["prompt_tokens"]
+            self.saved_completion_tokens += entry["completion_tokens"]
+
+        response = messages_from_dict([entry["message"]])[0]
+        id_map = {call["id"]: f"call_{uuid4().hex[:24]}" for call in response.tool_calls}
+        response.tool_calls = [{**call, "id": id_map[call["id"]]} for call in response.tool_calls]
+        if response.additional_kwargs.get("tool_calls"):
+            response.additional_kwargs["tool_calls"] = [
+                {**call, "id": id_map.get(call.get("id"), call.get("id"))}
+                for call in response.additional_kwargs["tool_calls"]
+            ]
+        response.id = None
+        response.response_metadata = {**response.response_metadata, "aura_cache_hit": True}
+        return response
+
+    def put(self, key: str, response: AIMessage, latency_ms: float) -> None:
+        """Store a fresh response and what it cost to produce."""
+        if getattr(response, "invalid_tool_calls", None):
+            return  # Not worth replaying
+        usage = getattr(response, "usage_metadata", None) or {}
+        entry = {
+            "message": message_to_dict(response),
+            "latency_ms": round(latency_ms, 3),
+            "prompt_tokens": usage.get("input_tokens", 0),
+            "completion_tokens": usage.get("output_tokens", 0),
+        }
+        self._remember(key, entry)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, entry, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(entry), time.time()),
+                )
+                self._db.commit()
+
+    def release(self, key: str) -> None:
+        """
+        Wake the callers waiting on `key` (after put(), or after the call failed).
+
+        Only the owner's release counts: a caller that timed out waiting never
+        owned the key and must not wake a newer owner's waiters.
+        """
+        with self._lock:
+            pending = self._in_flight.get(key)
+            if pending is None or pending[1] != threading.get_ident():
+                return
+            del self._in_flight[key]
+        pending[0].set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            saved_usd = (self.saved_prompt_tokens / 1000 * self.input_cost_per_1k
+                         + self.saved_completion_tokens / 1000 * self.output_cost_per_1k)
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_ms": round(self.saved_ms, 1),
+                "saved_prompt_tokens": self.saved_prompt_tokens,
+                "saved_completion_tokens": self.saved_completion_tokens,
+                "saved_usd": round(saved_usd, 4),
+            }
+
+
+def create_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Cache selected by AURA_LLM_CACHE: none (default), memory or sqlite.
+
+    AURA_LLM_CACHE_SIZE sets the in-memory entries (default 1024),
+    AURA_LLM_CACHE_PATH the SQLite file (default aura_llm_cache.sqlite), and
+    AURA_LLM_INPUT_COST_PER_1K / AURA_LLM_OUTPUT_COST_PER_1K the token prices
+    used to report the savings.
+    """
+    mode = os.environ.get("AURA_LLM_CACHE", "none").lower()
+    if mode == "none":
+        return None
+    if mode not in ("memory", "sqlite"):
+        logger.warning(f"Unknown AURA_LLM_CACHE '{mode}', LLM cache disabled")
+        return None
+    cache = LLMResponseCache(
+        max_entries=int(os.environ.get("AURA_LLM_CACHE_SIZE", "1024")),
+        sqlite_path=os.environ.get("AURA_LLM_CACHE_PATH", "aura_llm_cache.sqlite") if mode == "sqlite" else None,
+        input_cost_per_1k=float(os.environ.get("AURA_LLM_INPUT_COST_PER_1K", "0.0025")),
+        output_cost_per_1k=float(os.environ.get("AURA_LLM_OUTPUT_COST_PER_1K", "0.01")),
+    )
+    logger.info(f"LLM response cache enabled ({mode})")
+    return cache
+
+
+# Shared instance, configured from the environment (None when disabled)
+llm_cache = create_llm_cache()
@@ -0,0 +1,217 @@
+# Multi-Deployment LLM Router for the Aura Agent
+# This file spreads chat completions over several Azure OpenAI deployments by
+# tokens-per-minute load, and spills over to another deployment when one is throttled
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+
+from .resilience import is_retryable, retry_after_seconds
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class Deployment:
+    """One Azure OpenAI chat deployment and its quota."""
+
+    def __init__(self, name: str, weight: float = 1.0, tpm_limit: Optional[int] = None,
+                 endpoint: Optional[str] = None, api_key_env: Optional[str] = None):
+        """
+        Args:
+            name: Deployment name (azure_deployment)
+            weight: Relative share of traffic when no TPM limit is known
+            tpm_limit: Tokens-per-minute quota of the deployment
+            endpoint: Resource endpoint for deployments in another region (default AZURE_OPENAI_ENDPOINT)
+            api_key_env: Environment variable holding that resource's key (default AZURE_OPENAI_API_KEY)
+        """
+        self.name = name
+        self.weight = weight
+        self.tpm_limit = tpm_limit
+        self.endpoint = endpoint
+        self.api_key_env = api_key_env
+
+
+def parse_deployments(spec: str) -> List[Deployment]:
+    """
+    Deployments from AURA_LLM_DEPLOYMENTS.
+
+    Either 'name[:weight[:tpm]],...' (e.g. 'gpt4o-east:2:150000,gpt4o-west:1:90000')
+    or a JSON list of objects with name, weight, tpm, endpoint and api_key_env.
+    """
+    spec = spec.strip()
+    if spec.startswith("["):
+        return [Deployment(d["name"], float(d.get("weight", 1.0)), d.get("tpm"),
+                           d.get("endpoint"), d.get("api_key_env")) for d in json.loads(spec)]
+    deployments = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, *rest = item.split(":")
+        weight = float(rest[0]) if len(rest) > 0 and rest[0] else 1.0
+        tpm = int(rest[1]) if len(rest) > 1 and rest[1] else None
+        deployments.append(Deployment(name, weight, tpm))
+    return deployments
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Rough prompt size (4 characters per token), used before the real usage is known."""
+    return sum(len(str(message.content)) for message in messages) // 4 + 4 * len(messages)
+
+
+class TokenWindow:
+    """Tokens used in the last 60 seconds."""
+
+    def __init__(self, window_seconds: float = 60.0):
+        self.window_seconds = window_seconds
+        self._events = deque()
+        self._total = 0
+
+    def add(self, tokens: int, now: Optional[float] = None) -> None:
+        self._events.append((now or time.monotonic(), tokens))
+        self._total += tokens
+
+    def used(self, now: Optional[float] = None) -> int:
+        cutoff = (now or time.monotonic()) - self.window_seconds
+        while self._events and self._events[0][0] < cutoff:
+            self._total -= self._events.popleft()[1]
+        return self._total
+
+
+class DeploymentRouter:
+    """
+    Picks a chat deployment per call and fails over between them.
+
+    Each call goes to the healthy deployment with the lowest projected load,
+    (tokens in the last minute + this prompt) / TPM quota, or / weight when no
+    quota is configured. A deployment answering 429 is skipped for its
+    Retry-After (default `cooldown_seconds`) and the call spills over to the
+    next one; other transient errors skip it for `cooldown_seconds`. Only when
+    every deployment fails is the error raised (to the resilience layer).
+    """
+
+    def __init__(self, deployments: List[Deployment], client_factory: Callable[[Deployment], object],
+                 cooldown_seconds: float = 10.0, weight_tpm: int = 100_000):
+        """
+        Args:
+            deployments: Candidate deployments
+            client_factory: Builds the (tool-bound) chat model for a deployment
+            cooldown_seconds: Skip time after a failure without Retry-After
+            weight_tpm: Tokens per minute per unit of weight for deployments without a quota
+        """
+        if not deployments:
+            raise ValueError("DeploymentRouter needs at least one deployment")
+        self.deployments = deployments
+        self.client_factory = client_factory
+        self.cooldown_seconds = cooldown_seconds
+        self.weight_tpm = weight_tpm
+        self._clients: Dict[str, object] = {}
+        self._windows = {d.name: TokenWindow() for d in deployments}
+        self._cooldown_until = {d.name: 0.0 for d in deployments}
+        self._counts = {d.name: {"calls": 0, "throttled": 0, "errors": 0, "spillovers": 0} for d in deployments}
+        self._lock = threading.Lock()
+
+    def _capacity(self, deployment: Deployment) -> float:
+        return float(deployment.tpm_limit or deployment.weight * self.weight_tpm)
+
+    def _client(self, deployment: Deployment):
+        with self._lock:
+            client = self._clients.get(deployment.name)
+            if client is None:
+                client = self._clients[deployment.name] = self.client_factory(deployment)
+            return client
+
+    def candidates(self, estimated_tokens: int) -> List[Deployment]:
+        """Deployments in the order they would be tried for a prompt of this size."""
+        now = time.monotonic()
+        with self._lock:
+            def load(d: Deployment) -> float:
+                return (self._windows[d.name].used(now) + estimated_tokens) / self._capacity(d)
+
+            healthy = [d for d in self.deployments if self._cooldown_until[d.name] <= now]
+            cooling = sorted((d for d in self.deployments if self._cooldown_until[d.name] > now),
+                             key=lambda d: self._cooldown_until[d.name])
+            # Cooling deployments are a last resort: their cooldown may be over by the time they're reached
+            return sorted(healthy, key=lambda d: (load(d) > 1.0, load(d), -d.weight)) + cooling
+
+    def invoke(self, messages: List[BaseMessage], **kwargs):
+        """Send the call to the best deployment, spilling over on throttling and transient errors."""
+        estimated = estimate_tokens(messages)
+        last_error = None
+        with tracer.span("llm_route", kind="routing", estimated_tokens=estimated) as span:
+            for attempt, deployment in enumerate(self.candidates(estimated)):
+                try:
+                    response = self._client(deployment).invoke(messages, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    last_error = e
+                    throttled = getattr(e, "status_code", None) == 429 or \
+                        getattr(getattr(e, "response", None), "status_code", None) == 429
+                    cooldown = retry_after_seconds(e) or self.cooldown_seconds
+                    with self._lock:
+                        self._cooldown_until[deployment.name] = time.monotonic() + cooldown
+                        self._counts[deployment.name]["throttled" if throttled else "errors"] += 1
+                        self._counts[deployment.name]["spillovers"] += 1
+                    logger.warning(f"Deployment {deployment.name} {'throttled' if throttled else 'failed'} "
+                                   f"({type(e).__name__}), spilling over for {cooldown:.1f}s")
+                    continue
+
+                usage = getattr(response, "usage_metadata", None) or {}
+                with self._lock:
+                    self._windows[deployment.name].add(usage.get("total_tokens") or estimated)
+                    self._counts[deployment.name]["calls"] += 1
+                    utilization = self._windows[deployment.name].used() / self._capacity(deployment)
+                span.set(deployment=deployment.name, spillovers=attempt, utilization=round(utilization, 3))
+                return response
+            span.set(spillovers=len(self.deployments), exhausted=True)
+        raise last_error
+
+    def stats(self) -> List[dict]:
+        """Per-deployment tokens in the last minute, utilization and routing counters."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "deployment": d.name,
+                    "tpm_used": self._windows[d.name].used(now),
+                    "utilization": round(self._windows[d.name].used(now) / self._capacity(d), 3),
+                    "cooling_down_s": round(max(0.0, self._cooldown_until[d.name] - now), 1),
+                    **self._counts[d.name],
+                }
+                for d in self.deployments
+            ]
+
+
+def create_router(tools: list, deployments_spec: Optional[str] = None, **llm_kwargs) -> Optional[DeploymentRouter]:
+    """
+    Router over the deployments in `deployments_spec` (default AURA_LLM_DEPLOYMENTS), or
+    None when fewer than two are configured. AURA_LLM_COOLDOWN_SECONDS sets the
+    skip time after a failure without Retry-After (default 10).
+    """
+    deployments = parse_deployments(deployments_spec if deployments_spec is not None
+                                    else os.environ.get("AURA_LLM_DEPLOYMENTS", ""))
+    if len(deployments) < 2:
+        return None
+
+    def client_factory(deployment: Deployment):
+        from langchain_openai import AzureChatOpenAI
+
+        extra = {}
+        if deployment.endpoint:
+            extra["azure_endpoint"] = deployment.endpoint
+        if deployment.api_key_env:
+            extra["api_key"] = os.environ.get(deployment.api_key_env)
+        return AzureChatOpenAI(
+            azure_deployment=deployment.name,
+            api_version=os.environ.get("OPENAI_API_VERSION", "2024-02-15-preview"),
+            temperature=0, **llm_kwargs, **extra).bind_tools(tools)
+
+    logger.info(f"LLM router over {len(deployments)} deployments: {', '.join(d.name for d in deployments)}")
+    return DeploymentRouter(deployments, client_factory,
+                            cooldown_seconds=float(os.environ.get("AURA_LLM_COOLDOWN_SECONDS", "10")))
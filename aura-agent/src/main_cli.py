@@ -1,34 +1,228 @@
 # Main CLI Interface for Aura Agent
-# This file will contain the command-line interface for the agent
+# This file contains the command-line interface for the agent:
+# single-shot queries and concurrent batch triage of JSONL ticket files
 
 import argparse
+import contextlib
+import json
+import os
 import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Optional
 
+# Allow running as a script (python src/main_cli.py) as well as a module (python -m src.main_cli)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import HumanMessage
+
+
+def build_query(query: Optional[str], device_id: Optional[str] = None, error_code: Optional[str] = None) -> str:
+    """Combine the free-text query with the optional device ID and error code."""
+    parts = [query.strip()] if query else []
+    if error_code:
+        parts.append(f"Error code: {error_code}")
+    if device_id:
+        parts.append(f"Device ID: {device_id}")
+    return "\n".join(parts)
+
+
+def new_session_id(prefix: str) -> str:
+    """A fresh session ID; the checkpointer is durable, so IDs must not repeat across runs."""
+    return f"{prefix}-{uuid.uuid4()}"
+
+
+def run_query(text: str, user_id: str, session_id: str) -> dict:
+    """
+    Run one troubleshooting query through the agent graph.
+
+    session_id is the checkpoint thread, so it must be unique per query (see
+    new_session_id) or earlier runs' saved history is continued.
+
+    Returns a result dict with the final answer, the tools the agent used and
+    the wall-clock latency. Exceptions propagate to the caller.
+    """
+    # Imported here so --help and argument errors don't pay for graph construction
+    from src.graph import get_aura_graph, prepare_turn_input, turn_config
+    from src.tracing import tracer
+
+    start = time.perf_counter()
+    with tracer.span("turn", kind="turn", user_id=user_id, session_id=session_id):
+        inputs = prepare_turn_input(user_id, session_id, HumanMessage(content=text), load_history=list)
+        response = get_aura_graph().invoke(inputs, turn_config(session_id))
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    messages = response["chat_history"]
+    # Only this turn's messages: everything after its own (last) human message
+    turn_start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1) + 1
+    tools_used = [call["name"] for m in messages[turn_start:] for call in (getattr(m, "tool_calls", None) or [])]
+    return {
+        "answer": messages[-1].content,
+        "tools_used": tools_used,
+        "latency_ms": round(latency_ms, 1),
+    }
+
+
+def process_ticket(ticket: dict, user_id: str) -> dict:
+    """Triage one ticket; failures are reported in the result instead of raised."""
+    ticket_id = str(ticket["ticket_id"])
+    text = build_query(ticket.get("query"), ticket.get("device_id"), ticket.get("error_code"))
+    start = time.perf_counter()
+    try:
+        result = run_query(text, user_id=user_id, session_id=new_session_id("ticket"))
+        return {"ticket_id": ticket_id, "status": "ok", **result}
+    except Exception as e:
+        return {
+            "ticket_id": ticket_id,
+            "status": "error",
+            "error": str(e),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+
+def load_completed_ticket_ids(output_path: str) -> set:
+    """
+    Ticket IDs already processed successfully in a previous (interrupted) run.
+
+    Failed tickets are not included, so they are retried on resume.
+    """
+    completed = set()
+    if output_path == "-" or not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written last line from an interruption
+            if record.get("status") == "ok":
+                completed.add(str(record.get("ticket_id")))
+    return completed
+
+
+def iter_tickets(input_path: str, skip_ids: set):
+    """Yield tickets from a JSONL file, assigning line numbers as IDs when missing."""
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            ticket = json.loads(line)
+            ticket.setdefault("ticket_id", line_number)
+            if not ticket.get("query") and not ticket.get("error_code"):
+                print(f"Skipping ticket {ticket['ticket_id']}: no query or error_code", file=sys.stderr)
+                continue
+            if str(ticket["ticket_id"]) in skip_ids:
+                continue
+            yield ticket
+
+
+def run_batch(input_path: str, output_path: str, workers: int, user_id: str) -> int:
+    """
+    Process a JSONL ticket file with a bounded worker pool.
+
+    Results are streamed as JSONL in completion order and flushed per ticket,
+    so an interrupted run can be resumed: tickets already in the output file
+    with status "ok" are skipped. At most 2 × workers tickets are in flight,
+    so memory stays flat for arbitrarily large backlogs.
+
+    Returns the number of failed tickets.
+    """
+    completed = load_completed_ticket_ids(output_path)
+    if completed:
+        print(f"Resuming: {len(completed)} tickets already done", file=sys.stderr)
+
+    out = sys.stdout if output_path == "-" else open(output_path, "a", encoding="utf-8")
+    processed = failed = 0
+    started = time.perf_counter()
+
+    def write(future):
+        nonlocal processed, failed
+        result = future.result()
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        in_flight.discard(future)
+        processed += 1
+        if result["status"] != "ok":
+            failed += 1
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    in_flight = set()
+    # Tool progress prints go to stderr so stdout stays valid JSONL
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            for ticket in iter_tickets(input_path, completed):
+                in_flight.add(pool.submit(process_ticket, ticket, user_id))
+                if len(in_flight) >= workers * 2:
+                    for future in wait(in_flight, return_when=FIRST_COMPLETED).done:
+                        write(future)
+            for future in wait(in_flight).done:
+                write(future)
+        except KeyboardInterrupt:
+            print("\nInterrupted - finishing in-flight tickets, rerun to resume", file=sys.stderr)
+            for future in list(in_flight):
+                if not future.cancel():
+                    write(future)
+        finally:
+            pool.shutdown(wait=True)
+            if out is not sys.stdout:
+                out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Processed {processed} tickets in {elapsed:.1f}s ({failed} failed)", file=sys.stderr)
+    return failed
+
+
 def main():
     """Main entry point for the Aura IoT troubleshooter CLI"""
     parser = argparse.ArgumentParser(description="Aura IoT Troubleshooter Agent")
-    
+
     # Add command line arguments
     parser.add_argument("--query", "-q", type=str, help="Troubleshooting query")
     parser.add_argument("--device-id", "-d", type=str, help="IoT device identifier")
     parser.add_argument("--error-code", "-e", type=str, help="Error code to investigate")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose output")
-    
+    parser.add_argument("--batch", "-b", type=str, help="JSONL file of tickets to triage "
+                        "(fields: ticket_id, query, device_id, error_code)")
+    parser.add_argument("--output", "-o", type=str, default="-", help="JSONL results file for --batch "
+                        "(default: stdout). Existing results are resumed.")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Concurrent tickets in batch mode")
+    parser.add_argument("--user-id", type=str, default="cli_user", help="User ID recorded in traces")
+    parser.add_argument("--warmup", action="store_true", help="Initialize retriever, LLM and graph up front "
+                        "and report timings (on its own: warm up and exit)")
+
     args = parser.parse_args()
-    
-    # Main logic to be implemented
-    print("Aura IoT Troubleshooter Agent")
-    print("=============================")
-    
-    if args.query:
-        print(f"Processing query: {args.query}")
-    
-    if args.device_id:
-        print(f"Device ID: {args.device_id}")
-    
-    if args.error_code:
-        print(f"Error Code: {args.error_code}")
+
+    if args.warmup:
+        from src.warmup import warm_up
+        with contextlib.redirect_stdout(sys.stderr):
+            report = warm_up()
+        if not args.batch and not args.query and not args.error_code:
+            sys.exit(0 if report["total"]["status"] == "ok" else 1)
+
+    if args.batch:
+        failed = run_batch(args.batch, args.output, max(1, args.workers), args.user_id)
+        sys.exit(1 if failed else 0)
+
+    if not args.query and not args.error_code:
+        parser.error("provide --query/--error-code, or --batch FILE")
+
+    text = build_query(args.query, args.device_id, args.error_code)
+    if args.verbose:
+        print("Aura IoT Troubleshooter Agent")
+        print("=============================")
+        print(f"Processing query: {text}\n")
+
+    try:
+        result = run_query(text, user_id=args.user_id, session_id=new_session_id("cli"))
+    except Exception as e:
+        print(f"⚠️ An error occurred: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(result["answer"])
+    if args.verbose:
+        print(f"\nTools used: {', '.join(result['tools_used']) or 'none'}")
+        print(f"Latency: {result['latency_ms']:.0f} ms")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
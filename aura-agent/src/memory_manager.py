@@ -13,18 +13,106 @@ Key Features:
 """
 
 import os
+import re
 import json
 import time
 import logging
-from typing import List
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
 from uuid import uuid4
 import psycopg2
 from psycopg2.extras import RealDictCursor, Json
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, SystemMessage
 
+from .retention import ArchiveMissingError, remove_from_archive, restore_session
+from .tracing import tracer
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Same code format the pre-router and reranker recognize ("E-205")
+_ERROR_CODE_PATTERN = re.compile(r"\b(E-\d{3})\b", re.IGNORECASE)
+FIRST_QUESTION_MAX_CHARS = 120
+SESSION_CLOCK_SKEW_MS = 86_400_000
+# LangGraph checkpoint tables (thread_id = session_id) and their key columns, purged with the sessions
+CHECKPOINT_TABLES = {
+    "checkpoint_writes": "thread_id, checkpoint_ns, checkpoint_id, task_id, idx",
+    "checkpoint_blobs": "thread_id, checkpoint_ns, channel, version",
+    "checkpoints": "thread_id, checkpoint_ns, checkpoint_id",
+}
+
+
+def summarize_messages(messages: List[BaseMessage]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Sidebar summary fields contributed by a batch of messages.
+    
+    Returns:
+        (first user question, truncated to FIRST_QUESTION_MAX_CHARS; last error
+        code mentioned in any message), either None when the batch has none
+    """
+    first_question = None
+    last_error_code = None
+    for msg in messages:
+        text = msg.content if isinstance(msg.content, str) else ""
+        if first_question is None and isinstance(msg, HumanMessage) and text.strip():
+            first_question = " ".join(text.split())[:FIRST_QUESTION_MAX_CHARS]
+        codes = _ERROR_CODE_PATTERN.findall(text)
+        if codes:
+            last_error_code = codes[-1].upper()
+    return first_question, last_error_code
+
+
+class DeletionProgress:
+    """
+    Progress of one delete_sessions / delete_user_data run.
+    
+    Updated by the deleting thread after every batch; as_dict() is a snapshot
+    for callers polling a background run, wait() blocks until it finishes.
+    """
+    
+    def __init__(self, kind: str, target: str):
+        self.job_id = uuid4().hex[:12]
+        self.kind = kind
+        self.target = target
+        self.state = "queued"
+        self.total_sessions = 0
+        self.sessions_deleted = 0
+        self.messages_deleted = 0
+        self.checkpoint_rows_deleted = 0
+        self.archives_rewritten = 0
+        self.batches = 0
+        self.throttled_seconds = 0.0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the run has finished (or failed); False on timeout."""
+        return self._done.wait(timeout)
+    
+    def as_dict(self) -> dict:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "target": self.target,
+            "state": self.state,
+            "total_sessions": self.total_sessions,
+            "sessions_deleted": self.sessions_deleted,
+            "messages_deleted": self.messages_deleted,
+            "checkpoint_rows_deleted": self.checkpoint_rows_deleted,
+            "archives_rewritten": self.archives_rewritten,
+            "batches": self.batches,
+            "throttled_seconds": round(self.throttled_seconds, 2),
+            "elapsed_seconds": round(elapsed, 2),
+            "error": self.error,
+        }
+
+
 class ChatHistoryManager:
     """
     Manages chat history persistence using PostgreSQL.
@@ -35,7 +123,11 @@ class ChatHistoryManager:
     3. Save new messages back to PostgreSQL (persistence)
     """
     
-    def __init__(self, max_history_messages: int = 20):
+    # One background purge at a time: concurrent purges would only compete for the same I/O
+    _purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aura-purge")
+    PURGE_SESSION_CHUNK = 100
+    
+    def __init__(self, max_history_messages: int = 20, pool_size: int = None):
         """
         Initialize the chat history manager.
         
@@ -44,8 +136,19 @@ class ChatHistoryManager:
                                  20 messages = 10 conversation turns.
                                  This implements the "conversation window"
                                  to prevent context overflow.
+            pool_size: Maximum pooled connections (default: AURA_DB_POOL_SIZE or 10).
+                       The pool is opened on first use, not here.
         """
         self.max_history_messages = max_history_messages
+        self.pool_size = pool_size or int(os.environ.get("AURA_DB_POOL_SIZE", "10"))
+        # Bulk deletes: rows per DELETE statement, and the share of time spent deleting
+        # (0.5: pause as long as each batch took) so purges never crowd out live chats
+        self.purge_batch_rows = int(os.environ.get("AURA_PURGE_BATCH_ROWS", "1000"))
+        self.purge_duty_cycle = min(1.0, max(0.05, float(os.environ.get("AURA_PURGE_DUTY_CYCLE", "0.5"))))
+        self._deletions: "OrderedDict[str, DeletionProgress]" = OrderedDict()
+        self._deletions_lock = threading.Lock()
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self.connection_params = {
             "host": os.environ.get("DB_HOST"),
             "port": int(os.environ.get("DB_PORT", "5432")),
@@ -55,20 +158,69 @@ class ChatHistoryManager:
         }
         logger.info(f"ChatHistoryManager initialized with max_history={max_history_messages}")
     
+    def _get_pool(self) -> ThreadedConnectionPool:
+        """Get the connection pool, opening it on first call."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(1, self.pool_size, **self.connection_params)
+                    logger.info(f"Opened PostgreSQL connection pool (max {self.pool_size})")
+        return self._pool
+    
     def _get_connection(self):
-        """Get a PostgreSQL database connection."""
+        """
+        Get a PostgreSQL database connection from the pool.
+        
+        If every pooled connection is in use, a one-off connection is opened
+        instead of failing; _release_connection closes it afterwards.
+        """
         try:
-            return psycopg2.connect(**self.connection_params)
+            with tracer.span("db.connect", kind="db") as span:
+                try:
+                    return self._get_pool().getconn()
+                except PoolError:
+                    span.set(overflow=True)
+                    return psycopg2.connect(**self.connection_params)
         except psycopg2.OperationalError as e:
             logger.error(f"Failed to connect to database: {e}")
             raise
     
+    def _release_connection(self, conn):
+        """Return a connection to the pool (the pool rolls back any open transaction)."""
+        try:
+            self._get_pool().putconn(conn, close=bool(conn.closed))
+        except PoolError:
+            # One-off overflow connection, not owned by the pool
+            conn.close()
+    
+    @tracer.traced("db.warm_up", kind="db")
+    def warm_up(self) -> None:
+        """
+        Open the pool and touch the chat tables, so the first request
+        doesn't pay for the connection handshake and cold catalog caches.
+        """
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM chat_sessions LIMIT 1")
+                cur.execute("SELECT 1 FROM chat_history LIMIT 1")
+        finally:
+            self._release_connection(conn)
+    
+    def close(self) -> None:
+        """Close every pooled connection."""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+    
+    @tracer.traced("db.load_history", kind="db")
     def load_history(self, user_id: str, session_id: str) -> List[BaseMessage]:
         """
         Load the most recent N messages for this user/session from PostgreSQL.
         
         This implements the conversation window - only the last N messages are loaded
-        to prevent overwhelming the LLM with too much context.
+        to prevent overwhelming the LLM with too much context. An archived session
+        is restored from its archive file first (see src/retention.py).
         
         Args:
             user_id: User identifier
@@ -76,19 +228,35 @@ class ChatHistoryManager:
             
         Returns:
             List of LangChain message objects (HumanMessage, AIMessage) in chronological order
+            
+        Raises:
+            ArchiveMissingError: The session is archived but its archive can't be read;
+                                 an empty history would silently lose the conversation
         """
         conn = self._get_connection()
         try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                # Sessions the retention job archived are restored first
+                cur.execute("SELECT created_at, archive_path FROM chat_sessions WHERE session_id = %s",
+                            (session_id,))
+                session = cur.fetchone()
+                if session and session['archive_path']:
+                    restore_session(cur, session_id, session['archive_path'])
+                    conn.commit()
+                
+                # No message predates its session: the lower bound lets PostgreSQL skip
+                # every older monthly partition (with a day of slack for clock skew)
+                since = session['created_at'] - SESSION_CLOCK_SKEW_MS if session else 0
                 cur.execute("""
                     SELECT message_type, content, tool_calls, timestamp
                     FROM chat_history
-                    WHERE user_id = %s AND session_id = %s
+                    WHERE user_id = %s AND session_id = %s AND timestamp >= %s
                     ORDER BY timestamp DESC
                     LIMIT %s
-                """, (user_id, session_id, self.max_history_messages))
+                """, (user_id, session_id, since, self.max_history_messages))
                 
                 rows = cur.fetchall()
+                tracer.current_span().set(rows=len(rows))
                 
             # Convert DB rows to LangChain messages
             # Reverse to get chronological order (oldest first)
@@ -105,11 +273,14 @@ class ChatHistoryManager:
             
             logger.info(f"Loaded {len(messages)} messages for session {session_id}")
             return messages
+        except ArchiveMissingError:
+            conn.rollback()
+            raise
         except Exception as e:
             logger.error(f"Error loading history: {e}")
             return []  # Return empty list on error to prevent crashes
         finally:
-            conn.close()
+            self._release_connection(conn)
     
     def save_message(self, user_id: str, session_id: str, message: BaseMessage):
         """
@@ -122,12 +293,15 @@ class ChatHistoryManager:
         """
         self.save_messages(user_id, session_id, [message])
     
+    @tracer.traced("db.save_messages", kind="db")
     def save_messages(self, user_id: str, session_id: str, messages: List[BaseMessage]):
         """
         Batch save multiple messages to PostgreSQL.
         
         This is more efficient than saving one at a time.
-        Also updates the session metadata (last_message_at timestamp).
+        Also updates the session row in the same transaction: last_message_at
+        and the sidebar summary (message count, first user question, last
+        error code mentioned), so listing sessions never reads chat_history.
         
         Args:
             user_id: User identifier
@@ -140,14 +314,20 @@ class ChatHistoryManager:
         conn = self._get_connection()
         try:
             with conn.cursor() as cur:
-                # Update session metadata
+                # Update session metadata and summary
                 timestamp = int(time.time() * 1000)
+                first_question, last_error_code = summarize_messages(messages)
                 cur.execute("""
-                    INSERT INTO chat_sessions (session_id, user_id, created_at, last_message_at)
-                    VALUES (%s, %s, %s, %s)
+                    INSERT INTO chat_sessions
+                    (session_id, user_id, created_at, last_message_at, message_count, first_question, last_error_code)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (session_id) 
-                    DO UPDATE SET last_message_at = EXCLUDED.last_message_at
-                """, (session_id, user_id, timestamp, timestamp))
+                    DO UPDATE SET last_message_at = EXCLUDED.last_message_at,
+                                  message_count = chat_sessions.message_count + EXCLUDED.message_count,
+                                  first_question = COALESCE(chat_sessions.first_question, EXCLUDED.first_question),
+                                  last_error_code = COALESCE(EXCLUDED.last_error_code, chat_sessions.last_error_code)
+                """, (session_id, user_id, timestamp, timestamp,
+                      len(messages), first_question, last_error_code))
                 
                 # Insert messages
                 for msg in messages:
@@ -167,13 +347,15 @@ class ChatHistoryManager:
                     timestamp += 1  # Ensure unique timestamps for ordering
                 
                 conn.commit()
+                tracer.current_span().set(rows=len(messages))
                 logger.info(f"Saved {len(messages)} messages to session {session_id}")
         except Exception as e:
             logger.error(f"Error saving messages: {e}")
             conn.rollback()
         finally:
-            conn.close()
+            self._release_connection(conn)
     
+    @tracer.traced("db.start_new_session", kind="db")
     def start_new_session(self, user_id: str, title: str = "New Conversation") -> str:
         """
         Generate a new session_id and initialize it in the database.
@@ -205,34 +387,55 @@ class ChatHistoryManager:
             # Return a UUID anyway so the app doesn't crash
             return str(uuid4())
         finally:
-            conn.close()
+            self._release_connection(conn)
     
-    def get_user_sessions(self, user_id: str, limit: int = 10) -> List[dict]:
+    @tracer.traced("db.get_user_sessions", kind="db")
+    def get_user_sessions(self, user_id: str, limit: int = 10,
+                          before: Optional[Tuple[int, str]] = None) -> List[dict]:
         """
-        Get recent session metadata for a user.
+        Get one page of session metadata for a user, most recent first.
         
-        This powers the "previous conversations" sidebar feature.
+        This powers the "previous conversations" sidebar feature. Pages are
+        keyset-paginated on (last_message_at, session_id), which is the
+        idx_user_sessions_page index order, so every page costs the same
+        index range scan however many sessions the user has.
         
         Args:
             user_id: User identifier
             limit: Maximum number of sessions to return
+            before: Cursor from session_cursor() of the last session on the
+                    previous page (None for the first page)
             
         Returns:
-            List of session dictionaries with metadata:
-            [{"session_id": "...", "created_at": 123456789, "title": "..."}, ...]
+            List of session dictionaries with metadata and summary:
+            [{"session_id": "...", "created_at": 123456789, "last_message_at": 123456789,
+              "title": "...", "message_count": 6, "first_question": "...",
+              "last_error_code": "E-205"}, ...]
         """
         conn = self._get_connection()
         try:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT session_id, created_at, last_message_at, title
-                    FROM chat_sessions
-                    WHERE user_id = %s
-                    ORDER BY last_message_at DESC
-                    LIMIT %s
-                """, (user_id, limit))
+                if before is None:
+                    cur.execute("""
+                        SELECT session_id, created_at, last_message_at, title,
+                               message_count, first_question, last_error_code
+                        FROM chat_sessions
+                        WHERE user_id = %s
+                        ORDER BY last_message_at DESC, session_id DESC
+                        LIMIT %s
+                    """, (user_id, limit))
+                else:
+                    cur.execute("""
+                        SELECT session_id, created_at, last_message_at, title,
+                               message_count, first_question, last_error_code
+                        FROM chat_sessions
+                        WHERE user_id = %s AND (last_message_at, session_id) < (%s, %s)
+                        ORDER BY last_message_at DESC, session_id DESC
+                        LIMIT %s
+                    """, (user_id, before[0], before[1], limit))
                 
                 sessions = cur.fetchall()
+                tracer.current_span().set(rows=len(sessions), paged=before is not None)
             
             logger.info(f"Retrieved {len(sessions)} sessions for user {user_id}")
             return sessions
@@ -240,7 +443,12 @@ class ChatHistoryManager:
             logger.error(f"Error retrieving sessions: {e}")
             return []
         finally:
-            conn.close()
+            self._release_connection(conn)
+    
+    @staticmethod
+    def session_cursor(session: dict) -> Tuple[int, str]:
+        """Keyset cursor that makes get_user_sessions() continue after this session."""
+        return session["last_message_at"], session["session_id"]
     
     def prepare_agent_context(self, user_id: str, session_id: str) -> List[BaseMessage]:
         """
@@ -281,18 +489,193 @@ class ChatHistoryManager:
         Args:
             session_id: Session identifier to delete
         """
+        self.delete_sessions([session_id])
+    
+    def delete_sessions(self, session_ids: Iterable[str], background: bool = False,
+                        yield_when: Optional[Callable[[], bool]] = None) -> DeletionProgress:
+        """
+        Delete sessions with their messages, checkpoints and archived copies.
+        
+        Deletes are set-based (one statement per batch of up to purge_batch_rows
+        rows across PURGE_SESSION_CHUNK sessions), each batch in its own short
+        transaction on a pooled connection that is returned between batches.
+        After each batch the run pauses according to purge_duty_cycle, and for
+        as long as `yield_when()` is true (e.g. agent turns are queueing).
+        Each chunk's session rows are locked and deleted first (after erasing
+        their archived copies), then their messages and checkpoints; a final
+        sweep catches sessions that save_messages recreated meanwhile. An
+        interrupted run can simply be repeated.
+        
+        Args:
+            session_ids: Sessions to delete
+            background: Run on the purge thread and return immediately
+            yield_when: Optional check for live load; the purge waits while it returns True
+            
+        Returns:
+            DeletionProgress (finished unless background=True; see get_deletion())
+        """
+        session_ids = list(dict.fromkeys(session_ids))
+        progress = self._track(DeletionProgress("sessions", f"{len(session_ids)} sessions"))
+        return self._start_purge(progress, lambda: self._purge(progress, session_ids, None, yield_when), background)
+    
+    def delete_user_data(self, user_id: str, background: bool = False,
+                         yield_when: Optional[Callable[[], bool]] = None) -> DeletionProgress:
+        """
+        Delete everything stored for a user (GDPR erasure): all their sessions as
+        in delete_sessions(), then any remaining chat_history rows with their user_id.
+        
+        Args:
+            user_id: User identifier
+            background: Run on the purge thread and return immediately
+            yield_when: Optional check for live load; the purge waits while it returns True
+            
+        Returns:
+            DeletionProgress (finished unless background=True; see get_deletion())
+        """
+        progress = self._track(DeletionProgress("user", user_id))
+        return self._start_purge(progress, lambda: self._purge(progress, None, user_id, yield_when), background)
+    
+    def get_deletion(self, job_id: str) -> Optional[DeletionProgress]:
+        """Progress of a recent deletion run by its job_id."""
+        with self._deletions_lock:
+            return self._deletions.get(job_id)
+    
+    def _track(self, progress: DeletionProgress) -> DeletionProgress:
+        with self._deletions_lock:
+            self._deletions[progress.job_id] = progress
+            while len(self._deletions) > 100:
+                self._deletions.popitem(last=False)
+        return progress
+    
+    def _start_purge(self, progress: DeletionProgress, run: Callable, background: bool) -> DeletionProgress:
+        def guarded():
+            progress.state, progress.started_at = "running", time.time()
+            try:
+                with tracer.span("db.purge", kind="db", purge_kind=progress.kind) as span:
+                    run()
+                    span.set(rows=progress.messages_deleted, sessions=progress.sessions_deleted)
+                progress.state = "done"
+                logger.info(f"Deleted {progress.sessions_deleted} sessions / {progress.messages_deleted} messages "
+                            f"({progress.kind} {progress.target}) in {progress.batches} batches")
+            except Exception as e:
+                progress.state, progress.error = "failed", str(e)
+                logger.error(f"Error deleting {progress.kind} {progress.target}: {e}")
+            finally:
+                progress.finished_at = time.time()
+                progress._done.set()
+        
+        if background:
+            self._purge_executor.submit(guarded)
+        else:
+            guarded()
+        return progress
+    
+    def _batch(self, progress: DeletionProgress, yield_when: Optional[Callable[[], bool]], work: Callable) -> int:
+        """Run work(cur) in its own transaction, then throttle; returns its row count."""
+        started = time.perf_counter()
         conn = self._get_connection()
         try:
             with conn.cursor() as cur:
-                # Delete messages first (foreign key order)
-                cur.execute("DELETE FROM chat_history WHERE session_id = %s", (session_id,))
-                # Delete session metadata
-                cur.execute("DELETE FROM chat_sessions WHERE session_id = %s", (session_id,))
-                conn.commit()
-            
-            logger.info(f"Deleted session {session_id}")
-        except Exception as e:
-            logger.error(f"Error deleting session: {e}")
+                rows = work(cur)
+            conn.commit()
+        except Exception:
             conn.rollback()
+            raise
         finally:
-            conn.close()
+            self._release_connection(conn)
+        progress.batches += 1
+        
+        elapsed = time.perf_counter() - started
+        pause = elapsed * (1 / self.purge_duty_cycle - 1)
+        waited = 0.0
+        while yield_when is not None and waited < 5.0 and yield_when():
+            time.sleep(0.1)
+            waited += 0.1
+        time.sleep(pause)
+        progress.throttled_seconds += pause + waited
+        return rows
+    
+    def _delete_in_batches(self, progress: DeletionProgress, yield_when: Optional[Callable[[], bool]],
+                           table: str, key: str, where: str, params: tuple) -> int:
+        """
+        DELETE matching rows purge_batch_rows at a time, until none are left.
+        
+        Rows are addressed by their key columns, which works on the partitioned
+        chat_history and on plain tables alike.
+        """
+        def work(cur):
+            cur.execute(f"""
+                DELETE FROM {table}
+                WHERE ({key}) IN (SELECT {key} FROM {table} WHERE {where} LIMIT %s)
+            """, params + (self.purge_batch_rows,))
+            return cur.rowcount
+        
+        total = 0
+        while True:
+            deleted = self._batch(progress, yield_when, work)
+            total += deleted
+            if deleted < self.purge_batch_rows:
+                return total
+    
+    def _purge(self, progress: DeletionProgress, session_ids: Optional[List[str]], user_id: Optional[str],
+               yield_when: Optional[Callable[[], bool]]) -> None:
+        checkpoint_tables = []
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cur:
+                if session_ids is None:
+                    cur.execute("SELECT session_id FROM chat_sessions WHERE user_id = %s", (user_id,))
+                    session_ids = [row[0] for row in cur.fetchall()]
+                for table in CHECKPOINT_TABLES:
+                    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+                    if cur.fetchone()[0]:
+                        checkpoint_tables.append(table)
+            conn.commit()
+        finally:
+            self._release_connection(conn)
+        progress.total_sessions = len(session_ids)
+        
+        chunks = [session_ids[i:i + self.PURGE_SESSION_CHUNK]
+                  for i in range(0, len(session_ids), self.PURGE_SESSION_CHUNK)]
+        for chunk in chunks:
+            # The session rows go first, under lock: archived copies are erased before the
+            # rows pointing to them disappear, and the sessions leave the sidebar at once
+            def drop_sessions(cur, chunk=chunk):
+                cur.execute("""
+                    SELECT session_id, archive_path FROM chat_sessions
+                    WHERE session_id = ANY(%s)
+                    FOR UPDATE
+                """, (chunk,))
+                archives = {}
+                for session_id, archive_path in cur.fetchall():
+                    if archive_path:
+                        archives.setdefault(archive_path, []).append(session_id)
+                for archive_path, archived_ids in archives.items():
+                    remove_from_archive(archive_path, archived_ids)
+                    progress.archives_rewritten += 1
+                cur.execute("DELETE FROM chat_sessions WHERE session_id = ANY(%s)", (chunk,))
+                return cur.rowcount
+            progress.sessions_deleted += self._batch(progress, yield_when, drop_sessions)
+            
+            progress.messages_deleted += self._delete_in_batches(
+                progress, yield_when, "chat_history", "id, timestamp", "session_id = ANY(%s)", (chunk,))
+            for table in checkpoint_tables:
+                progress.checkpoint_rows_deleted += self._delete_in_batches(
+                    progress, yield_when, table, CHECKPOINT_TABLES[table], "thread_id = ANY(%s)", (chunk,))
+        
+        # Final sweep, after the session rows are gone: save_messages may have recreated
+        # a session (and added messages) while the purge ran
+        def sweep_sessions(cur):
+            if user_id is not None:
+                cur.execute("DELETE FROM chat_sessions WHERE user_id = %s", (user_id,))
+            else:
+                cur.execute("DELETE FROM chat_sessions WHERE session_id = ANY(%s)", (session_ids,))
+            return cur.rowcount
+        self._batch(progress, yield_when, sweep_sessions)
+        if user_id is not None:
+            progress.messages_deleted += self._delete_in_batches(
+                progress, yield_when, "chat_history", "id, timestamp", "user_id = %s", (user_id,))
+        else:
+            for chunk in chunks:
+                progress.messages_deleted += self._delete_in_batches(
+                    progress, yield_when, "chat_history", "id, timestamp", "session_id = ANY(%s)", (chunk,))
@@ -0,0 +1,203 @@
+# Turn-Level Performance Metrics for the Aura Agent
+# This file aggregates tracing spans into sliding-window histograms for the Streamlit dashboard
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from .tracing import tracer
+
+
+def exponential_bounds(start: float = 1.0, factor: float = 1.5, count: int = 32) -> List[float]:
+    """Bucket upper bounds start, start*factor, ... (1ms to ~7 minutes with the defaults)."""
+    return [start * factor ** i for i in range(count)]
+
+
+DEFAULT_BOUNDS = exponential_bounds()
+
+
+class FixedHistogram:
+    """
+    Fixed-size bucketed histogram.
+
+    Adding a value is O(log buckets) and memory never grows, so it is cheap enough
+    to update on every span. Percentiles are estimated by linear interpolation
+    inside the bucket that holds the requested rank.
+    """
+
+    def __init__(self, bounds: List[float] = DEFAULT_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "FixedHistogram") -> None:
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Estimated q-th percentile (q in 0..100)."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * ((rank - seen) / c)
+                return min(estimate, self.max)
+            seen += c
+        return self.max
+
+
+class WindowedHistogram:
+    """
+    Histogram over a sliding time window.
+
+    The window is split into fixed slices, each with its own FixedHistogram.
+    Expired slices are dropped as time moves on, so memory is bounded by
+    slices × buckets regardless of traffic.
+    """
+
+    def __init__(self, window_seconds: float = 300, slices: int = 10, bounds: List[float] = DEFAULT_BOUNDS):
+        self.slice_seconds = window_seconds / slices
+        self.max_slices = slices
+        self.bounds = bounds
+        self._slices = deque()
+
+    def add(self, value: float, now: Optional[float] = None) -> None:
+        slice_id = int((now or time.time()) // self.slice_seconds)
+        if not self._slices or self._slices[-1][0] != slice_id:
+            self._slices.append((slice_id, FixedHistogram(self.bounds)))
+            while len(self._slices) > self.max_slices:
+                self._slices.popleft()
+        self._slices[-1][1].add(value)
+
+    def snapshot(self, now: Optional[float] = None) -> FixedHistogram:
+        """Merge all slices still inside the window into one histogram."""
+        oldest = int((now or time.time()) // self.slice_seconds) - self.max_slices + 1
+        merged = FixedHistogram(self.bounds)
+        for slice_id, hist in self._slices:
+            if slice_id >= oldest:
+                merged.merge(hist)
+        return merged
+
+
+class TurnMetrics:
+    """
+    Tracer exporter that rolls spans up into per-turn measurements.
+
+    Spans are grouped by trace_id until the enclosing 'turn' span finishes
+    (it is always exported last), then the turn's totals are recorded:
+    latency, LLM calls, tokens and DB time. Tool latency and cache hits are
+    recorded as their spans arrive. Everything lives in sliding-window
+    histograms, so the dashboard reflects recent traffic only.
+    """
+
+    MAX_PENDING_TRACES = 1000
+
+    def __init__(self, window_seconds: float = 300, slices: int = 10):
+        self.window_seconds = window_seconds
+        self._slices = slices
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[str, dict]" = OrderedDict()
+        self.turn_latency_ms = self._histogram()
+        self.llm_calls = self._histogram()
+        self.prompt_tokens = self._histogram()
+        self.completion_tokens = self._histogram()
+        self.db_ms = self._histogram()
+        self.cache_hits = self._histogram()
+        self.tool_latency_ms: Dict[str, WindowedHistogram] = {}
+
+    def _histogram(self) -> WindowedHistogram:
+        return WindowedHistogram(self.window_seconds, self._slices)
+
+    def export(self, span) -> None:
+        with self._lock:
+            if span.kind == "tool":
+                self.tool_latency_ms.setdefault(span.name, self._histogram()).add(span.duration_ms)
+            if "cache_hit" in span.attributes:
+                self.cache_hits.add(1.0 if span.attributes["cache_hit"] else 0.0)
+
+            if span.kind == "turn":
+                totals = self._pending.pop(span.trace_id, None) or self._new_totals()
+                self.turn_latency_ms.add(span.duration_ms)
+                self.llm_calls.add(totals["llm_calls"])
+                self.prompt_tokens.add(totals["prompt_tokens"])
+                self.completion_tokens.add(totals["completion_tokens"])
+                self.db_ms.add(totals["db_ms"])
+                return
+
+            totals = self._pending.get(span.trace_id)
+            if totals is None:
+                totals = self._pending[span.trace_id] = self._new_totals()
+                # Traces without a turn span (CLI scripts, prefetch stragglers) are evicted
+                while len(self._pending) > self.MAX_PENDING_TRACES:
+                    self._pending.popitem(last=False)
+            if span.kind == "llm":
+                totals["llm_calls"] += 1
+                totals["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+                totals["completion_tokens"] += span.attributes.get("completion_tokens", 0)
+            elif span.kind == "db" and span.name != "db.connect":
+                # Connection time is already inside the enclosing db.* span
+                totals["db_ms"] += span.duration_ms
+
+    @staticmethod
+    def _new_totals() -> dict:
+        return {"llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "db_ms": 0.0}
+
+    def snapshot(self) -> dict:
+        """Summaries for display: percentiles, means and per-tool latency."""
+        with self._lock:
+            turns = self.turn_latency_ms.snapshot()
+            llm_calls = self.llm_calls.snapshot()
+            prompt_tokens = self.prompt_tokens.snapshot()
+            completion_tokens = self.completion_tokens.snapshot()
+            db_ms = self.db_ms.snapshot()
+            cache_hits = self.cache_hits.snapshot()
+            tools = {name: hist.snapshot() for name, hist in self.tool_latency_ms.items()}
+
+        return {
+            "window_seconds": self.window_seconds,
+            "turns": turns.count,
+            "turn_latency_ms": {q: turns.percentile(q) for q in (50, 95, 99)},
+            "llm_calls_per_turn": llm_calls.mean(),
+            "prompt_tokens_per_turn": prompt_tokens.mean(),
+            "completion_tokens_per_turn": completion_tokens.mean(),
+            "db_ms_per_turn": db_ms.mean(),
+            "db_ms_p95": db_ms.percentile(95),
+            "cache_lookups": cache_hits.count,
+            "cache_hit_rate": cache_hits.mean(),
+            "tools": [
+                {
+                    "tool": name,
+                    "calls": hist.count,
+                    "p50_ms": round(hist.percentile(50), 1),
+                    "p95_ms": round(hist.percentile(95), 1),
+                    "max_ms": round(hist.max, 1),
+                }
+                for name, hist in sorted(tools.items())
+                if hist.count
+            ],
+        }
+
+
+turn_metrics = TurnMetrics(window_seconds=float(os.environ.get("AURA_METRICS_WINDOW_SECONDS", "300")))
+tracer.add_exporter(turn_metrics)
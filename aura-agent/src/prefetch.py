@@ -0,0 +1,126 @@
+# Speculative RAG Prefetch for the Aura Agent
+# This file starts knowledge-base retrieval before the LLM has asked for it
+
+import os
+import re
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .tools import retrieve_documents
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def _tokenize(text: str) -> set:
+    """Lowercase word/error-code tokens used to compare queries."""
+    return set(_TOKEN_PATTERN.findall(text.lower()))
+
+
+class SpeculativePrefetcher:
+    """
+    Runs retrieval on the raw user message while the first LLM call is in flight.
+
+    The system prompt tells the model to search the troubleshooting guides first,
+    so the first tool call of a turn is almost always a search whose query is a
+    rephrasing of the user message. We start that retrieval speculatively:
+
+    1. start(): submit retrieve_documents(user_message) to a background thread
+    2. claim(): when the model's search call arrives, compare its query with the
+       prefetched one. If enough of the model's query terms appear in the user
+       message, serve the prefetched documents; otherwise discard them.
+
+    Each session holds at most one pending prefetch, and a prefetch can only be
+    claimed once, so stale results never leak into later tool calls.
+    """
+
+    def __init__(self, min_similarity: float = 0.5, max_workers: int = 4):
+        """
+        Args:
+            min_similarity: Fraction of the model's query tokens that must appear
+                            in the prefetched query for the result to be served.
+            max_workers: Size of the background retrieval thread pool.
+        """
+        self.min_similarity = min_similarity
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aura-prefetch")
+        self._pending: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "errors": 0}
+
+    def start(self, key: str, query: str) -> None:
+        """Begin retrieving documents for `query` in the background."""
+        # Copy the context so the background retrieval span joins the current trace
+        future = self._executor.submit(contextvars.copy_context().run, self._retrieve, query)
+        with self._lock:
+            previous = self._pending.pop(key, None)
+            self._pending[key] = (query, future)
+            self.stats["started"] += 1
+        if previous:
+            previous[1].cancel()
+
+    def claim(self, key: str, query: str) -> Optional[List]:
+        """
+        Return the prefetched documents if they match `query`, else None.
+
+        The pending prefetch is removed either way: a miss means the model asked
+        for something different, and the speculative result is discarded.
+        """
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return None
+
+        prefetched_query, future = pending
+        similarity = self.similarity(query, prefetched_query)
+        if similarity < self.min_similarity:
+            future.cancel()
+            with self._lock:
+                self.stats["misses"] += 1
+            logger.info(f"Prefetch discarded (similarity {similarity:.2f}) for '{query}'")
+            return None
+
+        try:
+            docs = future.result()
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            logger.warning(f"Prefetch failed, falling back to live search: {e}")
+            return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+        logger.info(f"Prefetch hit (similarity {similarity:.2f}) for '{query}'")
+        return docs
+
+    def discard(self, key: str) -> None:
+        """Drop any pending prefetch for `key` (e.g. the turn ended without a search)."""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending:
+            pending[1].cancel()
+
+    @staticmethod
+    def similarity(query: str, prefetched_query: str) -> float:
+        """Share of the model's query tokens contained in the prefetched query."""
+        query_tokens = _tokenize(query)
+        if not query_tokens:
+            return 0.0
+        return len(query_tokens & _tokenize(prefetched_query)) / len(query_tokens)
+
+    @staticmethod
+    def _retrieve(query: str) -> List:
+        with tracer.span("prefetch_retrieval", kind="retrieval") as span:
+            docs = retrieve_documents(query)
+            span.set(retrieved_chunks=len(docs))
+            return docs
+
+
+prefetcher = SpeculativePrefetcher(
+    min_similarity=float(os.environ.get("AURA_PREFETCH_MIN_SIMILARITY", "0.5"))
+)
@@ -0,0 +1,138 @@
+# Reranking Stage for the Aura Agent
+# This file contains an over-fetch-and-rerank retriever wrapper with pluggable scorers
+
+import os
+import re
+import math
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .retrievers import tokenize
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_ERROR_CODE_PATTERN = re.compile(r"e-\d{3}")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: lowercase tokens, so 'E-205 ' and 'e-205' share results."""
+    return " ".join(tokenize(query))
+
+
+class LexicalScorer:
+    """
+    Dependency-free scorer over the candidate set.
+
+    Scores query-term coverage (IDF-weighted within the candidates), with a
+    strong bonus when an error code from the query appears in the chunk or its
+    guide name, and a small prior for the first-stage rank to break ties.
+    """
+
+    def __init__(self, error_code_bonus: float = 2.0, rank_prior: float = 0.1):
+        self.error_code_bonus = error_code_bonus
+        self.rank_prior = rank_prior
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        query_terms = set(tokenize(query))
+        doc_terms = [set(tokenize(doc.page_content)) for doc in documents]
+        n = len(documents)
+        idf = {term: math.log(1 + n / (1 + sum(1 for terms in doc_terms if term in terms))) for term in query_terms}
+        total_idf = sum(idf.values()) or 1.0
+        codes = set(_ERROR_CODE_PATTERN.findall(query.lower()))
+
+        scores = []
+        for rank, (doc, terms) in enumerate(zip(documents, doc_terms)):
+            score = sum(idf[term] for term in query_terms if term in terms) / total_idf
+            source = str(doc.metadata.get("source", "")).lower()
+            if codes and any(code in terms or code in source for code in codes):
+                score += self.error_code_bonus
+            scores.append(score + self.rank_prior / (rank + 1))
+        return scores
+
+
+class CrossEncoderScorer:
+    """
+    sentence-transformers cross-encoder, run locally.
+
+    Much better at paraphrased symptoms than term overlap, at roughly
+    10-50 ms per query on CPU for ~10 candidates with a MiniLM model.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name)
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        return [float(s) for s in self.model.predict([(query, doc.page_content) for doc in documents])]
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Over-fetches candidates from `retriever`, reranks them with `scorer` and
+    returns the best `k`.
+
+    Reranked results are cached per normalized query (the knowledge base only
+    changes on re-ingestion), so repeated error codes cost one dictionary lookup.
+    """
+
+    retriever: BaseRetriever
+    scorer: object
+    k: int = 3
+    cache_size: int = 1024
+    _cache: OrderedDict = None
+    _lock: threading.Lock = None
+
+    def model_post_init(self, __context) -> None:
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        key = normalize_query(query)
+        with tracer.span("rerank", kind="retrieval") as span:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            span.set(rerank_cache_hit=cached is not None)
+            if cached is not None:
+                return list(cached)
+
+            candidates = self.retriever.invoke(query)
+            span.set(candidates=len(candidates))
+            if len(candidates) > 1:
+                scores = self.scorer.score(query, candidates)
+                order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+                candidates = [candidates[i] for i in order]
+            results = candidates[:self.k]
+
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = results
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return list(results)
+
+
+def create_scorer(name: Optional[str] = None):
+    """
+    Scorer selected by name or AURA_RERANKER: lexical, cross-encoder, or none (returns None).
+
+    AURA_RERANKER_MODEL sets the cross-encoder model.
+    """
+    name = (name or os.environ.get("AURA_RERANKER", "none")).lower()
+    if name == "lexical":
+        return LexicalScorer()
+    if name == "cross-encoder":
+        return CrossEncoderScorer(os.environ.get("AURA_RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+    if name != "none":
+        logger.warning(f"Unknown reranker '{name}', reranking disabled")
+    return None
@@ -0,0 +1,302 @@
+# Resilience Layer for the Aura Agent
+# This file contains retries (honoring Retry-After), hedged requests and circuit
+# breakers shared by the Azure OpenAI chat, embedding and AI Vision calls
+
+import os
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_EXCEPTION_NAMES = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    "Timeout", "ConnectTimeout", "ReadTimeout", "ConnectionError", "TimeoutError",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Throttling, server errors, timeouts and dropped connections are worth retrying."""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in _RETRYABLE_EXCEPTION_NAMES for cls in type(error).__mro__)
+
+
+def is_dependency_failure(error: BaseException) -> bool:
+    """
+    Whether an error counts against the circuit breaker.
+
+    Only retryable errors and 5xx responses mean the dependency is unhealthy;
+    client errors (400 content filter, context length, 401) are the request's fault.
+    """
+    status = _status_code(error)
+    return is_retryable(error) or (status is not None and status >= 500)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Server-requested delay from the Retry-After / retry-after-ms headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass  # HTTP-date form; fall back to backoff
+    return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter; a server's Retry-After takes precedence."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            return min(requested, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a dependency after `failure_threshold` consecutive failures.
+
+    While open, calls fail fast with CircuitOpenError. After `reset_timeout`
+    seconds one trial call is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return self.state == "closed"
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state, self.failures = "closed", 0
+
+    def record_response(self) -> None:
+        """The dependency answered, with an error that is not its fault: ends a half-open trial."""
+        with self._lock:
+            if self.state == "half_open":
+                logger.info(f"Circuit '{self.name}' closed")
+                self.state, self.failures = "closed", 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state, self.opened_at = "open", time.monotonic()
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedging threshold."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class ResiliencePolicy:
+    """
+    Retries, optional hedging and a circuit breaker for one dependency.
+
+    Hedging: if an attempt has not returned after the recent p95 latency (at
+    least `hedge_min_ms`), an identical request is started and whichever
+    finishes first wins. Only enable it for idempotent, cheap calls.
+    """
+
+    _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="aura-hedge")
+
+    def __init__(self, name: str, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, hedge: bool = False,
+                 hedge_percentile: float = 95.0, hedge_min_ms: float = 200.0):
+        self.name = name
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_ms = hedge_min_ms
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def _attempt(self, fn: Callable, args, kwargs, span):
+        if not self.hedge:
+            return fn(*args, **kwargs)
+        threshold = self.latency.percentile(self.hedge_percentile)
+        if threshold is None:
+            return fn(*args, **kwargs)  # Not enough history to know what "slow" is
+        primary = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=max(threshold, self.hedge_min_ms) / 1000)
+        if done:
+            return primary.result()
+        self._count("hedges")
+        span.set(hedged=True)
+        backup = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        pending = {primary, backup}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded:
+                if succeeded[0] is backup:
+                    self._count("hedge_wins")
+                    span.set(hedge_won=True)
+                return succeeded[0].result()
+            if not pending:
+                return done.pop().result()  # Both failed: raise for the retry loop
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Call fn(*args, **kwargs) with retries, hedging and the circuit breaker."""
+        self._count("calls")
+        with tracer.span(self.name, kind="resilience") as span:
+            if not self.breaker.allow():
+                self._count("rejected")
+                span.set(circuit_open=True)
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+            for attempt in range(1, self.retry.max_attempts + 1):
+                started = time.perf_counter()
+                try:
+                    result = self._attempt(fn, args, kwargs, span)
+                except Exception as e:
+                    if attempt >= self.retry.max_attempts or not is_retryable(e):
+                        self._count("failures")
+                        if is_dependency_failure(e):
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.record_response()
+                        span.set(attempts=attempt, circuit_state=self.breaker.state)
+                        raise
+                    delay = self.retry.delay(attempt, e)
+                    self._count("retries")
+                    logger.warning(f"{self.name} attempt {attempt} failed ({type(e).__name__}), "
+                                   f"retrying in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+                self.latency.add((time.perf_counter() - started) * 1000)
+                self.breaker.record_success()
+                span.set(attempts=attempt, retries=attempt - 1)
+                return result
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["circuit_state"] = self.breaker.state
+        stats["p95_ms"] = self.latency.percentile(95, min_samples=1)
+        return stats
+
+
+_policies: Dict[str, ResiliencePolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(name: str, hedge: bool = False) -> ResiliencePolicy:
+    """
+    Shared policy for a dependency (llm, embeddings, image_embedding), created on first use.
+
+    AURA_RETRY_MAX_ATTEMPTS (default 3), AURA_RETRY_BASE_DELAY_MS (500),
+    AURA_RETRY_MAX_DELAY_MS (8000), AURA_BREAKER_FAILURES (5),
+    AURA_BREAKER_RESET_SECONDS (30) and AURA_HEDGE_MIN_MS (200) apply to all.
+    """
+    with _policies_lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = _policies[name] = ResiliencePolicy(
+                name,
+                retry=RetryPolicy(
+                    max_attempts=int(os.environ.get("AURA_RETRY_MAX_ATTEMPTS", "3")),
+                    base_delay=float(os.environ.get("AURA_RETRY_BASE_DELAY_MS", "500")) / 1000,
+                    max_delay=float(os.environ.get("AURA_RETRY_MAX_DELAY_MS", "8000")) / 1000,
+                ),
+                breaker=CircuitBreaker(
+                    name,
+                    failure_threshold=int(os.environ.get("AURA_BREAKER_FAILURES", "5")),
+                    reset_timeout=float(os.environ.get("AURA_BREAKER_RESET_SECONDS", "30")),
+                ),
+                hedge=hedge,
+                hedge_min_ms=float(os.environ.get("AURA_HEDGE_MIN_MS", "200")),
+            )
+        return policy
+
+
+def resilience_stats() -> Dict[str, Dict[str, object]]:
+    """Counters and circuit state per dependency, for dashboards."""
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {policy.name: policy.stats() for policy in policies}
+
+
+class ResilientEmbeddings(Embeddings):
+    """Embeddings client whose requests go through a ResiliencePolicy."""
+
+    def __init__(self, embeddings: Embeddings, policy: ResiliencePolicy):
+        self.embeddings = embeddings
+        self.policy = policy
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.policy.call(self.embeddings.embed_query, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.policy.call(self.embeddings.embed_documents, texts)
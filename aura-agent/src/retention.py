@@ -0,0 +1,516 @@
+# Chat History Partitioning, Archival and Restore
+# This file keeps chat_history bounded: it creates the monthly partitions ahead of
+# time, moves expired sessions into compressed JSONL archives, drops expired
+# partitions, and restores an archived session when a user reopens it
+
+import io
+import os
+import re
+import gzip
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Relative archive directories are anchored here (aura-agent/), not at the working
+# directory, so the app and the retention job always agree on where archives live
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ArchiveMissingError(Exception):
+    """An archived session could not be read back; its archive_path is left in place."""
+
+
+def resolve_archive_dir(override: Optional[str] = None) -> str:
+    """Absolute archive directory: `override`, else AURA_ARCHIVE_DIR (read at call time), else aura-agent/chat_archive."""
+    path = override or os.environ.get("AURA_ARCHIVE_DIR") or "chat_archive"
+    return os.path.abspath(os.path.join(_PACKAGE_DIR, os.path.expanduser(path)))
+
+_BOUND_PATTERN = re.compile(r"FROM \('?(-?\d+)'?\) TO \('?(-?\d+)'?\)")
+
+
+# --- Partitions ---
+
+def month_start_ms(year: int, month: int) -> int:
+    """Epoch milliseconds of the first instant of a UTC month (month may overflow by one)."""
+    if month > 12:
+        year, month = year + 1, month - 12
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def partition_for(timestamp_ms: int) -> Tuple[str, int, int]:
+    """(name, start_ms, end_ms) of the monthly partition holding a message timestamp."""
+    day = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+    return (f"chat_history_p{day.year}{day.month:02d}",
+            month_start_ms(day.year, day.month), month_start_ms(day.year, day.month + 1))
+
+
+def is_partitioned(cur) -> bool:
+    """True when chat_history is a partitioned table (setup_chat_db.py creates it that way)."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('chat_history')")
+    row = cur.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def ensure_partitions(cur, from_ms: Optional[int] = None, months_ahead: int = 2) -> List[str]:
+    """
+    Create the monthly partitions from `from_ms` (default: now) to `months_ahead`
+    months after the current one, plus the default partition.
+
+    Inserts always land in a small, recent partition; the default partition only
+    takes rows outside every range (restored sessions whose month was dropped).
+
+    Returns:
+        Names of the partitions that were created
+    """
+    from psycopg2 import sql
+
+    created = []
+    cur.execute("SELECT to_regclass('chat_history_default') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        cur.execute("CREATE TABLE chat_history_default PARTITION OF chat_history DEFAULT")
+        created.append("chat_history_default")
+
+    now = datetime.now(timezone.utc)
+    start = datetime.fromtimestamp(from_ms / 1000, tz=timezone.utc) if from_ms is not None else now
+    # Months counted as year * 12 + (month - 1)
+    for index in range(start.year * 12 + start.month - 1, now.year * 12 + now.month + months_ahead):
+        name, lower, upper = partition_for(month_start_ms(index // 12, index % 12 + 1))
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+        if not cur.fetchone()[0]:
+            cur.execute(sql.SQL("CREATE TABLE {} PARTITION OF chat_history FOR VALUES FROM ({}) TO ({})").format(
+                sql.Identifier(name), sql.Literal(lower), sql.Literal(upper)))
+            created.append(name)
+    return created
+
+
+def list_partitions(cur) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """(name, start_ms, end_ms) of every chat_history partition; the default one has no bounds."""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'chat_history'::regclass
+        ORDER BY c.relname
+    """)
+    partitions = []
+    for name, bound in cur.fetchall():
+        match = _BOUND_PATTERN.search(bound or "")
+        partitions.append((name, int(match.group(1)), int(match.group(2))) if match else (name, None, None))
+    return partitions
+
+
+# --- Archive files ---
+
+def archive_compression() -> str:
+    """zstd when the zstandard package is installed (AURA_ARCHIVE_COMPRESSION overrides), else gzip."""
+    requested = os.environ.get("AURA_ARCHIVE_COMPRESSION", "").lower()
+    if requested in ("", "zstd"):
+        try:
+            import zstandard  # noqa: F401
+            return "zstd"
+        except ImportError:
+            if requested == "zstd":
+                logger.warning("zstandard is not installed; archiving with gzip")
+    return "gzip"
+
+
+def open_archive(path: str, mode: str):
+    """Text stream over a .jsonl.zst or .jsonl.gz archive ('r' or 'w')."""
+    if path.endswith(".zst"):
+        import zstandard
+
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return gzip.open(path, mode + "t", encoding="utf-8")
+
+
+def _session_line_prefix(session_id: str) -> str:
+    return '{"session_id": ' + json.dumps(session_id) + ","
+
+
+def write_archive(path: str, sessions: Dict[str, dict]) -> int:
+    """
+    Write sessions as JSONL, one line per session, atomically (temp file + rename).
+
+    Each line is {"session_id", "user_id", "messages": [{"timestamp", "message_type",
+    "content", "tool_calls", "metadata"}, ...]}, session_id first so a restore can
+    skip other sessions without parsing them.
+
+    Returns:
+        Size of the archive in bytes
+    """
+    partial = os.path.join(os.path.dirname(path), ".partial-" + os.path.basename(path))
+    with open_archive(partial, "w") as f:
+        for session_id, session in sessions.items():
+            f.write(json.dumps({"session_id": session_id, "user_id": session["user_id"],
+                                "messages": session["messages"]}, default=str))
+            f.write("\n")
+    with open(partial, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    return os.path.getsize(path)
+
+
+def read_archived_session(path: str, session_id: str) -> Optional[dict]:
+    """The archived record of one session, or None if the archive doesn't hold it."""
+    prefix = _session_line_prefix(session_id)
+    with open_archive(path, "r") as f:
+        for line in f:
+            if line.startswith(prefix):
+                return json.loads(line)
+    return None
+
+
+def remove_from_archive(archive_file: str, session_ids: List[str], archive_dir: Optional[str] = None) -> int:
+    """
+    Rewrite an archive without the given sessions (erasure requests), atomically.
+
+    Returns:
+        Number of sessions removed
+    """
+    path = os.path.join(resolve_archive_dir(archive_dir), archive_file)
+    if not os.path.exists(path):
+        return 0
+    prefixes = tuple(_session_line_prefix(session_id) for session_id in session_ids)
+    partial = os.path.join(os.path.dirname(path), ".partial-" + os.path.basename(path))
+    removed = 0
+    with open_archive(path, "r") as source, open_archive(partial, "w") as target:
+        for line in source:
+            if line.startswith(prefixes):
+                removed += 1
+            else:
+                target.write(line)
+    with open(partial, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    logger.info(f"Removed {removed} sessions from archive {archive_file}")
+    return removed
+
+
+# --- Restore on demand ---
+
+@tracer.traced("db.restore_session", kind="db")
+def restore_session(cur, session_id: str, archive_file: str, archive_dir: Optional[str] = None) -> int:
+    """
+    Copy an archived session back into chat_history and clear its archive marker.
+
+    Runs on the caller's cursor, so the restore commits with the caller's
+    transaction. Rows of the session that the retention job had not purged yet
+    are replaced, not duplicated. Restored rows go to their month's partition,
+    or to the default partition if that month was dropped.
+
+    Args:
+        cur: Cursor of an open transaction
+        session_id: Session to restore
+        archive_file: chat_sessions.archive_path (a file name inside the archive directory)
+        archive_dir: Archive directory (default: resolve_archive_dir())
+
+    Returns:
+        Number of messages restored
+
+    Raises:
+        ArchiveMissingError: The archive file or the session's record in it is missing;
+                             nothing is changed, so the restore can be retried
+    """
+    path = os.path.join(resolve_archive_dir(archive_dir), archive_file)
+    record = read_archived_session(path, session_id) if os.path.exists(path) else None
+    if record is None:
+        logger.error(f"Archived session {session_id} not found in {path}")
+        raise ArchiveMissingError(f"Archived messages of session {session_id} not found in {path}")
+
+    messages = record["messages"]
+    if messages:
+        cur.execute("DELETE FROM chat_history WHERE session_id = %s AND timestamp <= %s",
+                    (session_id, messages[-1]["timestamp"]))
+    from psycopg2.extras import Json
+
+    for message in messages:
+        cur.execute("""
+            INSERT INTO chat_history
+            (user_id, session_id, timestamp, message_type, content, tool_calls, metadata)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (record["user_id"], session_id, message["timestamp"], message["message_type"], message["content"],
+              Json(message["tool_calls"]) if message.get("tool_calls") is not None else None,
+              Json(message["metadata"]) if message.get("metadata") is not None else None))
+    cur.execute("UPDATE chat_sessions SET archived_at = NULL, archive_path = NULL WHERE session_id = %s",
+                (session_id,))
+    tracer.current_span().set(rows=len(messages))
+    logger.info(f"Restored {len(messages)} archived messages for session {session_id}")
+    return len(messages)
+
+
+# --- Retention job ---
+
+class ChatRetentionJob:
+    """
+    Periodic job that keeps chat_history to the last `retain_days` days.
+
+    1. Creates the next months' partitions, so inserts never hit the default partition.
+    2. Archives sessions idle for more than `retain_days`, `batch_size` sessions per
+       compressed JSONL file. Each batch locks its chat_sessions rows (SKIP LOCKED),
+       so a session that receives a message meanwhile is left for the next run.
+    3. Drops every partition that ends before the cutoff and only holds archived
+       sessions (a DROP, not a DELETE: no bloat, no vacuum), under a short
+       lock_timeout so live inserts are never stuck behind it.
+    4. Deletes the remaining archived rows in batches (long-lived sessions keep
+       an old partition alive until they go idle too).
+    5. With a `checkpointer`, prunes superseded LangGraph checkpoints: every
+       node step writes a new one, and only each session's latest is read.
+
+    Sessions stay listed (chat_sessions is never archived); opening one restores it.
+    """
+
+    def __init__(self, connect: Callable, archive_dir: Optional[str] = None, retain_days: float = 180,
+                 batch_size: int = 200, months_ahead: int = 2, pause_seconds: float = 0.05,
+                 lock_timeout_ms: int = 2000, checkpointer=None):
+        """
+        Args:
+            connect: Returns a new psycopg2 connection
+            archive_dir: Directory for the archive files (default: resolve_archive_dir())
+            retain_days: Sessions idle for longer are archived
+            batch_size: Sessions per archive file / transaction
+            months_ahead: Future monthly partitions to keep ready
+            pause_seconds: Pause between batches, to leave I/O for the live workload
+            lock_timeout_ms: Give up dropping a partition after waiting this long for its lock
+            checkpointer: PostgresSaver whose old checkpoints are pruned (None: skip step 5)
+        """
+        self.connect = connect
+        self.archive_dir = resolve_archive_dir(archive_dir)
+        self.retain_days = retain_days
+        self.batch_size = batch_size
+        self.months_ahead = months_ahead
+        self.pause_seconds = pause_seconds
+        self.lock_timeout_ms = lock_timeout_ms
+        self.compression = archive_compression()
+        self.checkpointer = checkpointer
+
+    def cutoff_ms(self) -> int:
+        return int((time.time() - self.retain_days * 86400) * 1000)
+
+    def run(self, dry_run: bool = False) -> dict:
+        """Run every step once; returns counts for the report."""
+        cutoff = self.cutoff_ms()
+        stats = {"cutoff_ms": cutoff, "partitions_created": [], "sessions_archived": 0, "messages_archived": 0,
+                 "archive_files": 0, "archive_bytes": 0, "partitions_dropped": [], "rows_deleted": 0,
+                 "checkpoint_threads_pruned": 0}
+        conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                partitioned = is_partitioned(cur)
+                if dry_run:
+                    cur.execute("SELECT COUNT(*) FROM chat_sessions WHERE archived_at IS NULL AND last_message_at < %s",
+                                (cutoff,))
+                    stats["sessions_archived"] = cur.fetchone()[0]
+                    return stats
+                if partitioned:
+                    stats["partitions_created"] = ensure_partitions(cur, months_ahead=self.months_ahead)
+            conn.commit()
+
+            archived = self.archive_sessions(conn, cutoff, stats)
+            if partitioned:
+                stats["partitions_dropped"] = self.drop_partitions(conn, cutoff)
+            stats["rows_deleted"] = self.delete_archived_rows(conn, archived, cutoff)
+            if self.checkpointer is not None:
+                stats["checkpoint_threads_pruned"] = self.prune_checkpoints(conn)
+        finally:
+            conn.close()
+        return stats
+
+    def archive_sessions(self, conn, cutoff: int, stats: dict) -> List[str]:
+        """Write idle sessions to archive files and mark them archived; returns their IDs."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        extension = ".jsonl.zst" if self.compression == "zstd" else ".jsonl.gz"
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        archived = []
+        while True:
+            with tracer.span("retention.archive_batch", kind="db") as span, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT session_id, user_id FROM chat_sessions
+                    WHERE archived_at IS NULL AND last_message_at < %s
+                    ORDER BY last_message_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                """, (cutoff, self.batch_size))
+                sessions = {session_id: {"user_id": user_id, "messages": []}
+                            for session_id, user_id in cur.fetchall()}
+                if not sessions:
+                    conn.rollback()
+                    return archived
+
+                cur.execute("""
+                    SELECT session_id, timestamp, message_type, content, tool_calls, metadata
+                    FROM chat_history
+                    WHERE session_id = ANY(%s) AND timestamp < %s
+                    ORDER BY session_id, timestamp
+                """, (list(sessions), cutoff))
+                messages = 0
+                for session_id, rows in groupby(cur.fetchall(), key=lambda row: row[0]):
+                    for _, timestamp, message_type, content, tool_calls, metadata in rows:
+                        sessions[session_id]["messages"].append({
+                            "timestamp": timestamp, "message_type": message_type, "content": content,
+                            "tool_calls": tool_calls, "metadata": metadata,
+                        })
+                        messages += 1
+
+                archive_file = f"chat_archive_{run_id}_{stats['archive_files']:05d}{extension}"
+                size = write_archive(os.path.join(self.archive_dir, archive_file), sessions)
+                cur.execute("UPDATE chat_sessions SET archived_at = %s, archive_path = %s WHERE session_id = ANY(%s)",
+                            (int(time.time() * 1000), archive_file, list(sessions)))
+                conn.commit()
+                span.set(sessions=len(sessions), rows=messages, bytes=size)
+
+            archived.extend(sessions)
+            stats["sessions_archived"] += len(sessions)
+            stats["messages_archived"] += messages
+            stats["archive_files"] += 1
+            stats["archive_bytes"] += size
+            logger.info(f"Archived {len(sessions)} sessions ({messages} messages) to {archive_file}")
+            time.sleep(self.pause_seconds)
+
+    def drop_partitions(self, conn, cutoff: int) -> List[str]:
+        """Drop the partitions that end before the cutoff and hold only archived sessions' rows."""
+        from psycopg2 import errors, sql
+
+        dropped = []
+        with conn.cursor() as cur:
+            partitions = list_partitions(cur)
+        conn.commit()
+        for name, _, upper in partitions:
+            if upper is None or upper > cutoff:
+                continue
+            with tracer.span("retention.drop_partition", kind="db", partition=name), conn.cursor() as cur:
+                cur.execute(sql.SQL("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM {} h
+                        WHERE NOT EXISTS (SELECT 1 FROM chat_sessions s
+                                          WHERE s.session_id = h.session_id AND s.archived_at IS NOT NULL)
+                    )
+                """).format(sql.Identifier(name)))
+                if cur.fetchone()[0]:
+                    conn.rollback()
+                    logger.info(f"Keeping {name}: it still holds messages of unarchived sessions")
+                    continue
+                try:
+                    cur.execute(sql.SQL("SET LOCAL lock_timeout = {}").format(sql.Literal(f"{self.lock_timeout_ms}ms")))
+                    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    conn.commit()
+                except errors.LockNotAvailable:
+                    conn.rollback()
+                    logger.warning(f"Could not lock {name} within {self.lock_timeout_ms} ms; will retry next run")
+                    continue
+            dropped.append(name)
+            logger.info(f"Dropped partition {name}")
+        return dropped
+
+    def delete_archived_rows(self, conn, session_ids: List[str], cutoff: int) -> int:
+        """Delete what is left of the archived sessions (rows in partitions that were kept)."""
+        deleted = 0
+        for start in range(0, len(session_ids), self.batch_size):
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM chat_history WHERE session_id = ANY(%s) AND timestamp < %s",
+                            (session_ids[start:start + self.batch_size], cutoff))
+                deleted += cur.rowcount
+            conn.commit()
+            time.sleep(self.pause_seconds)
+        return deleted
+
+    def prune_checkpoints(self, conn) -> int:
+        """
+        Keep only the latest checkpoint (with its pending writes and blobs) of each session.
+
+        That is all resuming a session or an interrupted turn reads. Threads are
+        pruned by the saver, `batch_size` at a time, each on its own snapshot,
+        so turns running meanwhile are safe. Returns the number of threads pruned.
+        """
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('checkpoints') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return 0
+            cur.execute("SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING COUNT(*) > 1")
+            thread_ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        for start in range(0, len(thread_ids), self.batch_size):
+            batch = thread_ids[start:start + self.batch_size]
+            with tracer.span("retention.prune_checkpoints", kind="db", threads=len(batch)):
+                self.checkpointer.prune(batch, strategy="keep_latest")
+            time.sleep(self.pause_seconds)
+        if thread_ids:
+            logger.info(f"Pruned superseded checkpoints of {len(thread_ids)} sessions")
+        return len(thread_ids)
+
+
+def create_retention_job(**overrides) -> ChatRetentionJob:
+    """
+    Job configured from the environment: AURA_ARCHIVE_DIR (chat_archive, relative to aura-agent/),
+    AURA_RETENTION_DAYS (180), AURA_ARCHIVE_BATCH_SIZE (200) and
+    AURA_PARTITION_MONTHS_AHEAD (2); connects with the DB_* variables. Checkpoints
+    are pruned when AURA_CHECKPOINTER is postgres (the default) and its packages
+    are installed.
+    """
+    import psycopg2
+    from .db import connection_params
+
+    settings = {
+        "archive_dir": resolve_archive_dir(),
+        "retain_days": float(os.environ.get("AURA_RETENTION_DAYS", "180")),
+        "batch_size": int(os.environ.get("AURA_ARCHIVE_BATCH_SIZE", "200")),
+        "months_ahead": int(os.environ.get("AURA_PARTITION_MONTHS_AHEAD", "2")),
+    }
+    if os.environ.get("AURA_CHECKPOINTER", "postgres").lower() == "postgres":
+        try:
+            from .checkpointing import create_postgres_checkpointer
+            settings["checkpointer"] = create_postgres_checkpointer(max_connections=1)
+        except ImportError as e:
+            logger.warning(f"Postgres checkpointer unavailable ({e}); checkpoints will not be pruned")
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return ChatRetentionJob(lambda: psycopg2.connect(**connection_params()), **settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive idle chat sessions and drop expired partitions")
+    parser.add_argument("--retain-days", type=float, help="Archive sessions idle for longer (default AURA_RETENTION_DAYS)")
+    parser.add_argument("--archive-dir", type=str, help="Archive directory (default AURA_ARCHIVE_DIR)")
+    parser.add_argument("--batch-size", type=int, help="Sessions per archive file")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the sessions that would be archived")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    job = create_retention_job(retain_days=args.retain_days, archive_dir=args.archive_dir,
+                               batch_size=args.batch_size)
+    print(f"--- Chat retention: archiving sessions idle for more than {job.retain_days:g} days "
+          f"to {job.archive_dir} ({job.compression}) ---")
+    try:
+        stats = job.run(dry_run=args.dry_run)
+    finally:
+        if job.checkpointer is not None:
+            job.checkpointer.conn.close()  # The saver's connection pool
+    if args.dry_run:
+        print(f"{stats['sessions_archived']} sessions would be archived")
+        return
+    print(f"Partitions created: {', '.join(stats['partitions_created']) or 'none'}")
+    print(f"Archived {stats['sessions_archived']} sessions / {stats['messages_archived']} messages "
+          f"in {stats['archive_files']} files ({stats['archive_bytes'] / 1024:.1f} KiB)")
+    print(f"Partitions dropped: {', '.join(stats['partitions_dropped']) or 'none'}")
+    print(f"Rows deleted from kept partitions: {stats['rows_deleted']}")
+    print(f"Sessions with superseded checkpoints pruned: {stats['checkpoint_threads_pruned']}")
+
+
+if __name__ == "__main__":
+    main()
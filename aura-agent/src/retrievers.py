@@ -0,0 +1,265 @@
+# Alternative Retrieval Backends for the Aura Agent
+# This file contains lexical (BM25), hybrid and direct-SQL retrievers over the knowledge base guides
+
+import os
+import re
+import math
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base")
+
+CHUNK_INDEX_NAME = "knowledge_chunks_embedding_hnsw"
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_IMAGE_PATTERN = re.compile(r'!\[.*?\]\((.*?)\)')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; error codes like 'e-205' stay a single token."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def load_knowledge_base_chunks(knowledge_base_path: str = KNOWLEDGE_BASE_PATH,
+                               chunk_size: int = 1000, chunk_overlap: int = 100,
+                               chunker: str = None) -> List[Document]:
+    """
+    Split the markdown guides the same way ingest.py does.
+
+    `chunker` (default: AURA_CHUNKER, "markdown") selects the heading-aware
+    splitter from src/chunking.py, with chunk_size as its maximum chunk size,
+    or "recursive" for the original fixed-size RecursiveCharacterTextSplitter.
+
+    Each chunk carries metadata 'source' (the guide's document_id, e.g.
+    'E-205-Brush-Stall') and 'chunk_index'; markdown chunks also carry
+    error_code, section, subsection, step_number and heading_path.
+    """
+    chunker = (chunker or os.environ.get("AURA_CHUNKER", "markdown")).lower()
+    if chunker == "markdown":
+        from .chunking import chunk_markdown
+    else:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    documents = []
+    for file_name in sorted(os.listdir(knowledge_base_path)):
+        if not file_name.endswith(".md"):
+            continue
+        with open(os.path.join(knowledge_base_path, file_name), encoding="utf-8") as f:
+            text = _IMAGE_PATTERN.sub("", f.read())
+        document_id = os.path.splitext(file_name)[0]
+        if chunker == "markdown":
+            documents.extend(chunk_markdown(text, document_id, max_chars=chunk_size))
+            continue
+        for i, chunk in enumerate(splitter.split_text(text)):
+            documents.append(Document(page_content=chunk, metadata={"source": document_id, "chunk_index": i}))
+    return documents
+
+
+class LexicalRetriever(BaseRetriever):
+    """
+    In-process BM25 retriever.
+
+    Needs no embeddings call or database round-trip, so it is fast and keeps
+    working when Azure is unavailable. Exact error codes ('E-205') score very
+    highly, which vector search does not guarantee.
+    """
+
+    documents: List[Document]
+    k: int = 3
+    k1: float = 1.5
+    b: float = 0.75
+    _postings: dict = {}
+    _doc_lengths: list = []
+    _avg_len: float = 0.0
+
+    def model_post_init(self, __context) -> None:
+        # Inverted index: term -> [(document index, term frequency), ...]
+        self._postings = {}
+        self._doc_lengths = []
+        for i, doc in enumerate(self.documents):
+            counts = Counter(tokenize(doc.page_content))
+            self._doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((i, tf))
+        self._avg_len = sum(self._doc_lengths) / len(self._doc_lengths) if self._doc_lengths else 0.0
+
+    @classmethod
+    def from_knowledge_base(cls, k: int = 3, **chunk_kwargs) -> "LexicalRetriever":
+        return cls(documents=load_knowledge_base_chunks(**chunk_kwargs), k=k)
+
+    def score(self, query: str) -> List[float]:
+        """BM25 score of every document for `query`."""
+        n = len(self.documents)
+        scores = [0.0] * n
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[i] / self._avg_len)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        scores = self.score(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [self.documents[i] for i in ranked[:self.k] if scores[i] > 0]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines several retrievers with reciprocal rank fusion (RRF).
+
+    Each retriever contributes 1 / (rrf_k + rank) per document; documents are
+    identified by (source, chunk_index) or, failing that, their content.
+    """
+
+    retrievers: List[BaseRetriever]
+    k: int = 3
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        scores = {}
+        documents = {}
+        for retriever in self.retrievers:
+            for rank, doc in enumerate(retriever.invoke(query)):
+                key = (doc.metadata.get("source"), doc.metadata.get("chunk_index")) \
+                    if "chunk_index" in doc.metadata else doc.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, doc)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [documents[key] for key in ranked[:self.k]]
+
+
+def ensure_chunk_index(cursor) -> bool:
+    """
+    Create the HNSW cosine index on knowledge_chunks.text_embedding if missing.
+
+    Without it KnowledgeChunkRetriever scans every chunk and ef_search has no
+    effect. Needs pgvector >= 0.5 and a column with fixed dimensions
+    (e.g. vector(1536)); returns False (exact scan is used instead) if it
+    cannot be created.
+    """
+    try:
+        cursor.execute("SAVEPOINT chunk_index")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {CHUNK_INDEX_NAME} "
+            "ON knowledge_chunks USING hnsw (text_embedding vector_cosine_ops)"
+        )
+        cursor.execute("RELEASE SAVEPOINT chunk_index")
+        return True
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT chunk_index")
+        logger.warning(f"Could not create {CHUNK_INDEX_NAME}, chunk search will scan: {e}")
+        return False
+
+
+class KnowledgeChunkRetriever(BaseRetriever):
+    """
+    Similarity search straight against the knowledge_chunks table written by ingest.py.
+
+    One server-side prepared statement per filter shape replaces the LangChain
+    PGVector ORM path (collection lookup + embedding-table join). ANN accuracy
+    of the HNSW index built by ingest.py (see ensure_chunk_index) is tuned per
+    query with hnsw.ef_search, metadata filters
+    from src/chunking.py narrow the candidates in SQL, and results farther
+    than `max_distance` (cosine) are dropped.
+    """
+
+    embeddings: Embeddings
+    k: int = 3
+    ef_search: Optional[int] = None
+    max_distance: Optional[float] = None
+    filters: Dict[str, Any] = {}
+    infer_filters: bool = True
+    include_images: bool = False
+
+    def _statement(self, filter_columns: tuple) -> tuple:
+        """Name and PREPARE body for this filter shape ($1 vector, $2 limit, $3.. filter arrays)."""
+        where = " AND ".join(f"kc.{name} = ANY(${i + 3})" for i, name in enumerate(filter_columns)) or "TRUE"
+        images = (", ARRAY(SELECT ki.image_path FROM chunk_image_links cil "
+                  "JOIN knowledge_images ki ON ki.id = cil.image_id WHERE cil.chunk_id = kc.id) AS image_paths"
+                  if self.include_images else ", NULL AS image_paths")
+        sql = f"""
+            SELECT kc.document_id, kc.chunk_index, kc.text_content,
+                   kc.text_embedding <=> $1 AS distance{images}
+            FROM knowledge_chunks kc
+            WHERE {where}
+            ORDER BY kc.text_embedding <=> $1
+            LIMIT $2
+        """
+        name = "aura_chunk_search_" + "_".join(filter_columns or ("all",)) + ("_img" if self.include_images else "")
+        return name, sql
+
+    def _search(self, vector: List[float], filters: Dict[str, Any]) -> list:
+        import psycopg2
+        from .chunking import CHUNK_METADATA_COLUMNS
+        from .db import knowledge_connection
+
+        allowed = {name for name, _ in CHUNK_METADATA_COLUMNS}
+        columns = tuple(sorted(name for name in filters if name in allowed))
+        name, sql = self._statement(columns)
+        values = ["[" + ",".join(str(v) for v in vector) + "]", self.k] + [
+            list(filters[c]) if isinstance(filters[c], (list, tuple, set)) else [filters[c]] for c in columns
+        ]
+        settings = []
+        if self.ef_search:
+            settings.append(f"SET LOCAL hnsw.ef_search = {int(self.ef_search)};")
+        execute = " ".join(settings) + f" EXECUTE {name} (%s::vector, %s" + ", %s" * len(columns) + ")"
+
+        with knowledge_connection() as conn:
+            with conn.cursor() as cur:
+                try:
+                    cur.execute(execute, values)
+                except psycopg2.errors.InvalidSqlStatementName:
+                    # First use of this statement on this pooled connection
+                    conn.rollback()
+                    cur.execute(f"PREPARE {name} AS {sql}")
+                    cur.execute(execute, values)
+                rows = cur.fetchall()
+            conn.rollback()  # Read-only; ends the transaction that scoped SET LOCAL
+        return rows
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        import psycopg2
+        from .chunking import infer_chunk_filters
+        from .tracing import tracer
+
+        vector = self.embeddings.embed_query(query)
+        filters = dict(self.filters)
+        inferred = infer_chunk_filters(query) if self.infer_filters else {}
+        with tracer.span("db.chunk_search", kind="db") as span:
+            try:
+                rows = self._search(vector, {**inferred, **filters})
+            except psycopg2.errors.UndefinedColumn:
+                if not inferred:
+                    raise
+                # Knowledge base ingested before the metadata columns existed
+                logger.warning("knowledge_chunks has no metadata columns; re-run ingest.py to enable filters")
+                self.infer_filters, inferred = False, {}
+                rows = self._search(vector, filters)
+            if not rows and inferred:
+                # An error code with no guide: fall back to the unfiltered search
+                rows = self._search(vector, filters)
+            span.set(rows=len(rows), filters=",".join(sorted({**inferred, **filters})) or "none")
+
+        documents = []
+        for document_id, chunk_index, text_content, distance, image_paths in rows:
+            if self.max_distance is not None and distance > self.max_distance:
+                continue
+            metadata = {"source": document_id, "chunk_index": chunk_index, "distance": float(distance)}
+            if image_paths:
+                metadata["image_paths"] = list(image_paths)
+            documents.append(Document(page_content=text_content, metadata=metadata))
+        return documents
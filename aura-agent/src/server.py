@@ -0,0 +1,423 @@
+"""
+Aura Headless HTTP API - asyncio server with SSE streaming
+
+A programmatic serving path next to the Streamlit app, for mobile clients and
+horizontally scaled deployments. Built on asyncio streams only (no extra web
+framework dependency).
+
+Endpoints:
+    GET  /healthz                              Liveness probe, with admission load
+    POST /sessions                             {"user_id", "title"?} → {"session_id"}
+    GET  /sessions?user_id=...&limit=...       Recent sessions for a user, with their summaries;
+                                               pass the returned next_cursor as &cursor=... for the next page
+    GET  /sessions/{id}/messages?user_id=...   Stored history of a session
+    POST /sessions/{id}/messages               {"user_id", "content"} → text/event-stream
+
+The message endpoint streams server-sent events while the agent works:
+    event: resumed      {"content"}              answer to an interrupted previous turn
+    event: tool_call    {"name", "args"}         the agent requested a tool
+    event: tool_result  {"name", "content"}      a tool finished
+    event: message      {"content"}              the final answer
+    event: error        {"error"}                the turn failed or timed out
+    event: done         {"latency_ms"}
+
+Connections are kept alive between requests (HTTP/1.1, chunked SSE bodies),
+each turn is bounded by a timeout, and an admission controller caps concurrent
+agent turns, rate-limits each user and queues the overflow (returning sessions
+first), so a burst of clients cannot exhaust Azure quotas or DB connections.
+Rejected turns get 429 (user rate limit) or 503 (overloaded) with Retry-After.
+
+Usage (from the aura-agent directory):
+    python -m src.server --host 0.0.0.0 --port 8080
+"""
+
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+
+from .admission import AdmissionController, AdmissionRejected, create_admission_controller
+from .memory_manager import ChatHistoryManager
+from .retention import ArchiveMissingError
+from .tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Raised by handlers to send an error status with a JSON body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        self.method = method
+        url = urlsplit(target)
+        self.path = url.path.rstrip("/") or "/"
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        return data
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class AuraAPIServer:
+    """
+    HTTP front end for aura_graph and ChatHistoryManager.
+
+    Blocking work (graph turns, DB calls) runs on a thread pool sized to the
+    concurrency limit, so the event loop only parses requests and relays events.
+    """
+
+    def __init__(self, max_concurrent_turns: int = 8, turn_timeout: float = 120.0,
+                 idle_timeout: float = 30.0, memory_manager: Optional[ChatHistoryManager] = None,
+                 admission: Optional[AdmissionController] = None):
+        self.turn_timeout = turn_timeout
+        self.idle_timeout = idle_timeout
+        self.memory_manager = memory_manager or ChatHistoryManager(max_history_messages=20)
+        self.admission = admission or create_admission_controller(max_concurrent=max_concurrent_turns)
+        # Turns hold a worker for their whole duration; DB calls get a few extra threads
+        self._executor = ThreadPoolExecutor(max_workers=self.admission.max_concurrent + 4, thread_name_prefix="aura-api")
+        # Queued turns block a thread each while they wait; the queue bound caps these threads
+        self._admission_executor = ThreadPoolExecutor(max_workers=self.admission.max_queue + 1,
+                                                      thread_name_prefix="aura-admission")
+
+    # --- Connection handling ---
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it or goes idle."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), timeout=self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                try:
+                    await self.dispatch(request, writer)
+                except ConnectionError:
+                    break
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, e.headers, request.keep_alive)
+                except Exception as e:
+                    logger.error(f"Unhandled error for {request.method} {request.path}: {e}")
+                    await self._send_json(writer, 500, {"error": "Internal server error"}, keep_alive=False)
+                    break
+
+                if not request.keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Headers too large")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None  # Client closed a kept-alive connection
+            raise
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            raise HTTPError(411, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    # --- Routing ---
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter):
+        parts = [p for p in request.path.split("/") if p]
+
+        if parts == ["healthz"] and request.method == "GET":
+            return await self._send_json(writer, 200, {"status": "ok", "admission": self.admission.stats()},
+                                         keep_alive=request.keep_alive)
+
+        if parts == ["sessions"]:
+            if request.method == "POST":
+                return await self.create_session(request, writer)
+            if request.method == "GET":
+                return await self.list_sessions(request, writer)
+            raise HTTPError(405, "Method not allowed")
+
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "messages":
+            if request.method == "GET":
+                return await self.get_history(request, writer, parts[1])
+            if request.method == "POST":
+                return await self.post_message(request, writer, parts[1])
+            raise HTTPError(405, "Method not allowed")
+
+        raise HTTPError(404, f"No route for {request.path}")
+
+    # --- Handlers ---
+
+    async def create_session(self, request: Request, writer):
+        data = request.json()
+        user_id = self._require(data, "user_id")
+        session_id = await self._run_blocking(
+            self.memory_manager.start_new_session, user_id, data.get("title", "New Conversation")
+        )
+        await self._send_json(writer, 201, {"session_id": session_id}, keep_alive=request.keep_alive)
+
+    async def list_sessions(self, request: Request, writer):
+        user_id = self._require(request.query, "user_id")
+        limit = request.query.get("limit", "10")
+        if not limit.isdigit() or not 1 <= int(limit) <= 100:
+            raise HTTPError(400, "'limit' must be an integer from 1 to 100")
+        limit = int(limit)
+        before = None
+        if request.query.get("cursor"):
+            # "<last_message_at>:<session_id>" of the last session on the previous page
+            timestamp, _, session_id = request.query["cursor"].partition(":")
+            if not timestamp.isdigit() or not session_id:
+                raise HTTPError(400, "Invalid cursor")
+            before = (int(timestamp), session_id)
+        sessions = await self._run_blocking(self.memory_manager.get_user_sessions, user_id, limit, before)
+        next_cursor = None
+        if len(sessions) == limit:
+            timestamp, session_id = self.memory_manager.session_cursor(sessions[-1])
+            next_cursor = f"{timestamp}:{session_id}"
+        await self._send_json(writer, 200, {"sessions": [dict(s) for s in sessions], "next_cursor": next_cursor},
+                              keep_alive=request.keep_alive)
+
+    async def get_history(self, request: Request, writer, session_id: str):
+        user_id = self._require(request.query, "user_id")
+        try:
+            history = await self._run_blocking(self.memory_manager.load_history, user_id, session_id)
+        except ArchiveMissingError as e:
+            raise HTTPError(503, str(e))
+        messages = [{"type": m.type, "content": m.content} for m in history]
+        await self._send_json(writer, 200, {"session_id": session_id, "messages": messages},
+                              keep_alive=request.keep_alive)
+
+    async def post_message(self, request: Request, writer, session_id: str):
+        """Run one agent turn and stream its progress as server-sent events."""
+        data = request.json()
+        user_id = self._require(data, "user_id")
+        content = self._require(data, "content")
+
+        loop = asyncio.get_running_loop()
+        try:
+            ticket = await loop.run_in_executor(self._admission_executor, self.admission.admit, user_id, session_id)
+        except AdmissionRejected as e:
+            raise HTTPError(429 if e.reason == "rate_limited" else 503, str(e),
+                            {"Retry-After": str(math.ceil(e.retry_after))})
+
+        turn = None
+        try:
+            await self._start_stream(writer)
+            events: asyncio.Queue = asyncio.Queue()
+
+            def emit(event: str, payload: dict):
+                loop.call_soon_threadsafe(events.put_nowait, (event, payload))
+
+            turn = loop.run_in_executor(self._executor, self._run_turn, user_id, session_id, content, emit)
+            deadline = loop.time() + self.turn_timeout
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    await self._send_event(writer, "error", {"error": f"Turn exceeded {self.turn_timeout:.0f}s timeout"})
+                    break
+                try:
+                    event, payload = await asyncio.wait_for(events.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    continue
+                await self._send_event(writer, event, payload)
+                if event in ("done", "error"):
+                    break
+            await self._end_stream(writer)
+        finally:
+            # The slot is released when the turn itself finishes, even after a timeout
+            if turn is not None:
+                turn.add_done_callback(lambda _: ticket.release())
+            else:
+                ticket.release()
+
+    def _run_turn(self, user_id: str, session_id: str, content: str, emit):
+        """Worker-thread body: load history, stream the graph, persist the exchange."""
+        from .graph import get_aura_graph, prepare_turn_input, resume_interrupted_turn, turn_config
+
+        start = time.perf_counter()
+        user_message = HumanMessage(content=content)
+        try:
+            with tracer.span("turn", kind="turn", user_id=user_id, session_id=session_id):
+                resumed = resume_interrupted_turn(session_id)
+                if resumed:
+                    self.memory_manager.save_messages(user_id, session_id, resumed)
+                    emit("resumed", {"content": resumed[-1].content})
+
+                inputs = prepare_turn_input(
+                    user_id, session_id, user_message,
+                    load_history=lambda: self.memory_manager.prepare_agent_context(user_id, session_id),
+                )
+
+                final_answer = None
+                for update in get_aura_graph().stream(inputs, turn_config(session_id), stream_mode="updates"):
+                    for node_output in update.values():
+                        for message in (node_output or {}).get("chat_history", []):
+                            if isinstance(message, AIMessage) and message.tool_calls:
+                                for call in message.tool_calls:
+                                    emit("tool_call", {"name": call["name"], "args": call["args"]})
+                            elif isinstance(message, ToolMessage):
+                                emit("tool_result", {"name": message.name, "content": str(message.content)[:2000]})
+                            elif isinstance(message, AIMessage):
+                                final_answer = message
+
+                if final_answer is None:
+                    raise RuntimeError("Agent finished without an answer")
+                emit("message", {"content": final_answer.content})
+                self.memory_manager.save_messages(user_id, session_id, [user_message, final_answer])
+            emit("done", {"latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+        except Exception as e:
+            logger.error(f"Turn failed for session {session_id}: {e}")
+            emit("error", {"error": str(e)})
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _require(data: dict, field: str) -> str:
+        value = data.get(field)
+        if not value or not isinstance(value, str):
+            raise HTTPError(400, f"'{field}' is required")
+        return value
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    async def _send_json(writer, status: int, payload: dict, headers: Optional[dict] = None, keep_alive: bool = True):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    @staticmethod
+    async def _start_stream(writer):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def _send_event(writer, event: str, payload: dict):
+        data = f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n".encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _end_stream(writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host: str, port: int, **server_kwargs):
+    api = AuraAPIServer(**server_kwargs)
+    if os.environ.get("AURA_WARMUP_ENABLED", "true").lower() == "true":
+        from .warmup import warm_up
+        # Before accepting connections, so the first request runs at steady-state latency
+        await asyncio.get_running_loop().run_in_executor(api._executor, warm_up, api.memory_manager)
+    server = await asyncio.start_server(api.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    logger.info(f"Aura API listening on http://{host}:{port}")
+    print(f"Aura API listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aura headless HTTP API")
+    parser.add_argument("--host", default=os.environ.get("AURA_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("AURA_API_PORT", "8080")))
+    parser.add_argument("--max-concurrent-turns", type=int,
+                        default=int(os.environ.get("AURA_API_MAX_CONCURRENT_TURNS", "8")))
+    parser.add_argument("--turn-timeout", type=float,
+                        default=float(os.environ.get("AURA_API_TURN_TIMEOUT", "120")))
+    parser.add_argument("--idle-timeout", type=float,
+                        default=float(os.environ.get("AURA_API_IDLE_TIMEOUT", "30")))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.host, args.port, max_concurrent_turns=args.max_concurrent_turns,
+                          turn_timeout=args.turn_timeout, idle_timeout=args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
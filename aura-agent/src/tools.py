@@ -1,13 +1,14 @@
 # Tools and Functions for the Aura Agent
 # This file contains all the tools and functions used by the agent
 
-from langchain.tools import BaseTool
 from typing import Type, Optional, Dict, Any
 import os
+import time
 import logging
-from langchain.tools import tool
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_community.vectorstores.pgvector import PGVector
+import threading
+from langchain_core.tools import tool
+
+from .tracing import tracer
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -21,13 +22,137 @@ class RAGTool:
     """
     _vector_store = None
     _retriever = None
+    _embeddings = None
+    _fallback_retriever = None
+    # Reentrant: get_retriever() builds the vector retriever under the same lock
+    _init_lock = threading.RLock()
     
     @classmethod
     def get_retriever(cls):
-        """Get or create the vector store retriever."""
+        """
+        Get or create the retriever used by search_troubleshooting_guides.
+        
+        AURA_RETRIEVAL_BACKEND selects the backend:
+        - vector (default): pgvector similarity search
+        - lexical: in-process BM25 over the knowledge base files
+        - hybrid: reciprocal rank fusion of vector and lexical results
+        - sql: one prepared similarity query on knowledge_chunks (see get_sql_retriever)
+        AURA_RETRIEVAL_K sets how many chunks are returned (default 3).
+        
+        AURA_RERANKER (lexical or cross-encoder, default none) adds a rerank
+        stage: the backend fetches AURA_RERANK_FETCH_K candidates (default 12)
+        and only the best k after reranking reach the LLM.
+        """
         if cls._retriever is None:
+            with cls._init_lock:
+                if cls._retriever is None:
+                    cls._init_retriever()
+        
+        return cls._retriever
+    
+    @classmethod
+    def _init_retriever(cls):
+        """Build the configured retriever; called once, under _init_lock."""
+        from .retrievers import LexicalRetriever, HybridRetriever
+        from .reranker import RerankingRetriever, create_scorer
+        
+        backend = os.environ.get("AURA_RETRIEVAL_BACKEND", "vector").lower()
+        k = int(os.environ.get("AURA_RETRIEVAL_K", "3"))
+        init_start = time.perf_counter()
+        
+        scorer = create_scorer()
+        fetch_k = max(k, int(os.environ.get("AURA_RERANK_FETCH_K", "12"))) if scorer else k
+        
+        if backend == "lexical":
+            retriever = LexicalRetriever.from_knowledge_base(k=fetch_k)
+        elif backend == "sql":
+            retriever = cls.get_sql_retriever(fetch_k)
+        elif backend == "hybrid":
+            retriever = HybridRetriever(
+                retrievers=[cls.get_vector_retriever(fetch_k), LexicalRetriever.from_knowledge_base(k=fetch_k)],
+                k=fetch_k,
+            )
+        else:
+            retriever = cls.get_vector_retriever(fetch_k)
+        
+        if scorer is not None:
+            retriever = RerankingRetriever(retriever=retriever, scorer=scorer, k=k)
+        cls._retriever = retriever
+        
+        span = tracer.current_span()
+        if span is not None:
+            span.set(retriever_init_ms=round((time.perf_counter() - init_start) * 1000, 3))
+        logger.info(f"Retriever initialized (backend={backend}, k={k}, "
+                    f"reranker={type(scorer).__name__ if scorer else 'none'})")
+    
+    @classmethod
+    def get_fallback_retriever(cls):
+        """
+        Lexical retriever used when the configured backend fails, or None.
+        
+        None for the lexical backend itself, or when AURA_RETRIEVAL_FALLBACK=false.
+        """
+        if os.environ.get("AURA_RETRIEVAL_FALLBACK", "true").lower() != "true":
+            return None
+        if os.environ.get("AURA_RETRIEVAL_BACKEND", "vector").lower() == "lexical":
+            return None
+        if cls._fallback_retriever is None:
+            with cls._init_lock:
+                if cls._fallback_retriever is None:
+                    from .retrievers import LexicalRetriever
+                    
+                    cls._fallback_retriever = LexicalRetriever.from_knowledge_base(
+                        k=int(os.environ.get("AURA_RETRIEVAL_K", "3")))
+        return cls._fallback_retriever
+    
+    @classmethod
+    def get_embeddings(cls):
+        """
+        Get the query embeddings client, wrapped in an LRU cache.
+        
+        AURA_EMBEDDING_CACHE_SIZE sets how many texts are cached (default 2048).
+        Requests are retried, hedged and circuit-broken by the resilience layer
+        (AURA_RESILIENCE_ENABLED, AURA_HEDGE_EMBEDDINGS). Cache misses from
+        concurrent sessions are coalesced into one batched
+        request: AURA_EMBEDDING_BATCH_WAIT_MS is the collection window (default 5,
+        0 disables batching) and AURA_EMBEDDING_BATCH_SIZE the batch cap (default 16).
+        """
+        if cls._embeddings is None:
+            from langchain_openai import AzureOpenAIEmbeddings
+            from .embeddings import CachedEmbeddings, MicroBatchingEmbeddings
+            from .resilience import ResilientEmbeddings, get_policy
+            
+            resilient = os.environ.get("AURA_RESILIENCE_ENABLED", "true").lower() == "true"
+            client = AzureOpenAIEmbeddings(
+                azure_deployment=os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
+                **({"max_retries": 0} if resilient else {}),
+            )
+            if resilient:
+                # Embedding requests are idempotent and cheap, so slow ones are hedged
+                hedge = os.environ.get("AURA_HEDGE_EMBEDDINGS", "true").lower() == "true"
+                client = ResilientEmbeddings(client, get_policy("embeddings", hedge=hedge))
+            batch_wait_ms = float(os.environ.get("AURA_EMBEDDING_BATCH_WAIT_MS", "5"))
+            if batch_wait_ms > 0:
+                client = MicroBatchingEmbeddings(
+                    client,
+                    max_batch_size=int(os.environ.get("AURA_EMBEDDING_BATCH_SIZE", "16")),
+                    max_wait_ms=batch_wait_ms,
+                )
+            cls._embeddings = CachedEmbeddings(
+                client,
+                max_entries=int(os.environ.get("AURA_EMBEDDING_CACHE_SIZE", "2048")),
+            )
+        return cls._embeddings
+    
+    @classmethod
+    def get_vector_retriever(cls, k: int = 3):
+        """Get a pgvector retriever returning the top `k` chunks."""
+        if cls._vector_store is None:
             try:
                 logger.info("Initializing pgvector connection...")
+                # Deferred: langchain_community dominates import time
+                from langchain_community.vectorstores.pgvector import PGVector
+                
                 
                 CONNECTION_STRING = PGVector.connection_string_from_db_params(
                     driver="psycopg2",
@@ -40,50 +165,113 @@ class RAGTool:
                 
                 COLLECTION_NAME = "aura_iot_troubleshooting_guides"
                 
-                embeddings = AzureOpenAIEmbeddings(
-                    azure_deployment=os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
-                )
-                
                 cls._vector_store = PGVector(
                     connection_string=CONNECTION_STRING,
                     collection_name=COLLECTION_NAME,
-                    embedding_function=embeddings
+                    embedding_function=cls.get_embeddings()
                 )
-                
-                cls._retriever = cls._vector_store.as_retriever(search_kwargs={"k": 3})
                 logger.info("✅ Vector store initialized successfully")
                 
             except Exception as e:
                 logger.error(f"Failed to initialize vector store: {e}")
                 raise
         
-        return cls._retriever
+        return cls._vector_store.as_retriever(search_kwargs={"k": k})
+    
+    @classmethod
+    def get_sql_retriever(cls, k: int = 3):
+        """
+        Get a retriever that queries knowledge_chunks directly (the table ingest.py writes).
+        
+        AURA_SQL_EF_SEARCH sets hnsw.ef_search for the chunk index per query,
+        AURA_SQL_MAX_DISTANCE drops chunks farther than that cosine
+        distance, AURA_SQL_INFER_FILTERS (default true) restricts queries naming
+        one error code to that guide, and AURA_SQL_INCLUDE_IMAGES (default false)
+        adds the linked image paths to each chunk's metadata.
+        """
+        from .retrievers import KnowledgeChunkRetriever
+        
+        def optional(name, cast):
+            value = os.environ.get(name)
+            return cast(value) if value else None
+        
+        return KnowledgeChunkRetriever(
+            embeddings=cls.get_embeddings(),
+            k=k,
+            ef_search=optional("AURA_SQL_EF_SEARCH", int),
+            max_distance=optional("AURA_SQL_MAX_DISTANCE", float),
+            infer_filters=os.environ.get("AURA_SQL_INFER_FILTERS", "true").lower() == "true",
+            include_images=os.environ.get("AURA_SQL_INCLUDE_IMAGES", "false").lower() == "true",
+        )
 
-@tool
-def search_troubleshooting_guides(query: str) -> str:
+def format_search_results(docs, seen_texts=()) -> str:
     """
-    Searches the knowledge base for troubleshooting guides related to a specific problem or error code.
-    Use this to find solutions for user issues.
+    Format retrieved documents into a single string for the LLM.
+    
+    Shared by the tool itself and by the graph when it serves a search
+    from the speculative prefetch, so both paths produce identical output.
+    The context packer merges overlapping chunks, drops text already in
+    `seen_texts` (earlier tool results of this turn) and enforces
+    AURA_CONTEXT_MAX_CHARS.
+    """
+    from .context_packer import context_packer
+    
+    packed, stats = context_packer.pack(docs, seen_texts)
+    span = tracer.current_span()
+    if span is not None:
+        span.set(context_raw_chars=stats["raw_chars"], context_chars=stats["packed_chars"],
+                 context_skipped_guides=stats["skipped_guides"])
+    return packed
+
+def retrieve_documents(query: str) -> list:
+    """
+    Retrieve chunks for `query` with the configured retriever.
+    
+    Falls back to lexical search when the retriever fails (embeddings or
+    database unavailable), marking the current span with fallback=True.
+    Shared by run_search and the speculative prefetch.
+    """
+    retriever = RAGTool.get_retriever()
+    try:
+        return retriever.invoke(query)
+    except Exception as e:
+        fallback = RAGTool.get_fallback_retriever()
+        if fallback is None:
+            raise
+        # Embeddings or database unavailable: BM25 needs neither
+        logger.warning(f"Retriever failed ({e}), falling back to lexical search")
+        span = tracer.current_span()
+        if span is not None:
+            span.set(fallback=True)
+        return fallback.invoke(query)
+
+def run_search(query: str, seen_texts=()) -> str:
+    """
+    Search the knowledge base and return the packed result, or an error message.
+    
+    The body of search_troubleshooting_guides; the graph calls it directly so
+    it can pass the tool results already sent in the current turn.
     """
     try:
         print(f"--- RAG TOOL: Searching docs for '{query}' ---")
-        retriever = RAGTool.get_retriever()
-        docs = retriever.invoke(query)
-        
-        if not docs:
-            return "No relevant troubleshooting guides found for this query."
+        with tracer.span("vector_search", kind="retrieval") as span:
+            docs = retrieve_documents(query)
+            span.set(retrieved_chunks=len(docs))
         
-        # Format the retrieved documents into a single string for the LLM
-        result = "\n\n".join([
-            f"Source: {doc.metadata.get('source', 'N/A')}\nContent: {doc.page_content}" 
-            for doc in docs
-        ])
-        return result
+        return format_search_results(docs, seen_texts)
         
     except Exception as e:
         logger.error(f"Error in search_troubleshooting_guides: {e}")
         return f"Error searching knowledge base: {str(e)}. Please try rephrasing your query."
 
+@tool
+def search_troubleshooting_guides(query: str) -> str:
+    """
+    Searches the knowledge base for troubleshooting guides related to a specific problem or error code.
+    Use this to find solutions for user issues.
+    """
+    return run_search(query)
+
 
 @tool
 def check_device_connectivity(device_id: str) -> str:
@@ -0,0 +1,304 @@
+# Structured Tracing for the Aura Agent
+# This file records timed spans for graph nodes, tools, retrieval and database calls
+
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# The span currently open in this thread/task; new spans become its children
+_current_span: contextvars.ContextVar = contextvars.ContextVar("aura_current_span", default=None)
+
+
+class Span:
+    """
+    One timed unit of work.
+
+    Spans opened inside another span share its trace_id, so every span of a
+    user turn (nodes, tools, LLM calls, DB queries) can be grouped together.
+    Attributes hold the measurements: prompt_tokens, completion_tokens,
+    cache_hit, retrieved_chunks, rows, ...
+    """
+
+    __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "start_time",
+                 "duration_ms", "status", "error", "attributes", "_start_perf")
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"] = None, attributes: Optional[dict] = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else uuid4().hex
+        self.span_id = uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time()
+        self.duration_ms = 0.0
+        self.status = "ok"
+        self.error = None
+        self.attributes = dict(attributes or {})
+        self._start_perf = time.perf_counter()
+
+    def set(self, **attributes) -> None:
+        """Add or overwrite measurements on this span."""
+        self.attributes.update(attributes)
+
+    def increment(self, attribute: str, amount: float = 1) -> None:
+        """Accumulate a numeric measurement (e.g. tokens across several LLM calls)."""
+        self.attributes[attribute] = self.attributes.get(attribute, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class JsonLinesExporter:
+    """Appends every finished span as one JSON line to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class RingBufferExporter:
+    """Keeps the most recent spans in memory for in-process inspection."""
+
+    def __init__(self, max_spans: int = 2000):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span.to_dict())
+
+    def spans(self, kind: Optional[str] = None) -> List[dict]:
+        """Buffered spans, oldest first, optionally filtered by kind."""
+        with self._lock:
+            spans = list(self._spans)
+        if kind is not None:
+            spans = [s for s in spans if s["kind"] == kind]
+        return spans
+
+    def trace(self, trace_id: str) -> List[dict]:
+        """All buffered spans of one trace, in start order."""
+        return sorted((s for s in self.spans() if s["trace_id"] == trace_id), key=lambda s: s["start_time"])
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into Prometheus metrics and renders the text exposition format.
+
+    Exposes per (kind, name):
+    - aura_span_duration_seconds histogram
+    - aura_span_errors_total counter
+    - aura_span_attribute_total counter for numeric attributes (tokens, chunks, rows, cache hits)
+    - gauges registered with add_gauge (e.g. admission queue depth)
+
+    Call serve(port) to expose /metrics over HTTP from a daemon thread.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations: Dict[tuple, dict] = {}
+        self._errors: Dict[tuple, int] = {}
+        self._attributes: Dict[tuple, float] = {}
+        self._gauges: Dict[str, tuple] = {}
+        self._server = None
+
+    def add_gauge(self, name: str, help_text: str, read) -> None:
+        """Expose read() (current value, e.g. a queue depth) as a gauge on every scrape."""
+        with self._lock:
+            self._gauges[name] = (help_text, read)
+
+    def export(self, span: Span) -> None:
+        key = (span.kind, span.name)
+        seconds = span.duration_ms / 1000
+        with self._lock:
+            hist = self._durations.setdefault(key, {"buckets": [0] * len(self.BUCKETS), "count": 0, "sum": 0.0})
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += 1
+            hist["count"] += 1
+            hist["sum"] += seconds
+            if span.status == "error":
+                self._errors[key] = self._errors.get(key, 0) + 1
+            for attribute, value in span.attributes.items():
+                if isinstance(value, (int, float)):
+                    attr_key = key + (attribute,)
+                    self._attributes[attr_key] = self._attributes.get(attr_key, 0) + float(value)
+
+    def render(self) -> str:
+        """Current metrics in Prometheus text format."""
+        lines = [
+            "# HELP aura_span_duration_seconds Duration of traced operations",
+            "# TYPE aura_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (kind, name), hist in sorted(self._durations.items()):
+                labels = f'kind="{kind}",name="{name}"'
+                for bound, count in zip(self.BUCKETS, hist["buckets"]):
+                    lines.append(f'aura_span_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'aura_span_duration_seconds_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+                lines.append(f"aura_span_duration_seconds_sum{{{labels}}} {hist['sum']:.6f}")
+                lines.append(f"aura_span_duration_seconds_count{{{labels}}} {hist['count']}")
+
+            lines.append("# HELP aura_span_errors_total Traced operations that raised")
+            lines.append("# TYPE aura_span_errors_total counter")
+            for (kind, name), count in sorted(self._errors.items()):
+                lines.append(f'aura_span_errors_total{{kind="{kind}",name="{name}"}} {count}')
+
+            lines.append("# HELP aura_span_attribute_total Sum of numeric span attributes")
+            lines.append("# TYPE aura_span_attribute_total counter")
+            for (kind, name, attribute), value in sorted(self._attributes.items()):
+                lines.append(f'aura_span_attribute_total{{kind="{kind}",name="{name}",attribute="{attribute}"}} {value:g}')
+            gauges = sorted(self._gauges.items())
+
+        for name, (help_text, read) in gauges:
+            try:
+                value = float(read())
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {e}")
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> None:
+        """Start a /metrics endpoint on a daemon thread."""
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="aura-metrics", daemon=True).start()
+        logger.info(f"Prometheus metrics available on http://{host}:{port}/metrics")
+
+
+class Tracer:
+    """
+    Creates spans and hands finished spans to the configured exporters.
+
+    Usage:
+        with tracer.span("load_history", kind="db", session_id=sid) as span:
+            rows = ...
+            span.set(rows=len(rows))
+
+    Exporter failures are logged and never break the traced operation.
+    """
+
+    def __init__(self, exporters: Optional[list] = None):
+        self.exporters = list(exporters or [])
+
+    def add_exporter(self, exporter) -> None:
+        self.exporters.append(exporter)
+
+    def get_exporter(self, exporter_type: type):
+        """Return the first configured exporter of the given type, if any."""
+        for exporter in self.exporters:
+            if isinstance(exporter, exporter_type):
+                return exporter
+        return None
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        span = Span(name, kind, parent=_current_span.get(), attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - span._start_perf) * 1000
+            _current_span.reset(token)
+            self._export(span)
+
+    def current_span(self) -> Optional[Span]:
+        """The innermost open span, for adding measurements from nested code."""
+        return _current_span.get()
+
+    def traced(self, name: str, kind: str = "internal"):
+        """Decorator form of span() for graph nodes and helpers."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Trace exporter {type(exporter).__name__} failed: {e}")
+
+
+def _tracer_from_env() -> Tracer:
+    """
+    Build the process-wide tracer from environment settings.
+
+    AURA_TRACE_EXPORTERS: comma-separated list of ring, jsonl, prometheus (default: ring)
+    AURA_TRACE_FILE: JSON lines output path (default: aura_traces.jsonl)
+    AURA_TRACE_BUFFER_SIZE: spans kept by the ring buffer (default: 2000)
+    AURA_PROMETHEUS_PORT: if set, serve /metrics on this port
+    """
+    names = {n.strip().lower() for n in os.environ.get("AURA_TRACE_EXPORTERS", "ring").split(",") if n.strip()}
+    tracer = Tracer()
+    if "ring" in names:
+        tracer.add_exporter(RingBufferExporter(int(os.environ.get("AURA_TRACE_BUFFER_SIZE", "2000"))))
+    if "jsonl" in names:
+        tracer.add_exporter(JsonLinesExporter(os.environ.get("AURA_TRACE_FILE", "aura_traces.jsonl")))
+    if "prometheus" in names:
+        prometheus = PrometheusExporter()
+        tracer.add_exporter(prometheus)
+        port = os.environ.get("AURA_PROMETHEUS_PORT")
+        if port:
+            try:
+                prometheus.serve(int(port))
+            except OSError as e:
+                logger.warning(f"Could not start Prometheus endpoint on port {port}: {e}")
+    return tracer
+
+
+tracer = _tracer_from_env()
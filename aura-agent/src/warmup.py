@@ -0,0 +1,130 @@
+# Startup Warm-up for the Aura Agent
+# This file pre-initializes the retriever, LLM client, graph and DB pool in parallel,
+# so the first request after a deploy runs at steady-state latency
+
+import os
+import re
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from .retrievers import KNOWLEDGE_BASE_PATH
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Synthetic query run through the retriever: pulls the pgvector index pages into cache
+WARMUP_QUERY = "device keeps disconnecting from WiFi"
+
+_ERROR_CODE_PATTERN = re.compile(r"E-\d{3}")
+
+
+def known_error_codes(knowledge_base_path: str = KNOWLEDGE_BASE_PATH) -> List[str]:
+    """Error codes that have a guide, taken from the knowledge base file names (E-101-*.md, ...)."""
+    codes = []
+    for name in sorted(os.listdir(knowledge_base_path)):
+        match = _ERROR_CODE_PATTERN.match(name)
+        if match and name.endswith(".md"):
+            codes.append(match.group(0))
+    return codes
+
+
+def warm_retriever() -> dict:
+    """Initialize the retriever, prime the embedding cache with the error codes, run a query."""
+    from .tools import RAGTool
+
+    retriever = RAGTool.get_retriever()
+    primed = 0
+    # Only the vector and sql backends embed queries; the lexical backend has nothing to prime
+    if RAGTool._embeddings is not None:
+        primed = RAGTool.get_embeddings().prime(known_error_codes())
+    docs = retriever.invoke(WARMUP_QUERY)
+    return {"primed_embeddings": primed, "retrieved_chunks": len(docs)}
+
+
+def warm_llm(ping: bool = False) -> dict:
+    """
+    Create the LLM client; with `ping`, also send a one-token request so the
+    HTTPS connection to Azure OpenAI is already open for the first user.
+    """
+    from .graph import get_llm
+
+    llm = get_llm()
+    if ping:
+        from langchain_core.messages import HumanMessage
+        llm.invoke([HumanMessage(content="ping")], max_tokens=1)
+    return {"pinged": ping}
+
+
+def warm_graph() -> dict:
+    """Compile the agent graph and open its checkpointer."""
+    from .graph import get_aura_graph
+
+    checkpointer = get_aura_graph().checkpointer
+    return {"checkpointer": type(checkpointer).__name__ if checkpointer is not None else "none"}
+
+
+def warm_database(memory_manager) -> dict:
+    """Open the chat-history connection pool."""
+    memory_manager.warm_up()
+    return {"pool_size": getattr(memory_manager, "pool_size", None)}
+
+
+def _timed(fn, *args) -> dict:
+    start = time.perf_counter()
+    try:
+        details = fn(*args)
+        status, error = "ok", None
+    except Exception as e:
+        details, status, error = {}, "error", str(e)
+    result = {"status": status, "ms": round((time.perf_counter() - start) * 1000, 1), **details}
+    if error:
+        result["error"] = error
+    return result
+
+
+def warm_up(memory_manager=None, llm_ping: Optional[bool] = None, timeout: float = 60.0) -> Dict[str, dict]:
+    """
+    Warm every startup-cost component in parallel and report per-component timings.
+
+    Failures are reported, never raised: the app still starts and the failing
+    component initializes (or fails) on first use as before.
+
+    Args:
+        memory_manager: ChatHistoryManager whose connection pool should be opened (optional)
+        llm_ping: Send a one-token request to the LLM (default: AURA_WARMUP_LLM_PING, off)
+        timeout: Seconds to wait before reporting unfinished components as "timeout"
+
+    Returns:
+        {component: {"status": "ok" | "error" | "timeout", "ms": float, ...details}},
+        plus a "total" entry with the wall-clock time ("degraded" if any component failed)
+    """
+    if llm_ping is None:
+        llm_ping = os.environ.get("AURA_WARMUP_LLM_PING", "false").lower() == "true"
+
+    tasks = {
+        "retriever": (warm_retriever,),
+        "llm": (warm_llm, llm_ping),
+        "graph": (warm_graph,),
+    }
+    if memory_manager is not None:
+        tasks["database"] = (warm_database, memory_manager)
+
+    print(f"---WARM-UP: initializing {', '.join(tasks)}---")
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="warmup")
+    futures = {pool.submit(_timed, *task): name for name, task in tasks.items()}
+    wait(futures, timeout=timeout)
+    pool.shutdown(wait=False)
+
+    report = {}
+    for future, name in futures.items():
+        report[name] = future.result() if future.done() else {"status": "timeout", "ms": timeout * 1000}
+        if report[name]["status"] != "ok":
+            logger.warning(f"Warm-up of {name} did not complete: {report[name].get('error', report[name]['status'])}")
+    all_ok = all(r["status"] == "ok" for r in report.values())
+    report["total"] = {"status": "ok" if all_ok else "degraded", "ms": round((time.perf_counter() - start) * 1000, 1)}
+
+    print("---WARM-UP: " + ", ".join(f"{name} {r['ms']:.0f}ms {r['status']}" for name, r in report.items()) + "---")
+    return report